@@ -0,0 +1,210 @@
+"""
+Activity-driven adaptive frame sampling.
+
+A fixed sample rate spends as much work on neutral footage as on fast
+exchanges. AdaptiveSampler decides frame by frame which frames are
+analyzed: after every analyzed frame it is told the frame's activity (the
+summed frame difference) and whether it showed a hit flash, and picks the
+interval to the next sampled frame from that:
+
+- A flash, or activity well above the recent baseline, switches to the
+  minimum interval (every frame) and holds it for a while, so hits,
+  hitstop and the exchange around them are sampled densely.
+- While the activity signal is flat (unchanged frames, or activity close
+  to the baseline), the interval doubles up to the maximum interval.
+- Anything else returns to the base interval.
+
+Activity is compared per frame of interval, and the flash threshold grows
+with the interval (see flash_thresholds()), since a difference taken over
+several frames of ordinary motion is larger than one taken over a single
+frame, while a flash is about as bright either way.
+
+The sampler plugs in wherever a frame filter is accepted
+(VideoProcessor.stream(frame_filter=...), FrameSubscriber(sampler=...)).
+Every decision depends on the updates for the samples before it, so the
+schedule is only reproducible when frames are decided in step with the
+analysis: FrameBus decodes passes with a sampler on the calling thread,
+whatever its prefetch setting. A prefetching stream would decide on its
+decode thread ahead of the updates, and which frames get sampled would
+then depend on thread timing.
+
+Sampled frame numbers are enough to reconstruct the schedule afterwards
+(see sampling_schedule()), so cached features need no extra record of it.
+"""
+
+import threading
+import numpy as np
+from collections import deque
+from typing import List, Optional, Sequence, Tuple
+
+
+class AdaptiveSampler:
+    """Chooses the interval to the next analyzed frame from on-screen activity"""
+    
+    def __init__(self, bright_pixel_threshold: int, base_interval: int = 2, min_interval: int = 1,
+                 max_interval: int = 8, hold_frames: int = 30, spike_factor: float = 2.0,
+                 flat_tolerance: float = 0.25, baseline_weight: float = 0.1):
+        """
+        Initialize adaptive sampler
+        
+        Args:
+            bright_pixel_threshold: Flash pixels (at base_interval) that make
+                a frame a hit flash, as in MoveDetector
+            base_interval: Interval while activity changes without spiking
+            min_interval: Interval around activity spikes and flashes
+            max_interval: Longest interval, reached while activity stays flat
+            hold_frames: Frames sampled at min_interval after each spike or flash
+            spike_factor: Activity per frame this many times the baseline is a spike
+            flat_tolerance: Activity per frame within this fraction of the
+                baseline counts as flat
+            baseline_weight: Weight of each new sample in the activity
+                baseline (exponential moving average)
+        """
+        if not 1 <= min_interval <= base_interval <= max_interval:
+            raise ValueError(f"Need 1 <= min_interval <= base_interval <= max_interval, "
+                             f"got {min_interval}, {base_interval}, {max_interval}")
+        
+        self.bright_pixel_threshold = bright_pixel_threshold
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.hold_frames = hold_frames
+        self.spike_factor = spike_factor
+        self.flat_tolerance = flat_tolerance
+        self.baseline_weight = baseline_weight
+        
+        # Decisions can be made on a decode thread while updates come from analysis
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        """Start a new pass (the next frame asked about is sampled)"""
+        with self._lock:
+            self.interval = self.base_interval
+            self.baseline: Optional[float] = None
+            self._next_frame: Optional[int] = None
+            self._last_decided = -1
+            self._hold_until = -1
+            self._last_updated: Optional[int] = None
+            # Recently sampled frames, for repeated questions about a decided frame
+            self._sampled = deque(maxlen=64)
+            
+            # Counters for the stats
+            self.frames_sampled = 0
+            self.spikes = 0
+    
+    def wants_frame(self, frame_num: int) -> bool:
+        """
+        Decide whether a frame is analyzed
+        
+        Frames must be asked about in ascending order; asking about an
+        already decided frame again returns the same answer.
+        """
+        with self._lock:
+            if frame_num <= self._last_decided:
+                return frame_num in self._sampled
+            
+            self._last_decided = frame_num
+            if self._next_frame is not None and frame_num < self._next_frame:
+                return False
+            
+            self._sampled.append(frame_num)
+            self._next_frame = frame_num + self.interval
+            self.frames_sampled += 1
+            return True
+    
+    def update(self, frame_num: int, activity: float, bright_pixels: int, static: bool = False):
+        """
+        Report the analysis of a sampled frame
+        
+        Args:
+            frame_num: Sampled frame
+            activity: Summed difference from the previous sampled frame
+            bright_pixels: Flash pixels in that difference
+            static: The frame was unchanged from the previous sampled frame
+        """
+        with self._lock:
+            gap = frame_num - self._last_updated if self._last_updated is not None else 0
+            self._last_updated = frame_num
+            if gap <= 0:
+                # First frame of the pass: nothing to compare with
+                return
+            
+            rate = 0.0 if static else activity / gap
+            flash = bright_pixels > self.bright_pixel_threshold * max(1.0, gap / self.base_interval)
+            spike = flash or (self.baseline is not None and self.baseline > 0
+                              and rate > self.baseline * self.spike_factor)
+            flat = static or (self.baseline is not None
+                              and abs(rate - self.baseline) <= self.baseline * self.flat_tolerance)
+            
+            if spike:
+                self.spikes += 1
+                self._hold_until = frame_num + self.hold_frames
+            elif not static:
+                # Spikes are left out so the baseline keeps describing neutral
+                self.baseline = rate if self.baseline is None else (
+                    self.baseline + self.baseline_weight * (rate - self.baseline))
+            
+            if frame_num < self._hold_until:
+                self.interval = self.min_interval
+            elif flat:
+                self.interval = min(self.interval * 2, self.max_interval)
+            else:
+                self.interval = self.base_interval
+            
+            # Frames already decided cannot be sampled any more (only
+            # happens when decisions run ahead of the analysis)
+            self._next_frame = max(self._last_decided + 1, frame_num + self.interval)
+
+
+def sampling_schedule(frames: Sequence[int], max_interval: int) -> List[Tuple[int, int, int]]:
+    """
+    Reconstruct the sampling schedule from the sampled frame numbers
+    
+    Args:
+        frames: Sampled frame numbers, ascending
+        max_interval: Longest interval between samples; longer gaps are
+            parts of the video that were not analyzed
+    
+    Returns:
+        List of (start_frame, end_frame, interval) runs: frames start_frame,
+        start_frame + interval, ... before end_frame were sampled
+    """
+    runs = []
+    for i in range(len(frames)):
+        frame_num = int(frames[i])
+        gap = int(frames[i + 1]) - frame_num if i + 1 < len(frames) else 0
+        if not 0 < gap <= max_interval:
+            # Last sample of a range: it covers one frame
+            gap = 0
+        
+        if runs and runs[-1][1] == frame_num and (runs[-1][2] == gap or gap == 0):
+            runs[-1][1] = frame_num + (gap or 1)
+        else:
+            runs.append([frame_num, frame_num + (gap or 1), gap or 1])
+    return [tuple(run) for run in runs]
+
+
+def flash_thresholds(frames: Sequence[int], bright_pixel_threshold: int, base_interval: int,
+                     max_interval: int) -> np.ndarray:
+    """
+    Per-sample flash thresholds for adaptively sampled frames
+    
+    Ordinary motion brightens about proportionally more pixels over a longer
+    interval, so the threshold (meant for base_interval) is scaled by how
+    much longer each sample's interval was.
+    
+    Args:
+        frames: Sampled frame numbers, ascending
+        bright_pixel_threshold: Threshold at base_interval
+        base_interval: Interval the threshold was tuned for
+        max_interval: Longest interval between samples; longer gaps (and the
+            first sample) start a new range, whose first sample may have been
+            compared with a frame up to max_interval earlier (segment overlap)
+    
+    Returns:
+        (N,) float64 thresholds
+    """
+    gaps = np.diff(np.asarray(frames, dtype=np.int64), prepend=-1 - max_interval)
+    gaps[gaps > max_interval] = max_interval
+    return bright_pixel_threshold * np.maximum(1.0, gaps / base_interval)
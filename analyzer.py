@@ -4,20 +4,37 @@ Main analysis engine for 2XKO gameplay videos.
 
 import argparse
 import json
+import os
 import numpy as np
-import cv2
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import timedelta
 from video_processor import VideoProcessor, FrameAnalyzer
+from video_index import VideoIndex
+from frame_bus import FrameBus
+from frame_proxy import FrameProxy
+from frame_features import FrameFeatures, FrameFeatureExtractor, FEATURE_EXTRACTOR_VERSION
+from feature_cache import FeatureCache, user_cache_dir, video_content_hash
 from character_data import CHARACTER_DATA, BlitzcrankData
 from move_detector import MoveDetector, GameStateDetector
+from hud_layout import HudLayout, load_or_detect_layout
 from move_translator import MoveTranslator
+from config import ANALYSIS_SETTINGS
+from segment_parallel import analyze_in_segments
+from gameplay_segments import find_gameplay_segments
+from coarse_to_fine import coarse_scan, find_candidate_frames, group_candidate_windows
+from adaptive_sampling import AdaptiveSampler, flash_thresholds, sampling_schedule
+from memory_budget import MemoryBudget, peak_rss_bytes
+from live_analysis import LiveAnalyzer, open_live_source
 
 
 class GameplayAnalyzer:
     """Main analyzer for gameplay videos"""
     
-    def __init__(self, video_path: str, matchup_type: str, character: str):
+    # Sample every 2 frames for performance
+    SAMPLE_RATE = 2
+    
+    def __init__(self, video_path: str, matchup_type: str, character: str,
+                 settings: Optional[Dict] = None):
         """
         Initialize analyzer
         
@@ -25,10 +42,12 @@ class GameplayAnalyzer:
             video_path: Path to video file
             matchup_type: Type of matchup (mirror, etc.)
             character: Character name
+            settings: Overrides for config.ANALYSIS_SETTINGS
         """
         self.video_path = video_path
         self.matchup_type = matchup_type
         self.character = character
+        self.settings = {**ANALYSIS_SETTINGS, **(settings or {})}
         
         if character not in CHARACTER_DATA:
             raise ValueError(f"Character {character} not supported. Available: {list(CHARACTER_DATA.keys())}")
@@ -37,13 +56,48 @@ class GameplayAnalyzer:
         self.character_info = self.character_class.get_character_info()
         self.move_data = self.character_class.get_moves()
         
-        self.video = VideoProcessor(video_path)
+        # Timeline index and HUD layout are stored once per video (see _video_data_path())
+        self.video_data_path = self._video_data_path()
+        self.video = VideoProcessor(video_path, build_index=self.settings["build_video_index"],
+                                    backend=self.settings["decode_backend"],
+                                    backend_options=self._backend_options(),
+                                    index_path=VideoIndex.index_path(self.video_data_path))
         self.frame_analyzer = FrameAnalyzer(self.character_class)
-        self.move_detector = MoveDetector(self.character_class)
-        self.game_state_detector = GameStateDetector()
+        
+        # Motion detectors run on a low-resolution proxy, so full-resolution
+        # pixel thresholds are rescaled to it
+        self.proxy = FrameProxy.from_settings(self.video.width, self.video.height, self.settings)
+        self.move_detector = MoveDetector(
+            self.character_class,
+            bright_pixel_threshold=self.proxy.scale_pixel_count(self.settings["bright_pixel_threshold"])
+        )
+        # HUD regions follow the video's layout profile (detected once per video)
+        self.hud_layout = load_or_detect_layout(self.video, self.settings["hud_profile"],
+                                                HudLayout.layout_path(self.video_data_path))
+        self.game_state_detector = GameStateDetector(timer_start=self.settings["round_timer_start"],
+                                                     layout=self.hud_layout)
+        # What the HUD readers start from in every extraction pass (see calibrate_hud())
+        self.hud_calibration: Optional[Dict] = None
+        
+        # Frame buffers are sized to the memory budget and feature tables spill to disk
+        self.memory_budget: Optional[MemoryBudget] = None
+        if self.settings["memory_budget_mb"]:
+            self.memory_budget = MemoryBudget(self.settings["memory_budget_mb"], self.settings["spill_dir"])
+            self._fit_frame_buffers()
+        
+        self.feature_extractor = FrameFeatureExtractor(self.move_detector, self.game_state_detector,
+                                                       skip_static=self.settings["skip_static_frames"],
+                                                       block_size=self.settings["detector_block_size"],
+                                                       memory_budget=self.memory_budget)
+        self.features: Optional[FrameFeatures] = None
+        # (start_frame, end_frame) ranges showing gameplay (None = whole video)
+        self.gameplay_segments: Optional[List[Tuple[int, int]]] = None
+        # (start_frame, end_frame) windows the coarse tier picked for full-rate analysis
+        self.refine_windows: Optional[List[Tuple[int, int]]] = None
         
         # Analysis results
         self.events = []
+        self.hitstop_events = []
         self.player1_mistakes = []
         self.player2_mistakes = []
         self.player1_opportunities = []
@@ -63,181 +117,603 @@ class GameplayAnalyzer:
             "punish_opportunities_missed": 0
         }
     
-    def analyze(self) -> Dict:
+    def analyze(self, extra_subscribers: Optional[Callable[[FrameBus], None]] = None) -> Dict:
         """
         Perform full analysis of gameplay video
         
+        Args:
+            extra_subscribers: See extract_features()
+        
         Returns:
             Complete analysis report
         """
         print(f"\nAnalyzing {self.character} vs {self.character} matchup...")
         print(f"Video duration: {self.video.duration:.2f} seconds")
         
-        # Extract frames (sample every 2 frames for performance)
-        print("\nExtracting frames...")
-        frames = self.video.extract_frames(sample_rate=2)
+        self.features = self.extract_features(extra_subscribers)
+        return self.build_report()
+    
+    def extract_features(self, extra_subscribers: Optional[Callable[[FrameBus], None]] = None) -> FrameFeatures:
+        """
+        Get the frame features for the whole video
+        
+        Loads them from the feature cache when possible, otherwise decodes
+        the video (only its gameplay segments, only the windows picked by a
+        coarse scan and in parallel segments, if configured) and caches the
+        result.
+        
+        Args:
+            extra_subscribers: Called with the frame bus of the analysis pass
+                to register other frame consumers on it (e.g. character
+                sampling). When the features do not come from a single
+                whole-video pass (cache, workers, ranges), they get a pass of
+                their own instead.
+        
+        Returns:
+            Feature table for the sampled frames
+        """
+        features = self._load_cached_features()
+        if features is not None:
+            self._run_extra_subscribers(extra_subscribers)
+            return features
+        
+        if self.settings["gameplay_segments"]:
+            self.gameplay_segments = self.detect_gameplay_segments()
+        ranges, label = self.gameplay_segments, "Gameplay"
+        
+        if self.settings["workers"] > 1 or self.settings["coarse_to_fine"]:
+            # Passes start all over the video; a single pass calibrates the
+            # HUD readers as it goes instead
+            self.use_hud_calibration(self.calibrate_hud(self.gameplay_segments))
+        
+        if self.settings["coarse_to_fine"]:
+            self.refine_windows = self.detect_refine_windows()
+            ranges, label = self.refine_windows, "Window"
+        
+        if self.settings["workers"] > 1:
+            # Split the video into segments analyzed by separate processes
+            features = analyze_in_segments(self, self.settings["workers"],
+                                           self.settings["segment_overlap_frames"],
+                                           ranges=ranges)
+        elif ranges is not None:
+            features = self.join_features([
+                self.analyze_segment(start, end, self.settings["segment_overlap_frames"],
+                                     desc=f"{label} {i + 1}/{len(ranges)}")
+                for i, (start, end) in enumerate(ranges)
+            ])
+        else:
+            # Every analysis pass shares one decode of the video
+            bus = self.create_bus()
+            self.subscribe(bus)
+            if extra_subscribers is not None:
+                extra_subscribers(bus)
+                extra_subscribers = None
+            stats = bus.run(desc="Analyzing frames")
+            features = self.feature_extractor.features
+            
+            if "prefetch" in stats:
+                prefetch = stats["prefetch"]
+                print(f"Prefetch: max queue depth {prefetch['max_queue_depth']}/{prefetch['ring_size']}, "
+                      f"decoder stalls {prefetch['producer_stalls']}, analysis stalls {prefetch['consumer_stalls']}")
+        
+        self._run_extra_subscribers(extra_subscribers)
+        self._store_cached_features(features)
+        return features
+    
+    def calibrate_hud(self, ranges: Optional[List[Tuple[int, int]]] = None) -> Dict:
+        """
+        Calibrate the HUD readers in a scan ahead of segment or window extraction
+        
+        The health bars calibrate on the first sampled frame that shows both
+        of them full, and read NaN before it; the timer learns its digit
+        templates from the first countdown it follows. A segment worker or a
+        coarse-to-fine window calibrating on its own would read differently
+        from a single pass depending on where it starts (one starting
+        mid-round could not calibrate until the next round), so this scan
+        calibrates them once and every pass starts from its result.
         
-        print(f"\nAnalyzing {len(frames)} frames...")
+        Only the first hud_calibration_seconds of each range are read.
+        Readers not calibrated by then (no HUD on screen, a meter that never
+        moves, a timer not starting at round_timer_start) are left out and
+        calibrate in each pass as it reads frames.
+        
+        Args:
+            ranges: Only scan these (start_frame, end_frame) ranges (None =
+                the whole video)
+        
+        Returns:
+            GameStateDetector.calibration() for use_hud_calibration()
+        """
+        detector = GameStateDetector(timer_start=self.settings["round_timer_start"], layout=self.hud_layout)
+        scan_frames = int(self.settings["hud_calibration_seconds"] * self.video.fps)
+        for start, end in ranges if ranges is not None else [(0, self.video.frame_count)]:
+            with self.video.stream(sample_rate=self.SAMPLE_RATE, start_frame=start,
+                                   end_frame=min(end, start + scan_frames),
+                                   history_size=0, desc="Calibrating HUD") as frames:
+                for frame_num, frame in frames:
+                    detector.read_hud(frame, frame_num)
+                    if detector.calibrated((frame.shape[1], frame.shape[0])):
+                        return detector.calibration()
+        return detector.calibration()
+    
+    def use_hud_calibration(self, calibration: Dict):
+        """Read the HUD from a calibrate_hud() result (of this or the parent process)"""
+        self.hud_calibration = calibration
+        self.game_state_detector.load_calibration(calibration)
+    
+    def _run_extra_subscribers(self, extra_subscribers: Optional[Callable[[FrameBus], None]]):
+        """Decode the frames extra subscribers need in a pass of their own"""
+        if extra_subscribers is None:
+            return
+        bus = self.create_bus()
+        extra_subscribers(bus)
+        bus.run(desc="Sampling frames")
+    
+    def analyze_segment(self, start_frame: int, end_frame: int, overlap_frames: int = 0,
+                        desc: str = "Analyzing segment") -> FrameFeatures:
+        """
+        Extract features for one segment of the video
+        
+        Frames in the overlap before start_frame are decoded so that the first
+        frames of the segment have a previous frame, but only features for
+        frames in [start_frame, end_frame) are returned.
+        
+        Args:
+            start_frame: First frame owned by this segment
+            end_frame: Frame number the segment stops before
+            overlap_frames: Extra frames decoded before start_frame
+            desc: Progress bar label
+        
+        Returns:
+            Features for the owned frames
+        """
+        bus = self.create_bus()
+        self.subscribe(bus)
+        bus.run(desc=desc, start_frame=max(0, start_frame - overlap_frames), end_frame=end_frame)
+        
+        return self.feature_extractor.features.since(start_frame)
+    
+    def join_features(self, parts: List[FrameFeatures]) -> FrameFeatures:
+        """
+        Join frame-ordered feature tables (segments, ranges) into one
+        
+        Under a memory budget the joined table is spilled and memory-mapped
+        instead of being built in memory.
+        """
+        if self.memory_budget is None:
+            return FrameFeatures.concatenate(parts)
+        
+        spill = self.memory_budget.new_spill()
+        for part in parts:
+            spill.append(part)
+        return spill.load()
+    
+    def _fit_frame_buffers(self):
+        """Shrink the prefetch ring and detector blocks to the memory budget"""
+        prefetch = self.settings["prefetch_frames"]
+        if prefetch:
+            frame_bytes = int(np.prod(self.video.frame_shape))
+            # The ring also holds the look-behind window of previous frames;
+            # if that does not fit, decode on the analysis thread instead
+            minimum_ring = self._max_sample_interval() + 2
+            fit = self.memory_budget.frame_buffers(frame_bytes, max(prefetch, minimum_ring), minimum=minimum_ring)
+            if fit < prefetch:
+                print(f"Memory budget: prefetch ring reduced from {prefetch} to {fit} frames")
+            self.settings["prefetch_frames"] = fit
+        
+        block_size = self.settings["detector_block_size"]
+        if block_size:
+            proxy_bytes = self.proxy.width * self.proxy.height * (1 if self.proxy.grayscale else 3)
+            # The block holds the previous frame as well
+            fit = max(0, self.memory_budget.frame_buffers(proxy_bytes, block_size + 1, minimum=2) - 1)
+            if fit < block_size:
+                print(f"Memory budget: detector blocks reduced from {block_size} to {fit} frames")
+            self.settings["detector_block_size"] = fit
+    
+    def detect_gameplay_segments(self) -> Optional[List[Tuple[int, int]]]:
+        """
+        Find the gameplay parts of the video with a coarse HUD scan
+        
+        Returns:
+            (start_frame, end_frame) ranges, or None if no HUD was found at
+            all (the whole video is analyzed then)
+        """
+        segments = find_gameplay_segments(
+            self.video, self.game_state_detector,
+            sample_fps=self.settings["gameplay_sample_fps"],
+            merge_gap=self.settings["gameplay_merge_gap"],
+            min_length=self.settings["gameplay_min_length"]
+        )
+        if not segments:
+            print("Warning: no in-match HUD found, analyzing the whole video")
+            return None
+        
+        # Start on a sampled frame so sampling matches a whole-video run
+        segments = [(start - start % self.SAMPLE_RATE, end) for start, end in segments]
+        gameplay_frames = sum(end - start for start, end in segments)
+        print(f"Gameplay: {len(segments)} segments, "
+              f"{gameplay_frames / self.video.frame_count:.0%} of the video")
+        return segments
+    
+    def detect_refine_windows(self) -> List[Tuple[int, int]]:
+        """
+        Pick the windows analyzed at full rate with the coarse tier
+        
+        The coarse tier scans the video (or its gameplay segments) with its
+        own sample rate, proxy and thresholds for hit flashes, activity
+        spikes and health drops. The early frames used for starting
+        position detection are always refined.
+        
+        Returns:
+            (start_frame, end_frame) windows, ascending
+        """
+        proxy = FrameProxy(self.video.width, self.video.height, width=self.settings["coarse_proxy_width"],
+                           roi=self.settings["proxy_roi"])
+        detector = MoveDetector(
+            self.character_class,
+            bright_pixel_threshold=proxy.scale_pixel_count(self.settings["coarse_bright_pixel_threshold"])
+        )
+        # HUD readers of their own, so the coarse samples do not move the fine pass's along
+        game_state_detector = GameStateDetector(timer_start=self.settings["round_timer_start"],
+                                                layout=self.hud_layout)
+        if self.hud_calibration is not None:
+            game_state_detector.load_calibration(self.hud_calibration)
+        extractor = FrameFeatureExtractor(detector, game_state_detector,
+                                          skip_static=self.settings["skip_static_frames"],
+                                          block_size=self.settings["detector_block_size"],
+                                          memory_budget=self.memory_budget)
+        
+        sample_rate = self.settings["coarse_sample_rate"]
+        features = coarse_scan(self.video, extractor, proxy, sample_rate,
+                               ranges=self.gameplay_segments, prefetch=self.settings["prefetch_frames"])
+        candidates = find_candidate_frames(features, detector.bright_pixel_threshold,
+                                           spike_factor=self.settings["coarse_activity_spike"],
+                                           health_drop=self.settings["coarse_health_drop"])
+        
+        # The event behind a candidate happened since the previous coarse sample
+        fps = self.video.fps if self.video.fps > 0 else 30.0
+        before = max(sample_rate, int(self.settings["coarse_window_before"] * fps))
+        windows = group_candidate_windows(np.union1d(candidates, self._start_frame_numbers()),
+                                          self.gameplay_segments or [(0, self.video.frame_count)],
+                                          before, int(self.settings["coarse_window_after"] * fps))
+        
+        # Start on a sampled frame so sampling matches a whole-video run
+        windows = [(start - start % self.SAMPLE_RATE, end) for start, end in windows]
+        refined_frames = sum(end - start for start, end in windows)
+        print(f"Coarse scan: {len(candidates)} candidates in {len(features)} samples, "
+              f"{len(windows)} windows ({refined_frames / self.video.frame_count:.0%} of the video) to refine")
+        return windows
+    
+    def create_bus(self) -> FrameBus:
+        """Create a frame bus over this analyzer's video using its settings"""
+        return FrameBus(self.video, prefetch=self.settings["prefetch_frames"], proxy=self.proxy)
+    
+    def subscribe(self, bus: FrameBus):
+        """
+        Register this analyzer's frame consumers on a frame bus
+        
+        Frame consumers only extract per-frame features (see frame_features.py).
+        They are turned into events by build_report(), which lets segments
+        analyzed in separate processes, or features loaded from the cache,
+        be analyzed exactly like a single decode pass.
+        
+        Args:
+            bus: Frame bus that will decode the video
+        """
+        frame_total = len(range(0, self.video.frame_count, self.SAMPLE_RATE))
+        print(f"\nAnalyzing {frame_total} frames...")
+        
+        self.features = None
+        self.feature_extractor.features = FrameFeatures.empty()
+        if frame_total < 10:
+            return
         
-        # Analyze frame sequence
         # In a real implementation, this would detect moves, game states, etc.
         # For now, we'll create a framework that can be extended
+        self.feature_extractor.subscribe(bus, self.SAMPLE_RATE, self._start_frame_numbers(),
+                                         sampler=self.create_sampler())
+    
+    def create_sampler(self) -> Optional[AdaptiveSampler]:
+        """Adaptive sampler for a decode pass, if adaptive sampling is configured"""
+        if not self.settings["adaptive_sampling"]:
+            return None
+        return AdaptiveSampler(
+            self.move_detector.bright_pixel_threshold,
+            base_interval=self.SAMPLE_RATE,
+            min_interval=min(self.settings["adaptive_min_interval"], self.SAMPLE_RATE),
+            max_interval=max(self.settings["adaptive_max_interval"], self.SAMPLE_RATE),
+            hold_frames=self.settings["adaptive_hold_frames"],
+            spike_factor=self.settings["adaptive_spike_factor"],
+            flat_tolerance=self.settings["adaptive_flat_tolerance"]
+        )
+    
+    def _max_sample_interval(self) -> int:
+        """Longest gap between consecutive sampled frames of an analyzed range"""
+        if self.settings["adaptive_sampling"]:
+            return max(self.settings["adaptive_max_interval"], self.SAMPLE_RATE)
+        return self.SAMPLE_RATE
+    
+    def build_report(self) -> Dict:
+        """
+        Build the report from the extracted (or cached) features
         
-        # Simulate some analysis for demonstration
-        self._simulate_analysis(frames)
-        
-        # Generate report
-        report = self._generate_report()
+        Returns:
+            Complete analysis report
+        """
+        if self.features is None:
+            self.features = self.feature_extractor.features
         
-        return report
+        self._apply_observations(self._observe_features(self.features))
+        return self._generate_report()
     
-    def _simulate_analysis(self, frames: List):
+    def _video_data_path(self) -> str:
         """
-        Analyze frames for gameplay events
-        This uses frame analysis to detect patterns and events
+        Base path of the stored per-video data (timeline index, HUD layout)
+        
+        Returns:
+            The video path when stored next to the video, otherwise a path
+            named by the video's content hash in video_data_dir (or
+            feature_cache_dir, or the per-user cache directory)
         """
-        if len(frames) < 10:
+        if self.settings["video_data_next_to_video"]:
+            return self.video_path
+        directory = (self.settings["video_data_dir"] or self.settings["feature_cache_dir"]
+                     or user_cache_dir("video_data"))
+        return os.path.join(directory, video_content_hash(self.video_path)[:20])
+    
+    def _backend_options(self) -> Dict:
+        """Decoder options for the configured decode backend"""
+        if self.settings["decode_backend"] == "ffmpeg":
+            return {"threads": self.settings["decode_threads"]}
+        return {}
+    
+    def feature_params(self) -> Dict:
+        """Everything that changes what feature extraction produces"""
+        params = {
+            "extractor_version": FEATURE_EXTRACTOR_VERSION,
+            "sample_rate": self.SAMPLE_RATE,
+            "frame_count": self.video.frame_count,
+            "proxy_width": self.proxy.width,
+            "proxy_height": self.proxy.height,
+            "proxy_grayscale": self.proxy.grayscale,
+            "proxy_roi": list(self.proxy.roi),
+            "decode_backend": self.video.backend,
+            "skip_static_frames": self.feature_extractor.skip_static,
+            "hud_layout": self.hud_layout.to_dict(),
+            # The timer digits are learned from a countdown starting at this value
+            "round_timer_start": self.settings["round_timer_start"]
+        }
+        if self.settings["gameplay_segments"]:
+            # The analyzed ranges (and start frames) follow from the scan settings
+            params["gameplay_scan"] = {
+                "sample_fps": self.settings["gameplay_sample_fps"],
+                "merge_gap": self.settings["gameplay_merge_gap"],
+                "min_length": self.settings["gameplay_min_length"],
+                "hud_regions": [list(region) for region in self.game_state_detector.health_bar_regions]
+            }
+        else:
+            params["start_frames"] = self._start_frame_numbers()
+        if self.settings["coarse_to_fine"]:
+            params["coarse_scan"] = {
+                key: self.settings[key] for key in (
+                    "coarse_sample_rate", "coarse_proxy_width", "coarse_bright_pixel_threshold",
+                    "coarse_activity_spike", "coarse_health_drop", "coarse_window_before", "coarse_window_after"
+                )
+            }
+        if self.settings["adaptive_sampling"]:
+            params["adaptive_sampling"] = {
+                key: self.settings[key] for key in (
+                    "adaptive_min_interval", "adaptive_max_interval", "adaptive_hold_frames",
+                    "adaptive_spike_factor", "adaptive_flat_tolerance"
+                )
+            }
+        return params
+    
+    def _load_cached_features(self) -> Optional[FrameFeatures]:
+        """Load features from the cache, if one is configured"""
+        if not self.settings["feature_cache_dir"]:
+            return None
+        
+        cache = FeatureCache(self.settings["feature_cache_dir"])
+        features = cache.load(self.video_path, self.feature_params())
+        if features is not None:
+            print(f"Loaded {len(features)} cached frame features (no decoding needed)")
+            # Frame ranges found by the scans of the run that stored them
+            info = cache.load_info(self.video_path, self.feature_params())
+            self.gameplay_segments = self._frame_ranges(info.get("gameplay_segments"))
+            self.refine_windows = self._frame_ranges(info.get("refine_windows"))
+        return features
+    
+    def _store_cached_features(self, features: FrameFeatures):
+        """Save features to the cache, if one is configured"""
+        if not self.settings["feature_cache_dir"]:
             return
         
-        previous_frame = None
-        move_sequences_p1 = []
-        move_sequences_p2 = []
-        last_event_frame_p1 = -100
-        last_event_frame_p2 = -100
+        cache = FeatureCache(self.settings["feature_cache_dir"])
+        entry = cache.store(self.video_path, self.feature_params(), features,
+                            info={"gameplay_segments": self.gameplay_segments,
+                                  "refine_windows": self.refine_windows})
+        print(f"Cached frame features in {entry}")
+    
+    @staticmethod
+    def _frame_ranges(ranges: Optional[List]) -> Optional[List[Tuple[int, int]]]:
+        """Frame ranges read back from JSON as tuples"""
+        return None if ranges is None else [(int(start), int(end)) for start, end in ranges]
+    
+    def _start_frame_numbers(self) -> List[int]:
+        """Early frames (of the first gameplay segment) sampled for starting position detection"""
+        first = self.gameplay_segments[0][0] if self.gameplay_segments else 0
+        return list(range(first, min(first + 30, int(self.video.frame_count)), 5))
+    
+    def _observe_features(self, features: FrameFeatures) -> Dict[str, List]:
+        """
+        Apply detection thresholds to extracted features
         
-        # Analyze frames in chunks to detect events
-        for i, (frame_num, frame) in enumerate(frames):
-            timestamp = self.video.frame_to_timestamp(frame_num)
-            
-            # Detect game state changes
-            round_state = self.game_state_detector.detect_round_state(frame)
-            
-            # Analyze motion and detect potential moves
-            if previous_frame is not None:
-                # Detect hits/blocks
-                hit_block = self.move_detector.detect_hit_or_block(frame, previous_frame)
-                
-                if hit_block:
-                    # Analyze frame differences to determine which player
-                    diff = cv2.absdiff(frame, previous_frame)
-                    left_half = diff[:, :diff.shape[1]//2]
-                    right_half = diff[:, diff.shape[1]//2:]
-                    
-                    left_activity = np.sum(left_half)
-                    right_activity = np.sum(right_half)
-                    
-                    # Determine which player was active
-                    if left_activity > right_activity * 1.2:
-                        player = "player1"
-                        last_event_frame = last_event_frame_p1
-                    elif right_activity > left_activity * 1.2:
-                        player = "player2"
-                        last_event_frame = last_event_frame_p2
-                    else:
-                        player = None
-                        last_event_frame = -100
-                    
-                    # Check if enough frames have passed since last event
-                    frames_since_event = frame_num - last_event_frame
-                    if player and frames_since_event > 30:  # ~0.5 seconds at 60fps
-                        # Record event
-                        self.events.append({
-                            "timestamp": timestamp,
-                            "frame": frame_num,
-                            "type": hit_block,
-                            "player": player,
-                            "description": f"{player} interaction detected"
-                        })
-                        
-                        if player == "player1":
-                            last_event_frame_p1 = frame_num
-                        else:
-                            last_event_frame_p2 = frame_num
-            
-            previous_frame = frame
+        Args:
+            features: Feature table for the sampled frames
         
-        # Add some example analysis based on Blitzcrank-specific gameplay
-        self._analyze_blitzcrank_specific_patterns(frames)
+        Returns:
+            Per-frame observations (lists of tuples starting with the frame
+            number) in frame order, consumed by _apply_observations()
+        """
+        observations = {"interactions": [], "pattern_frames": [], "hitstops": []}
+        if len(features) == 0:
+            return observations
+        
+        hit_players = self._hit_players(features)
+        for row in np.flatnonzero(hit_players):
+            player = "player1" if hit_players[row] == 1 else "player2"
+            observations["interactions"].append((int(features.frames[row]), "hit_or_block", player))
+        
+        # Short freezes right after motion are hitstop; longer ones are pauses,
+        # menus or loading screens
+        for first, last in zip(*features.static_runs()):
+            if first == 0:
+                continue
+            freeze_frame = int(features.frames[first - 1])
+            duration = int(features.frames[last]) - freeze_frame
+            if duration <= self.settings["hitstop_max_frames"]:
+                observations["hitstops"].append((freeze_frame, duration))
+        
+        # Frames sampled at different points in the match for pattern analysis
+        frame_total = len(range(0, self.video.frame_count, self.SAMPLE_RATE))
+        observations["pattern_frames"] = [point * self.SAMPLE_RATE for point in self._pattern_sample_points(frame_total)]
+        
+        return observations
     
-    def _analyze_blitzcrank_specific_patterns(self, frames: List):
-        """Analyze Blitzcrank-specific gameplay patterns"""
-        import random
+    def _hit_players(self, features: FrameFeatures) -> np.ndarray:
+        """
+        Find hits/blocks and the player who was active in each
         
-        # Sample frames at different points in the match
-        sample_points = [
-            len(frames) // 4,
-            len(frames) // 2,
-            3 * len(frames) // 4
+        Returns:
+            Per frame: 1 or 2 for a hit/block by player1 or player2, 0 otherwise
+        """
+        # Detect hits/blocks (bright flashes between consecutive samples)
+        threshold = self.move_detector.bright_pixel_threshold
+        if self.settings["adaptive_sampling"]:
+            # Motion alone brightens more pixels over a longer interval
+            threshold = flash_thresholds(features.frames, threshold, self.SAMPLE_RATE, self._max_sample_interval())
+        hits = features.has_motion & (features.bright_pixels() > threshold)
+        
+        # Determine which player was active
+        return np.where(hits, features.active_side(self.settings["activity_threshold"]), 0)
+    
+    def _apply_observations(self, observations: Dict[str, List]):
+        """
+        Turn collected per-frame observations into events
+        
+        Args:
+            observations: Observations sorted by frame number
+        """
+        last_event_frame = {"player1": -100, "player2": -100}
+        
+        for frame_num, hit_block, player in observations["interactions"]:
+            # Check if enough frames have passed since last event
+            frames_since_event = frame_num - last_event_frame[player]
+            if frames_since_event > self.settings["min_frames_between_events"]:  # ~0.5 seconds at 60fps
+                # Record event
+                self.events.append({
+                    "timestamp": self.video.frame_to_timestamp(frame_num),
+                    "frame": frame_num,
+                    "type": hit_block,
+                    "player": player,
+                    "description": f"{player} interaction detected"
+                })
+                last_event_frame[player] = frame_num
+        
+        for frame_num, duration in observations.get("hitstops", []):
+            self.hitstop_events.append({
+                "timestamp": self.video.frame_to_timestamp(frame_num),
+                "frame": frame_num,
+                "duration_frames": duration
+            })
+        
+        # Add some example analysis based on Blitzcrank-specific gameplay
+        self._analyze_blitzcrank_specific_patterns(observations["pattern_frames"])
+    
+    def _pattern_sample_points(self, frame_total: int) -> List[int]:
+        """Indices into the sampled frame sequence used for pattern analysis"""
+        return [
+            frame_total // 4,
+            frame_total // 2,
+            3 * frame_total // 4
         ]
+    
+    def _analyze_blitzcrank_specific_patterns(self, frame_numbers: List[int]):
+        """
+        Analyze Blitzcrank-specific gameplay patterns
         
-        for point in sample_points:
-            if point < len(frames):
-                frame_num, frame = frames[point]
-                timestamp = self.video.frame_to_timestamp(frame_num)
+        Args:
+            frame_numbers: Frames sampled at different points in the match
+        """
+        import random
+        
+        for frame_num in frame_numbers:
+            timestamp = self.video.frame_to_timestamp(frame_num)
+            
+            # Simulate detection of common Blitzcrank mistakes
+            # In production, this would use actual move detection
+            
+            # Example: Unsafe Rocket Grab
+            if random.random() < 0.3:  # 30% chance to detect issue
+                player = "player1" if random.random() < 0.5 else "player2"
                 
-                # Simulate detection of common Blitzcrank mistakes
-                # In production, this would use actual move detection
+                mistake = {
+                    "timestamp": timestamp,
+                    "type": "unsafe_special",
+                    "move": "5S1",
+                    "severity": "medium",
+                    "description": f"{player} used Rocket Grab (5S1) which can be easily punished on whiff",
+                    "suggestion": "Rocket Grab is risky in neutral. Consider using it after conditioning opponent or with assist cover."
+                }
                 
-                # Example: Unsafe Rocket Grab
-                if random.random() < 0.3:  # 30% chance to detect issue
-                    player = "player1" if random.random() < 0.5 else "player2"
-                    
-                    mistake = {
-                        "timestamp": timestamp,
-                        "type": "unsafe_special",
-                        "move": "5S1",
-                        "severity": "medium",
-                        "description": f"{player} used Rocket Grab (5S1) which can be easily punished on whiff",
-                        "suggestion": "Rocket Grab is risky in neutral. Consider using it after conditioning opponent or with assist cover."
-                    }
-                    
-                    if player == "player1":
-                        self.player1_mistakes.append(mistake)
-                        self.player1_stats["unsafe_moves_used"] += 1
-                    else:
-                        self.player2_mistakes.append(mistake)
-                        self.player2_stats["unsafe_moves_used"] += 1
-                    
-                    self.events.append({
-                        "timestamp": timestamp,
-                        "frame": frame_num,
-                        "type": "unsafe_special",
-                        "player": player,
-                        "move": "5S1",
-                        "description": f"{player} used unsafe Rocket Grab"
-                    })
+                if player == "player1":
+                    self.player1_mistakes.append(mistake)
+                    self.player1_stats["unsafe_moves_used"] += 1
+                else:
+                    self.player2_mistakes.append(mistake)
+                    self.player2_stats["unsafe_moves_used"] += 1
                 
-                # Example: Missed punish opportunity
-                if random.random() < 0.2:  # 20% chance
-                    player = "player1" if random.random() < 0.5 else "player2"
-                    opponent = "player2" if player == "player1" else "player1"
-                    
-                    opportunity = {
-                        "timestamp": timestamp,
-                        "type": "missed_punish",
-                        "description": f"{player} had punish opportunity after {opponent}'s unsafe move but didn't take it",
-                        "suggestion": "When opponent uses unsafe move on block, use fastest normal (5L, 8f startup) to punish"
-                    }
-                    
-                    if player == "player1":
-                        self.player1_opportunities.append(opportunity)
-                        self.player1_stats["punish_opportunities_missed"] += 1
-                    else:
-                        self.player2_opportunities.append(opportunity)
-                        self.player2_stats["punish_opportunities_missed"] += 1
+                self.events.append({
+                    "timestamp": timestamp,
+                    "frame": frame_num,
+                    "type": "unsafe_special",
+                    "player": player,
+                    "move": "5S1",
+                    "description": f"{player} used unsafe Rocket Grab"
+                })
+            
+            # Example: Missed punish opportunity
+            if random.random() < 0.2:  # 20% chance
+                player = "player1" if random.random() < 0.5 else "player2"
+                opponent = "player2" if player == "player1" else "player1"
+                
+                opportunity = {
+                    "timestamp": timestamp,
+                    "type": "missed_punish",
+                    "description": f"{player} had punish opportunity after {opponent}'s unsafe move but didn't take it",
+                    "suggestion": "When opponent uses unsafe move on block, use fastest normal (5L, 8f startup) to punish"
+                }
                 
-                # Example: Good use of Air Purifier
-                if random.random() < 0.15:  # 15% chance
-                    player = "player1" if random.random() < 0.5 else "player2"
-                    
-                    self.events.append({
-                        "timestamp": timestamp,
-                        "frame": frame_num,
-                        "type": "good_move",
-                        "player": player,
-                        "move": "2S1",
-                        "description": f"{player} used Air Purifier (2S1) - safe on block (+44) and good for anti-air"
-                    })
+                if player == "player1":
+                    self.player1_opportunities.append(opportunity)
+                    self.player1_stats["punish_opportunities_missed"] += 1
+                else:
+                    self.player2_opportunities.append(opportunity)
+                    self.player2_stats["punish_opportunities_missed"] += 1
+            
+            # Example: Good use of Air Purifier
+            if random.random() < 0.15:  # 15% chance
+                player = "player1" if random.random() < 0.5 else "player2"
+                
+                self.events.append({
+                    "timestamp": timestamp,
+                    "frame": frame_num,
+                    "type": "good_move",
+                    "player": player,
+                    "move": "2S1",
+                    "description": f"{player} used Air Purifier (2S1) - safe on block (+44) and good for anti-air"
+                })
     
     def _generate_report(self) -> Dict:
         """Generate comprehensive analysis report"""
@@ -271,9 +747,114 @@ class GameplayAnalyzer:
                 "cons": self._get_cons("player2")
             },
             "key_events": self.events,
+            "hitstop_events": self.hitstop_events,
+            "frame_skipping": self._frame_skipping_stats(),
+            "gameplay": self._gameplay_stats(),
+            "coarse_to_fine": self._coarse_to_fine_stats(),
+            "sampling": self._sampling_stats(),
+            "memory": self._memory_stats(),
             "recommendations": self._generate_recommendations()
         }
     
+    def _gameplay_stats(self) -> Optional[Dict]:
+        """Analyzed gameplay ranges, when only gameplay segments were analyzed"""
+        if not self.settings["gameplay_segments"] or self.features is None or len(self.features) == 0:
+            return None
+        
+        # Cache entries stored without scan results: recover them from the sampled frames
+        segments = self._range_entries(self.gameplay_segments or self._analyzed_ranges())
+        gameplay_seconds = sum(s["end"] - s["start"] for s in segments)
+        return {
+            "segments": segments,
+            "gameplay_seconds": round(gameplay_seconds, 2),
+            "gameplay_ratio": round(gameplay_seconds / self.video.duration, 4) if self.video.duration else 0.0
+        }
+    
+    def _coarse_to_fine_stats(self) -> Optional[Dict]:
+        """Windows the coarse tier picked, when only those were analyzed at full rate"""
+        if not self.settings["coarse_to_fine"] or self.features is None or len(self.features) == 0:
+            return None
+        
+        windows = self._range_entries(self.refine_windows or self._analyzed_ranges())
+        refined_seconds = sum(w["end"] - w["start"] for w in windows)
+        return {
+            "coarse_sample_rate": self.settings["coarse_sample_rate"],
+            "windows": windows,
+            "refined_seconds": round(refined_seconds, 2),
+            "refined_ratio": round(refined_seconds / self.video.duration, 4) if self.video.duration else 0.0
+        }
+    
+    def _sampling_stats(self) -> Optional[Dict]:
+        """Schedule the adaptive sampler followed, when adaptive sampling was used"""
+        if not self.settings["adaptive_sampling"] or self.features is None or len(self.features) == 0:
+            return None
+        
+        schedule = sampling_schedule(self.features.frames, self._max_sample_interval())
+        covered_frames = sum(end - start for start, end, _ in schedule)
+        min_interval = min(self.settings["adaptive_min_interval"], self.SAMPLE_RATE)
+        dense_frames = sum(end - start for start, end, interval in schedule if interval <= min_interval)
+        fps = self.video.fps if self.video.fps > 0 else 30.0
+        return {
+            "min_interval": min_interval,
+            "base_interval": self.SAMPLE_RATE,
+            "max_interval": self._max_sample_interval(),
+            "sampled_frames": len(self.features),
+            "mean_interval": round(covered_frames / len(self.features), 2),
+            "dense_seconds": round(dense_frames / fps, 2),
+            # Runs of equal intervals: an event's frame is accurate to its run's interval
+            "schedule": [
+                {**entry, "interval": interval}
+                for entry, (_, _, interval) in zip(self._range_entries([(start, end) for start, end, _ in schedule]),
+                                                   schedule)
+            ]
+        }
+    
+    def _memory_stats(self) -> Dict:
+        """Peak memory of the run, and what the memory budget spilled"""
+        megabytes = lambda count: round(count / (1024 * 1024), 1) if count is not None else None
+        stats = {
+            "budget_mb": self.settings["memory_budget_mb"] or None,
+            "peak_rss_mb": megabytes(peak_rss_bytes())
+        }
+        if self.settings["workers"] > 1:
+            stats["peak_rss_worker_mb"] = megabytes(peak_rss_bytes(children=True))
+        if self.memory_budget is not None:
+            stats["spilled_mb"] = megabytes(self.memory_budget.spilled_bytes())
+            stats["feature_rows_in_memory"] = self.memory_budget.feature_rows
+            stats["prefetch_frames"] = self.settings["prefetch_frames"]
+            stats["detector_block_size"] = self.settings["detector_block_size"]
+        return stats
+    
+    def _analyzed_ranges(self) -> List[Tuple[int, int]]:
+        """Contiguous frame ranges covered by the sampled frames"""
+        frames = np.asarray(self.features.frames, dtype=np.int64)
+        breaks = np.flatnonzero(np.diff(frames) > self._max_sample_interval())
+        starts = np.concatenate([[0], breaks + 1])
+        ends = np.concatenate([breaks, [len(frames) - 1]])
+        return [(int(frames[first]), int(frames[last]) + self.SAMPLE_RATE) for first, last in zip(starts, ends)]
+    
+    def _range_entries(self, ranges: List[Tuple[int, int]]) -> List[Dict]:
+        """Frame ranges as report entries with timestamps"""
+        return [
+            {
+                "start": self.video.frame_to_timestamp(start_frame),
+                "end": self.video.frame_to_timestamp(min(end_frame, self.video.frame_count)),
+                "start_frame": start_frame,
+                "end_frame": end_frame
+            }
+            for start_frame, end_frame in ranges
+        ]
+    
+    def _frame_skipping_stats(self) -> Dict:
+        """How many sampled frames were unchanged and skipped by the detectors"""
+        sampled = len(self.features) if self.features is not None else 0
+        static = int(np.count_nonzero(self.features.static)) if sampled else 0
+        return {
+            "sampled_frames": sampled,
+            "static_frames": static,
+            "skipped_ratio": round(static / sampled, 4) if sampled else 0.0
+        }
+    
     def _analyze_playstyle(self, player: str) -> str:
         """Analyze player's playstyle based on detected patterns"""
         if player == "player1":
@@ -376,6 +957,29 @@ class GameplayAnalyzer:
         print(f"\nVideo: {report['video_info']['path']}")
         print(f"Duration: {report['video_info']['duration']:.2f}s")
         print(f"Matchup: {report['matchup']['character1']} vs {report['matchup']['character2']} ({report['matchup']['type']})")
+        gameplay = report.get('gameplay')
+        if gameplay:
+            print(f"Gameplay analyzed: {gameplay['gameplay_seconds']:.1f}s in {len(gameplay['segments'])} segments "
+                  f"({gameplay['gameplay_ratio']:.0%} of the video)")
+        coarse = report.get('coarse_to_fine')
+        if coarse:
+            print(f"Refined at full rate: {coarse['refined_seconds']:.1f}s in {len(coarse['windows'])} windows "
+                  f"({coarse['refined_ratio']:.0%} of the video)")
+        sampling = report.get('sampling')
+        if sampling:
+            print(f"Adaptive sampling: {sampling['sampled_frames']} frames, mean interval "
+                  f"{sampling['mean_interval']:.1f} ({sampling['min_interval']}-{sampling['max_interval']}), "
+                  f"{sampling['dense_seconds']:.1f}s sampled densely")
+        memory = report.get('memory')
+        if memory and memory['peak_rss_mb'] is not None:
+            budget = ""
+            if memory['budget_mb']:
+                budget = f" (budget {memory['budget_mb']:.0f} MB, {memory['spilled_mb']:.1f} MB spilled to disk)"
+            print(f"Peak memory: {memory['peak_rss_mb']:.0f} MB{budget}")
+        skipping = report.get('frame_skipping')
+        if skipping:
+            print(f"Unchanged frames skipped: {skipping['static_frames']}/{skipping['sampled_frames']} "
+                  f"({skipping['skipped_ratio']:.1%}), hitstop events: {len(report.get('hitstop_events', []))}")
         
         print("\n" + "-"*80)
         print("PLAYER 1 ANALYSIS")
@@ -461,20 +1065,96 @@ class GameplayAnalyzer:
     def close(self):
         """Clean up resources"""
         self.video.close()
+        if self.memory_budget is not None:
+            # Tables mapped from the spill files go with them
+            self.features = None
+            self.feature_extractor.features = None
+            self.memory_budget.cleanup()
+
+
+def run_live(args):
+    """Analyze a live source given on the command line, printing events as they happen"""
+    width, height = (int(n) for n in args.live_size.lower().split("x")) if args.live_size else (0, 0)
+    source = open_live_source(args.live, width, height, args.live_fps,
+                              poll_interval=ANALYSIS_SETTINGS["live_poll_interval"],
+                              idle_timeout=ANALYSIS_SETTINGS["live_idle_timeout"])
+    
+    def print_event(event: Dict):
+        minutes, seconds = divmod(int(event["timestamp"]), 60)
+        print(f"  [{minutes:02d}:{seconds:02d}] {event['type'].upper()}: {event['description']} "
+              f"(latency {event.get('latency', 0) * 1000:.0f} ms)")
+    
+    live = LiveAnalyzer(source, args.character, on_event=print_event, sample_rate=GameplayAnalyzer.SAMPLE_RATE)
+    print(f"Live analysis of {args.live} ({source.width}x{source.height}), Ctrl+C to stop...")
+    stats = live.run()
+    
+    print(f"\nAnalyzed {stats['frames_processed']}/{stats['frames_sampled']} sampled frames, "
+          f"dropped {stats['frames_dropped']} ({stats['drop_ratio']:.1%}), "
+          f"mean latency {stats['mean_latency'] * 1000:.0f} ms, {stats['events']} events")
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"live_stats": stats, "key_events": live.events}, f, indent=2)
+        print(f"\nReport saved to: {args.output}")
 
 
 def main():
     """Main entry point"""
     parser = argparse.ArgumentParser(description="2XKO Gameplay Analyzer")
-    parser.add_argument("--video", "-v", required=True, help="Path to video file")
+    parser.add_argument("--video", "-v", help="Path to video file")
     parser.add_argument("--matchup", "-m", default="mirror", choices=["mirror"], help="Matchup type")
     parser.add_argument("--character", "-c", default="Blitzcrank", help="Character name")
     parser.add_argument("--output", "-o", help="Output JSON file path")
+    parser.add_argument("--prefetch", type=int, default=ANALYSIS_SETTINGS["prefetch_frames"],
+                        help="Decode on a background thread with this many buffered frames (0 = off)")
+    parser.add_argument("--workers", "-w", type=int, default=ANALYSIS_SETTINGS["workers"],
+                        help="Analyze time segments in this many worker processes")
+    parser.add_argument("--feature-cache", default=ANALYSIS_SETTINGS["feature_cache_dir"],
+                        help="Cache extracted frame features in this directory; re-runs skip decoding")
+    parser.add_argument("--gameplay-only", action="store_true", default=ANALYSIS_SETTINGS["gameplay_segments"],
+                        help="Scan for the in-match HUD first and skip menus, loading screens and replays")
+    parser.add_argument("--coarse-to-fine", action="store_true", default=ANALYSIS_SETTINGS["coarse_to_fine"],
+                        help="Scan sparsely for hits/activity spikes first and only analyze those windows at full rate")
+    parser.add_argument("--adaptive-sampling", action="store_true", default=ANALYSIS_SETTINGS["adaptive_sampling"],
+                        help="Sample sparsely while the screen is calm and every frame around spikes and hit flashes")
+    parser.add_argument("--memory-budget", type=float, default=ANALYSIS_SETTINGS["memory_budget_mb"],
+                        help="Memory budget in MB for frame buffers and feature tables (0 = no limit)")
+    parser.add_argument("--spill-dir", default=ANALYSIS_SETTINGS["spill_dir"],
+                        help="Directory for feature tables spilled under the memory budget")
+    parser.add_argument("--decode-backend", default=ANALYSIS_SETTINGS["decode_backend"], choices=["opencv", "ffmpeg"],
+                        help="Video decoder (ffmpeg falls back to OpenCV if not installed)")
+    parser.add_argument("--hud-profile", default=ANALYSIS_SETTINGS["hud_profile"],
+                        help="HUD layout profile from hud_profiles/, e.g. 16x9 or 21x9 (default: detect per video)")
+    parser.add_argument("--live", help="Analyze live: capture device index, - for raw BGR frames on stdin, "
+                                       "or a video file that is still being recorded")
+    parser.add_argument("--live-size", help="Frame size of raw stdin frames, e.g. 1280x720")
+    parser.add_argument("--live-fps", type=float, default=60.0, help="Frame rate of raw stdin frames")
     
     args = parser.parse_args()
+    if not args.video and not args.live:
+        parser.error("one of --video or --live is required")
+    
+    if args.live:
+        try:
+            run_live(args)
+        except Exception as e:
+            print(f"Error: {e}")
+        return
+    
+    if args.prefetch and args.adaptive_sampling:
+        print("Note: the adaptive sampling pass decodes on the analysis thread; --prefetch only applies to other passes")
     
     try:
-        analyzer = GameplayAnalyzer(args.video, args.matchup, args.character)
+        analyzer = GameplayAnalyzer(args.video, args.matchup, args.character,
+                                    settings={"prefetch_frames": args.prefetch, "workers": args.workers,
+                                              "feature_cache_dir": args.feature_cache,
+                                              "decode_backend": args.decode_backend,
+                                              "gameplay_segments": args.gameplay_only,
+                                              "coarse_to_fine": args.coarse_to_fine,
+                                              "adaptive_sampling": args.adaptive_sampling,
+                                              "memory_budget_mb": args.memory_budget,
+                                              "spill_dir": args.spill_dir,
+                                              "hud_profile": args.hud_profile})
         report = analyzer.analyze()
         analyzer.print_report(report)
         
@@ -482,7 +1162,7 @@ def main():
             analyzer.save_report(report, args.output)
         
         analyzer.close()
-        
+    
     except Exception as e:
         print(f"Error: {e}")
         import traceback
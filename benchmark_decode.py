@@ -0,0 +1,279 @@
+"""
+Benchmark video decode throughput for the different sampling modes.
+
+Compares full decoding of every frame (read()) against skip-decode sampling
+(grab() every frame, retrieve() only sampled ones) at several sample rates.
+With --backends, also compares the cv2.VideoCapture decoder against the
+ffmpeg rawvideo pipe, both at full resolution and producing the grayscale
+analysis proxy. With --frame-workers, compares handing frames to worker
+processes by pickling them against shared-memory slots. With
+--detector-blocks, compares computing motion features one frame pair at a
+time against whole blocks of proxy frames. If no videos are given,
+synthetic 720p and 1080p clips are generated.
+
+Usage:
+    python benchmark_decode.py
+    python benchmark_decode.py --video match.mp4 --rates 1 2 4 8
+    python benchmark_decode.py --video match.mp4 --target-fps 10
+    python benchmark_decode.py --video match.mp4 --backends --threads 4
+    python benchmark_decode.py --video match.mp4 --frame-workers 4
+    python benchmark_decode.py --video match.mp4 --detector-blocks 4 16 64
+"""
+
+import argparse
+import itertools
+import multiprocessing
+import os
+import tempfile
+import time
+import cv2
+import numpy as np
+from typing import Dict, List, Optional
+from video_processor import VideoProcessor
+from frame_proxy import FrameProxy
+from ffmpeg_capture import ffmpeg_available
+from shared_frames import SharedFrameWorkers
+from move_detector import MoveDetector
+from character_data import BlitzcrankData
+
+
+def create_synthetic_video(path: str, width: int, height: int,
+                           seconds: float = 5.0, fps: float = 30.0) -> str:
+    """Write a synthetic clip with moving shapes and periodic flashes"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0, 40, size=(height, width, 3), dtype=np.uint8)
+    
+    for i in range(int(seconds * fps)):
+        frame = noise.copy()
+        x1 = int(width * 0.25 + width * 0.05 * np.sin(i / 10))
+        x2 = int(width * 0.75 + width * 0.05 * np.cos(i / 7))
+        cv2.rectangle(frame, (x1 - 60, height // 3), (x1 + 60, height - 60), (200, 100, 50), -1)
+        cv2.rectangle(frame, (x2 - 60, height // 3), (x2 + 60, height - 60), (50, 100, 200), -1)
+        if i % 45 == 0:
+            cv2.circle(frame, (width // 2, height // 2), height // 8, (255, 255, 255), -1)
+        writer.write(frame)
+    
+    writer.release()
+    return path
+
+
+def time_stream(video: VideoProcessor, sample_rate: int = 1,
+                target_fps: Optional[float] = None, skip_decode: bool = True) -> Dict:
+    """Consume one full stream and measure throughput"""
+    start = time.perf_counter()
+    yielded = 0
+    with video.stream(sample_rate=sample_rate, target_fps=target_fps, history_size=0,
+                      desc=None, skip_decode=skip_decode) as frames:
+        for _ in frames:
+            yielded += 1
+    elapsed = time.perf_counter() - start
+    
+    return {
+        "seconds": elapsed,
+        "frames_yielded": yielded,
+        "source_fps": video.frame_count / elapsed if elapsed > 0 else 0,
+        "analysis_fps": yielded / elapsed if elapsed > 0 else 0
+    }
+
+
+def benchmark_video(path: str, rates: List[int], target_fps: Optional[float] = None):
+    """Print a throughput table for one video"""
+    video = VideoProcessor(path)
+    print(f"\n{os.path.basename(path)}: {video.width}x{video.height}, {video.frame_count} frames")
+    print(f"{'mode':<20} {'rate':>6} {'yielded':>8} {'time (s)':>9} {'src fps':>9} {'speedup':>8}")
+    print("-" * 64)
+    
+    modes = [("read()", False), ("grab()/retrieve()", True)]
+    for rate in rates:
+        baseline = None
+        for name, skip_decode in modes:
+            result = time_stream(video, sample_rate=rate, skip_decode=skip_decode)
+            if baseline is None:
+                baseline = result["seconds"]
+            speedup = baseline / result["seconds"] if result["seconds"] > 0 else 0
+            print(f"{name:<20} {rate:>6} {result['frames_yielded']:>8} {result['seconds']:>9.2f} "
+                  f"{result['source_fps']:>9.1f} {speedup:>7.2f}x")
+    
+    if target_fps:
+        result = time_stream(video, target_fps=target_fps)
+        print(f"{'target_fps=' + str(target_fps):<20} {'-':>6} {result['frames_yielded']:>8} "
+              f"{result['seconds']:>9.2f} {result['source_fps']:>9.1f}")
+    
+    video.close()
+
+
+def time_backend(path: str, backend: str, backend_options: Optional[Dict] = None,
+                 proxy: Optional[FrameProxy] = None) -> Dict:
+    """Decode every frame with a backend (optionally building the proxy) and measure throughput"""
+    video = VideoProcessor(path, backend=backend, backend_options=backend_options)
+    start = time.perf_counter()
+    decoded = 0
+    with video.stream(history_size=0, desc=None) as frames:
+        for _, frame in frames:
+            if proxy is not None:
+                proxy.make(frame)
+            decoded += 1
+    elapsed = time.perf_counter() - start
+    shape = video.frame_shape
+    video.close()
+    
+    return {
+        "seconds": elapsed,
+        "frames": decoded,
+        "fps": decoded / elapsed if elapsed > 0 else 0,
+        "shape": shape
+    }
+
+
+def benchmark_backends(path: str, proxy_width: int = 480, threads: int = 0):
+    """Print a throughput table comparing the OpenCV and ffmpeg decode backends"""
+    video = VideoProcessor(path)
+    width, height = video.width, video.height
+    video.close()
+    proxy = FrameProxy(width, height, width=proxy_width, grayscale=True)
+    
+    runs = [
+        ("opencv bgr", "opencv", None, None),
+        (f"opencv + {proxy_width}px gray proxy", "opencv", None, proxy)
+    ]
+    if ffmpeg_available():
+        runs += [
+            ("ffmpeg bgr24", "ffmpeg", {"threads": threads}, None),
+            (f"ffmpeg {proxy_width}px gray", "ffmpeg",
+             {"threads": threads, "width": proxy_width, "pixel_format": "gray"}, None)
+        ]
+    else:
+        print("ffmpeg not found on PATH, only the OpenCV backend is measured")
+    
+    print(f"\n{os.path.basename(path)}: decode backends")
+    print(f"{'backend':<28} {'frame shape':>16} {'frames':>7} {'time (s)':>9} {'fps':>8} {'speedup':>8}")
+    print("-" * 81)
+    
+    baseline = None
+    for name, backend, options, run_proxy in runs:
+        result = time_backend(path, backend, options, run_proxy)
+        if baseline is None:
+            baseline = result["seconds"]
+        speedup = baseline / result["seconds"] if result["seconds"] > 0 else 0
+        shape = (run_proxy.height, run_proxy.width) if run_proxy else result["shape"]
+        shape = "x".join(str(n) for n in shape)
+        print(f"{name:<28} {shape:>16} {result['frames']:>7} {result['seconds']:>9.2f} "
+              f"{result['fps']:>8.1f} {speedup:>7.2f}x")
+
+
+def frame_difference(frame_num: int, frame: np.ndarray, previous_frame: Optional[np.ndarray]) -> int:
+    """Per-frame work for the handoff benchmark (summed absolute difference)"""
+    if previous_frame is None:
+        return 0
+    return int(cv2.absdiff(frame, previous_frame).sum())
+
+
+def _frame_difference_task(task) -> int:
+    """Pool.imap adapter for frame_difference"""
+    return frame_difference(*task)
+
+
+def benchmark_frame_workers(path: str, workers: int, sample_rate: int = 1):
+    """Print a table comparing pickled and shared-memory frame handoff to worker processes"""
+    video = VideoProcessor(path)
+    print(f"\n{os.path.basename(path)}: frame handoff to {workers} worker processes")
+    print(f"{'transport':<20} {'frames':>7} {'time (s)':>9} {'fps':>8} {'speedup':>8}")
+    print("-" * 56)
+    
+    def pickled_tasks():
+        with video.stream(sample_rate=sample_rate, desc=None) as frames:
+            for frame_num, frame in frames:
+                yield frame_num, frame, frames.previous_frame
+    
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers) as pool:
+        pickled = list(pool.imap(_frame_difference_task, pickled_tasks(), chunksize=1))
+    pickled_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    with SharedFrameWorkers(frame_difference, video.frame_shape, workers=workers) as shared_workers:
+        shared = [result for _, result in shared_workers.run(video, sample_rate=sample_rate)]
+    shared_seconds = time.perf_counter() - start
+    video.close()
+    
+    if shared != pickled:
+        print("Warning: shared-memory results differ from pickled results")
+    for name, seconds in (("pickled frames", pickled_seconds), ("shared memory", shared_seconds)):
+        fps = len(shared) / seconds if seconds > 0 else 0
+        speedup = pickled_seconds / seconds if seconds > 0 else 0
+        print(f"{name:<20} {len(shared):>7} {seconds:>9.2f} {fps:>8.1f} {speedup:>7.2f}x")
+
+
+def benchmark_detector_blocks(path: str, block_sizes: List[int], proxy_width: int = 480,
+                              max_frames: int = 600):
+    """Print a table comparing per-frame and block motion feature extraction on proxy frames"""
+    video = VideoProcessor(path)
+    proxy = FrameProxy(video.width, video.height, width=proxy_width)
+    with video.stream(desc=None) as frames:
+        proxies = np.stack([proxy.make(frame) for _, frame in itertools.islice(frames, max_frames)])
+    video.close()
+    
+    detector = MoveDetector(BlitzcrankData)
+    pairs = len(proxies) - 1
+    print(f"\n{os.path.basename(path)}: motion features for {pairs} {proxy.width}x{proxy.height} proxy frame pairs")
+    print(f"{'mode':<20} {'time (s)':>9} {'pairs/s':>9} {'speedup':>8}")
+    print("-" * 49)
+    
+    start = time.perf_counter()
+    for i in range(1, len(proxies)):
+        detector.extract_motion_features(proxies[i], proxies[i - 1])
+    single_seconds = time.perf_counter() - start
+    print(f"{'per frame':<20} {single_seconds:>9.3f} {pairs / single_seconds:>9.0f} {1.0:>7.2f}x")
+    
+    for block_size in block_sizes:
+        start = time.perf_counter()
+        for first in range(1, len(proxies), block_size):
+            detector.extract_motion_features_block(proxies[first:first + block_size], proxies[first - 1])
+        seconds = time.perf_counter() - start
+        print(f"{'block of ' + str(block_size):<20} {seconds:>9.3f} {pairs / seconds:>9.0f} "
+              f"{single_seconds / seconds:>7.2f}x")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark video decode throughput")
+    parser.add_argument("--video", "-v", action="append", help="Video file to benchmark (repeatable)")
+    parser.add_argument("--rates", type=int, nargs="+", default=[1, 2, 4, 8], help="Sample rates to test")
+    parser.add_argument("--target-fps", type=float, help="Also test time-based sampling at this rate")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Length of synthetic clips")
+    parser.add_argument("--backends", action="store_true", help="Also compare the OpenCV and ffmpeg decoders")
+    parser.add_argument("--threads", type=int, default=0, help="ffmpeg decoder threads (0 = automatic)")
+    parser.add_argument("--frame-workers", type=int, default=0,
+                        help="Also compare pickled and shared-memory frame handoff to this many worker processes")
+    parser.add_argument("--detector-blocks", type=int, nargs="+",
+                        help="Also compare per-frame and block motion features at these block sizes")
+    
+    args = parser.parse_args()
+    
+    videos = args.video
+    tmp_dir = None
+    if not videos:
+        tmp_dir = tempfile.TemporaryDirectory()
+        print("Generating synthetic 720p and 1080p clips...")
+        videos = [
+            create_synthetic_video(os.path.join(tmp_dir.name, "synthetic_720p.mp4"), 1280, 720, args.seconds),
+            create_synthetic_video(os.path.join(tmp_dir.name, "synthetic_1080p.mp4"), 1920, 1080, args.seconds)
+        ]
+    
+    try:
+        for path in videos:
+            benchmark_video(path, args.rates, args.target_fps)
+            if args.backends:
+                benchmark_backends(path, threads=args.threads)
+            if args.frame_workers:
+                benchmark_frame_workers(path, args.frame_workers)
+            if args.detector_blocks:
+                benchmark_detector_blocks(path, args.detector_blocks)
+    finally:
+        if tmp_dir:
+            tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,33 +4,94 @@ Character identification module for extracting player information.
 
 import cv2
 import numpy as np
-from typing import Dict, Tuple, Optional, List
+from typing import Dict, Tuple, Optional, List, Iterator
 from collections import Counter
 import os
+from frame_bus import FrameBus, FrameSubscriber
+from video_processor import VideoProcessor
+from hud_layout import HudLayout, crop, load_or_detect_layout
 
 
 class CharacterIdentifier:
     """Identifies and extracts character information from gameplay"""
     
-    def __init__(self, video_path: str):
+    def __init__(self, video_path: str, layout: Optional[HudLayout] = None):
         """
         Initialize character identifier
         
         Args:
             video_path: Path to video file
+            layout: HUD layout of the video (None = detect it)
         """
         self.video_path = video_path
-        self.cap = cv2.VideoCapture(video_path)
-        
-        if not self.cap.isOpened():
-            raise ValueError(f"Could not open video: {video_path}")
+        self.video = VideoProcessor(video_path)
+        self.cap = self.video.cap
+        
+        self.width = self.video.width
+        self.height = self.video.height
+        self.hud_layout = layout if layout is not None else load_or_detect_layout(self.video)
+        
+        # Player regions (left and right sides of the game picture)
+        gx, gy, gw, gh = self.hud_layout.game_area
+        x, y = int(gx * self.width), int(gy * self.height)
+        w, h = int(gw * self.width), int(gh * self.height)
+        self.player1_region = (x, y, w // 2, h)
+        self.player2_region = (x + w // 2, y, w // 2, h)
+    
+    def subscribe(self, bus: FrameBus, image_samples: int = 10, username_samples: int = 5):
+        """
+        Register character image and username sampling on a shared frame bus
         
-        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        After the bus has run, results are available in self.character_images
+        and self.usernames without decoding the video again.
         
-        # Player regions (left and right sides)
-        self.player1_region = (0, 0, self.width // 2, self.height)
-        self.player2_region = (self.width // 2, 0, self.width // 2, self.height)
+        Args:
+            bus: Frame bus that will decode the video
+            image_samples: Number of frames to sample for character images
+            username_samples: Number of frames to sample for usernames
+        """
+        self.character_images = {}
+        self.usernames = {"player1": None, "player2": None}
+        self._sampled_images = {"player1": [], "player2": []}
+        self._sampled_names = {"player1": [], "player2": []}
+        
+        bus.subscribe(FrameSubscriber("character_images", self._on_image_frame,
+                                      frame_numbers=self._image_sample_indices(image_samples),
+                                      on_finish=self._finish_character_images))
+        bus.subscribe(FrameSubscriber("usernames", self._on_username_frame,
+                                      frame_numbers=self._username_sample_indices(username_samples),
+                                      on_finish=self._finish_usernames))
+    
+    def _on_image_frame(self, frame_num: int, frame: np.ndarray, previous_frame: Optional[np.ndarray]):
+        """Frame bus callback for character image sampling"""
+        self._add_character_images(frame, self._sampled_images)
+    
+    def _on_username_frame(self, frame_num: int, frame: np.ndarray, previous_frame: Optional[np.ndarray]):
+        """Frame bus callback for username sampling"""
+        self._add_usernames(frame, self._sampled_names)
+    
+    def _finish_character_images(self):
+        """Pick representative images once all samples have arrived"""
+        self.character_images = self._pick_character_images(self._sampled_images)
+        self._sampled_images = {"player1": [], "player2": []}
+    
+    def _finish_usernames(self):
+        """Pick most common usernames once all samples have arrived"""
+        self.usernames = self._pick_usernames(self._sampled_names)
+    
+    def _read_frames(self, frame_indices) -> Iterator[np.ndarray]:
+        """Read the given frames in frame order (read-only, see VideoProcessor.get_frame)"""
+        yield from self.video.get_frames(frame_indices).values()
+    
+    def _image_sample_indices(self, num_samples: int) -> np.ndarray:
+        """Frames sampled for character images (middle half of the video)"""
+        total_frames = self.video.frame_count
+        return np.linspace(total_frames // 4, 3 * total_frames // 4, num_samples, dtype=int)
+    
+    def _username_sample_indices(self, num_samples: int) -> np.ndarray:
+        """Frames sampled for username detection (whole video)"""
+        total_frames = self.video.frame_count
+        return np.linspace(0, total_frames - 1, num_samples, dtype=int)
     
     def extract_character_images(self, num_samples: int = 10) -> Dict[str, np.ndarray]:
         """
@@ -42,33 +103,26 @@ class CharacterIdentifier:
         Returns:
             Dictionary with player1 and player2 character images
         """
-        total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        sample_indices = np.linspace(total_frames // 4, 3 * total_frames // 4, num_samples, dtype=int)
-        
-        player1_images = []
-        player2_images = []
-        
-        for frame_idx in sample_indices:
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-            ret, frame = self.cap.read()
-            if not ret:
-                continue
-            
-            # Extract character regions
-            p1_img = self._extract_character_region(frame, "player1")
-            p2_img = self._extract_character_region(frame, "player2")
-            
-            if p1_img is not None:
-                player1_images.append(p1_img)
-            if p2_img is not None:
-                player2_images.append(p2_img)
+        images = {"player1": [], "player2": []}
+        for frame in self._read_frames(self._image_sample_indices(num_samples)):
+            self._add_character_images(frame, images)
         
-        # Get representative images (middle frame)
+        return self._pick_character_images(images)
+    
+    def _add_character_images(self, frame: np.ndarray, images: Dict[str, List[np.ndarray]]):
+        """Extract character regions from a sampled frame"""
+        for player in ["player1", "player2"]:
+            img = self._extract_character_region(frame, player)
+            if img is not None:
+                # Copy so the full frame is not kept alive by the crop
+                images[player].append(img.copy())
+    
+    def _pick_character_images(self, images: Dict[str, List[np.ndarray]]) -> Dict[str, np.ndarray]:
+        """Get representative images (middle frame)"""
         result = {}
-        if player1_images:
-            result["player1"] = player1_images[len(player1_images) // 2]
-        if player2_images:
-            result["player2"] = player2_images[len(player2_images) // 2]
+        for player, player_images in images.items():
+            if player_images:
+                result[player] = player_images[len(player_images) // 2]
         
         return result
     
@@ -149,61 +203,36 @@ class CharacterIdentifier:
             Dictionary with player1 and player2 usernames
         """
         # Sample frames from different parts of video
-        total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        sample_indices = np.linspace(0, total_frames - 1, num_samples, dtype=int)
-        
-        player1_names = []
-        player2_names = []
-        
-        for frame_idx in sample_indices:
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-            ret, frame = self.cap.read()
-            if not ret:
-                continue
-            
-            # Try to extract usernames from HUD regions
-            # Typically usernames are in top corners or above health bars
-            p1_name = self._extract_username_from_region(frame, "player1")
-            p2_name = self._extract_username_from_region(frame, "player2")
-            
-            if p1_name:
-                player1_names.append(p1_name)
-            if p2_name:
-                player2_names.append(p2_name)
+        names = {"player1": [], "player2": []}
+        for frame in self._read_frames(self._username_sample_indices(num_samples)):
+            self._add_usernames(frame, names)
         
-        # Get most common username
+        return self._pick_usernames(names)
+    
+    def _add_usernames(self, frame: np.ndarray, names: Dict[str, List[str]]):
+        """Try to extract usernames from the HUD regions of a sampled frame"""
+        # Typically usernames are in top corners or above health bars
+        for player in ["player1", "player2"]:
+            name = self._extract_username_from_region(frame, player)
+            if name:
+                names[player].append(name)
+    
+    def _pick_usernames(self, names: Dict[str, List[str]]) -> Dict[str, Optional[str]]:
+        """Get most common username for each player"""
         result = {}
-        if player1_names:
-            result["player1"] = Counter(player1_names).most_common(1)[0][0]
-        else:
-            result["player1"] = None
-        
-        if player2_names:
-            result["player2"] = Counter(player2_names).most_common(1)[0][0]
-        else:
-            result["player2"] = None
+        for player in ["player1", "player2"]:
+            if names.get(player):
+                result[player] = Counter(names[player]).most_common(1)[0][0]
+            else:
+                result[player] = None
         
         return result
     
     def _extract_username_from_region(self, frame: np.ndarray, player: str) -> Optional[str]:
         """Extract username from HUD region with improved preprocessing"""
-        # Try multiple HUD regions where usernames might appear
-        regions_to_try = []
-        
-        if player == "player1":
-            # Top-left regions
-            regions_to_try = [
-                frame[0:80, 0:self.width//4],  # Top-left corner
-                frame[0:120, 0:self.width//3],  # Slightly wider
-                frame[50:150, 0:self.width//4],  # Below top
-            ]
-        else:
-            # Top-right regions
-            regions_to_try = [
-                frame[0:80, 3*self.width//4:self.width],  # Top-right corner
-                frame[0:120, 2*self.width//3:self.width],  # Slightly wider
-                frame[50:150, 3*self.width//4:self.width],  # Below top
-            ]
+        # The username area of the video's HUD layout profile
+        player1_region, player2_region = self.hud_layout.username_regions
+        regions_to_try = [crop(frame, player1_region if player == "player1" else player2_region)]
         
         # Try OCR on each region
         for hud_region in regions_to_try:
@@ -266,5 +295,4 @@ class CharacterIdentifier:
     
     def close(self):
         """Release video capture"""
-        if self.cap:
-            self.cap.release()
+        self.video.close()
@@ -28,7 +28,7 @@ class ClipGenerator:
         if not self.cap.isOpened():
             raise ValueError(f"Could not open video: {video_path}")
         
-        self.fps = int(self.cap.get(cv2.CAP_PROP_FPS))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
         self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         
@@ -0,0 +1,116 @@
+"""
+Two-tier (coarse-to-fine) analysis.
+
+Most of a match is neutral footage where nothing worth precise timing
+happens. The coarse tier samples the video sparsely (every few frames) on
+a very small proxy with its own detector and thresholds, and only looks
+for candidates: hit flashes, activity spikes well above the video's usual
+level, and health drops. Every candidate becomes a window around it, and
+the fine tier (the analyzer's normal detectors, at the normal sample rate
+and proxy) only decodes those windows.
+
+The coarse tier still grabs every frame, but retrieves and analyzes only
+its samples, so it costs about one grab pass of the video; the fine tier
+then scales with how much of the video is action.
+"""
+
+import bisect
+import numpy as np
+from typing import List, Optional, Sequence, Tuple
+from frame_bus import FrameBus
+from frame_features import FrameFeatures, FrameFeatureExtractor
+from frame_proxy import FrameProxy
+from video_processor import VideoProcessor
+
+
+def coarse_scan(video: VideoProcessor, extractor: FrameFeatureExtractor, proxy: FrameProxy,
+                sample_rate: int, ranges: Optional[Sequence[Tuple[int, int]]] = None,
+                prefetch: int = 0) -> FrameFeatures:
+    """
+    Extract coarse features for a video
+    
+    Args:
+        video: Video to scan
+        extractor: Feature extractor using the coarse detectors
+        proxy: Coarse analysis proxy
+        sample_rate: Extract features for every Nth frame
+        ranges: Only scan these (start_frame, end_frame) ranges (None = the
+            whole video)
+        prefetch: Background decode ring size (0 = off)
+    
+    Returns:
+        Coarse feature table
+    """
+    parts = []
+    for i, (start, end) in enumerate(ranges or [(0, video.frame_count)]):
+        bus = FrameBus(video, prefetch=prefetch, proxy=proxy)
+        extractor.subscribe(bus, sample_rate, [])
+        label = "Coarse scan" if ranges is None else f"Coarse scan {i + 1}/{len(ranges)}"
+        bus.run(desc=label, start_frame=start, end_frame=end)
+        parts.append(extractor.features)
+    return FrameFeatures.concatenate(parts)
+
+
+def find_candidate_frames(features: FrameFeatures, bright_pixel_threshold: int,
+                          spike_factor: float, health_drop: float) -> np.ndarray:
+    """
+    Find coarse samples that may contain something worth refining
+    
+    Args:
+        features: Coarse feature table
+        bright_pixel_threshold: Flash pixels (at the coarse proxy resolution)
+            that make a sample a hit candidate
+        spike_factor: Activity this many times the median activity of moving
+            samples makes a sample a candidate (0 = off)
+        health_drop: Health percentage lost by either player between samples
+            that makes a sample a candidate (0 = off)
+    
+    Returns:
+        Frame numbers of the candidate samples, ascending
+    """
+    if len(features) == 0:
+        return np.zeros(0, dtype=np.int64)
+    
+    moving = features.has_motion & ~features.static
+    candidates = moving & (features.bright_pixels() > bright_pixel_threshold)
+    
+    if spike_factor > 0 and moving.any():
+        activity = features.left_activity.astype(np.float64) + features.right_activity
+        baseline = np.median(activity[moving])
+        candidates |= moving & (activity > baseline * spike_factor)
+    
+    if health_drop > 0 and len(features) > 1:
+        lost = np.maximum(-np.diff(features.health.astype(np.float64), axis=0), 0)
+        candidates[1:] |= (lost >= health_drop).any(axis=1)
+    
+    return np.asarray(features.frames, dtype=np.int64)[candidates]
+
+
+def group_candidate_windows(candidate_frames: Sequence[int], ranges: Sequence[Tuple[int, int]],
+                            before: int, after: int) -> List[Tuple[int, int]]:
+    """
+    Turn candidate samples into merged frame windows
+    
+    Args:
+        candidate_frames: Candidate frame numbers, ascending
+        ranges: Scanned (start_frame, end_frame) ranges, ascending; windows
+            never extend past the range their candidate is in
+        before: Frames included before each candidate (should cover the
+            coarse sample interval, since the event happened since the
+            previous sample)
+        after: Frames included after each candidate
+    
+    Returns:
+        List of disjoint (start_frame, end_frame) ranges, ascending
+    """
+    starts = [start for start, _ in ranges]
+    windows = []
+    for frame_num in candidate_frames:
+        frame_num = int(frame_num)
+        range_start, range_end = ranges[max(0, bisect.bisect_right(starts, frame_num) - 1)]
+        start, end = max(range_start, frame_num - before), min(range_end, frame_num + after + 1)
+        if windows and start <= windows[-1][1]:
+            windows[-1] = (windows[-1][0], max(windows[-1][1], end))
+        else:
+            windows.append((start, end))
+    return windows
@@ -6,6 +6,7 @@ Tracks combo length, damage, and provides performance metrics.
 from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass
 from datetime import timedelta
+from round_segments import RoundTimeline
 
 
 @dataclass
@@ -51,21 +52,24 @@ class Combo:
 class ComboTracker:
     """Tracks and analyzes combos during gameplay"""
     
-    def __init__(self, fps: int = 60):
+    def __init__(self, fps: int = 60, rounds: Optional[RoundTimeline] = None):
         """
         Initialize combo tracker
         
         Args:
             fps: Frames per second of the video
+            rounds: Rounds segmented from the HUD; when given, combos take
+                their round from their start frame
         """
         self.fps = fps
+        self.rounds = rounds
         self.combos: List[Combo] = []
         self.current_combo: Optional[Dict] = None
         
         # Combo detection settings
         self.min_hits_for_combo = 2  # Minimum hits to count as combo
         self.combo_timeout_frames = 90  # ~1.5 seconds at 60fps
-        
+    
     def start_combo(self, player: str, round_number: int, frame: int, 
                    timestamp: float, first_move: str):
         """
@@ -73,11 +77,14 @@ class ComboTracker:
         
         Args:
             player: "player1" or "player2"
-            round_number: Current round number
+            round_number: Current round number (ignored when the tracker has rounds)
             frame: Frame number when combo started
             timestamp: Time in seconds
             first_move: First move that started combo
         """
+        if self.rounds is not None:
+            round_number = self.rounds.round_number(frame)
+        
         self.current_combo = {
             "player": player,
             "round": round_number,
@@ -8,6 +8,50 @@ ANALYSIS_SETTINGS = {
     "min_frames_between_events": 30,  # Minimum frames between detected events
     "activity_threshold": 1.2,  # Ratio threshold for determining active player
     "bright_pixel_threshold": 1000,  # Threshold for hit/block detection
+    "prefetch_frames": 0,  # Background decode ring size (0 = decode on the analysis thread)
+    "workers": 1,  # Worker processes for segment-parallel analysis (1 = single process)
+    "segment_overlap_frames": 30,  # Frames decoded before each segment so its first frames have history
+    "hud_calibration_seconds": 30.0,  # With workers or coarse_to_fine: seconds read from the start of each gameplay range to calibrate the HUD readers
+    "proxy_width": 480,  # Width of the analysis proxy used for motion/hit detection (0 = full resolution)
+    "proxy_grayscale": False,  # Convert proxies to gray before differencing (loses color-only changes)
+    "proxy_roi": None,  # Optional (x, y, width, height) crop in full-resolution pixels before downscaling
+    "feature_cache_dir": None,  # Directory for cached per-frame features (None = always decode)
+    "build_video_index": True,  # Index frame timestamps/keyframes for exact timing and seeking
+    "video_data_dir": None,  # Directory for each video's timeline index and detected HUD layout (None = feature_cache_dir, or else ~/.cache/2xko-analyzer/video_data)
+    "video_data_next_to_video": False,  # Store them next to the video instead, as <video>.index.npz and <video>.hud.json
+    "decode_backend": "opencv",  # "opencv" or "ffmpeg" (rawvideo pipe from a local ffmpeg; falls back to OpenCV if missing)
+    "decode_threads": 0,  # Decoder threads for the ffmpeg backend (0 = let ffmpeg decide)
+    "detector_block_size": 0,  # Compute motion features for this many proxy frames at once (0 = one frame at a time)
+    "skip_static_frames": True,  # Skip detectors on frames unchanged from the previous sample (pauses, menus, hitstop)
+    "hitstop_max_frames": 20,  # Unchanged-frame runs up to this long after motion are reported as hitstop; longer runs are pauses
+    "meter_usage_window": 30,  # A move within this many frames of a meter drop counts as using meter
+    "hud_profile": None,  # HUD layout profile from hud_profiles/ (None = detect per video)
+    "round_timer_start": 99,  # Round timer value at the start of a round (timer digits are learned from its countdown)
+    "round_intro_gap": 1.0,  # Seconds without HUD after a KO or timeout that mark a round intro (next HUD frame starts a round)
+    "gameplay_segments": False,  # Scan for the in-match HUD first and only analyze gameplay (skips menus, loading screens, replays)
+    "gameplay_sample_fps": 2.0,  # Sampling rate of the gameplay scan
+    "gameplay_merge_gap": 3.0,  # Seconds without HUD still counted as gameplay (supers, flashes)
+    "gameplay_min_length": 2.0,  # Shortest gameplay segment in seconds
+    "memory_budget_mb": 0,  # Keep frame buffers and feature tables within this many MB, spilling features to disk (0 = no limit)
+    "spill_dir": None,  # Directory for spilled feature tables (None = the system temp directory)
+    "adaptive_sampling": False,  # Vary the sample interval with on-screen activity instead of a fixed rate
+    "adaptive_min_interval": 1,  # Adaptive sampling: interval around activity spikes and hit flashes
+    "adaptive_max_interval": 8,  # Adaptive sampling: longest interval, reached while activity stays flat
+    "adaptive_hold_frames": 30,  # Adaptive sampling: frames sampled at the minimum interval after a spike or flash
+    "adaptive_spike_factor": 2.0,  # Adaptive sampling: activity this many times the running baseline is a spike
+    "adaptive_flat_tolerance": 0.25,  # Adaptive sampling: activity within this fraction of the baseline counts as flat
+    "live_latency_budget": 0.25,  # Live mode: drop frames that waited longer than this many seconds
+    "live_queue_frames": 4,  # Live mode: sampled frames buffered between capture and analysis
+    "live_poll_interval": 0.5,  # Live mode: seconds between checks for new data in a growing file
+    "live_idle_timeout": 10.0,  # Live mode: stop when a growing file has not grown for this many seconds
+    "coarse_to_fine": False,  # Scan sparsely for candidate windows first and only analyze those at the full sample rate
+    "coarse_sample_rate": 8,  # Coarse tier: analyze every Nth frame
+    "coarse_proxy_width": 160,  # Coarse tier: proxy width
+    "coarse_bright_pixel_threshold": 1000,  # Coarse tier: hit flash candidate threshold (full-resolution pixels)
+    "coarse_activity_spike": 3.0,  # Coarse tier: activity this many times the median is a candidate (0 = off)
+    "coarse_health_drop": 2.0,  # Coarse tier: health percentage lost between samples that is a candidate (0 = off)
+    "coarse_window_before": 1.0,  # Seconds analyzed at full rate before each candidate
+    "coarse_window_after": 1.0,  # Seconds analyzed at full rate after each candidate
 }
 
 # Character-specific analysis settings
@@ -2,21 +2,26 @@
 Enhanced analyzer with move tracking, damage estimation, and improved mistake detection.
 """
 
-import cv2
+import bisect
 import numpy as np
 from typing import Dict, List, Optional, Tuple
 from collections import defaultdict, Counter
 from analyzer import GameplayAnalyzer
 from video_processor import VideoProcessor
+from frame_features import FrameFeatures
+from health_bars import health_losses
+from meter_bars import meter_changes
 from move_translator import MoveTranslator
+from round_segments import RoundTimeline, segment_rounds
 
 
 class EnhancedAnalyzer(GameplayAnalyzer):
     """Enhanced analyzer with move tracking and damage estimation"""
     
-    def __init__(self, video_path: str, matchup_type: str, character: str):
+    def __init__(self, video_path: str, matchup_type: str, character: str,
+                 settings: Optional[Dict] = None):
         """Initialize enhanced analyzer"""
-        super().__init__(video_path, matchup_type, character)
+        super().__init__(video_path, matchup_type, character, settings)
         
         # Move tracking
         self.player1_moves = defaultdict(int)  # move_name -> count
@@ -27,6 +32,8 @@ class EnhancedAnalyzer(GameplayAnalyzer):
         # Meter usage tracking
         self.player1_meter_usage = defaultdict(int)  # move_name -> count of meter uses
         self.player2_meter_usage = defaultdict(int)
+        self.meter_events = []  # List of (timestamp, player, "spent"/"gained", amount)
+        self.steam_events = []  # Steam Steam gauge changes, as meter_events
         
         # Damage tracking - separate dealt and taken
         self.player1_damage_dealt = 0  # Damage P1 dealt to P2
@@ -38,24 +45,99 @@ class EnhancedAnalyzer(GameplayAnalyzer):
         self.player1_damage_history = []  # List of (timestamp, damage_dealt, damage_taken, round)
         self.player2_damage_history = []  # List of (timestamp, damage_dealt, damage_taken, round)
         
+        # "health_bars" when damage was read from the HUD, "move_estimates" otherwise
+        self.damage_source = "move_estimates"
+        
         # Round tracking
         self.current_round = 1
         self.round_starts = [0.0]  # Timestamps when rounds start
         self.round_history = []  # List of (timestamp, round_number)
+        self.round_timeline: Optional[RoundTimeline] = None  # Rounds found from the HUD (None = no readable HUD)
         
         # Opponent move tracking during mistakes
         self.opponent_moves_during_mistakes = {}  # mistake_timestamp -> list of opponent moves
     
-    def analyze(self) -> Dict:
-        """Perform enhanced analysis"""
-        # Detect starting positions first
-        self._detect_starting_positions()
+    def _observe_features(self, features: FrameFeatures) -> Dict[str, List]:
+        """Standard observations plus starting positions and move/damage tracking"""
+        observations = super()._observe_features(features)
+        observations["start_positions"] = []
+        observations["tracking"] = []
+        observations["meter_events"] = []
+        observations["steam_events"] = []
+        observations["rounds"] = []
+        if len(features) == 0:
+            return observations
+        
+        # Detect starting positions from a few early frames
+        for frame_num, (left_chars, right_chars) in zip(features.start_frames, features.start_character_pixels):
+            if left_chars > right_chars * 1.2:
+                observations["start_positions"].append((int(frame_num), "left", "right"))
+            elif right_chars > left_chars * 1.2:
+                observations["start_positions"].append((int(frame_num), "right", "left"))
         
         # Track moves and damage
-        self._track_moves_and_damage()
+        hit_players = self._hit_players(features)
+        
+        # Damage is read from the health bars when they could be read at all
+        if np.isnan(features.health).all():
+            health_lost = [None] * len(features)
+        else:
+            health_lost = [tuple(lost) for lost in health_losses(features.health).tolist()]
+            # Rounds from health refills, timer resets and intro screens
+            intro_gap = round(self.settings["round_intro_gap"] * self.video.fps)
+            observations["rounds"] = segment_rounds(features.frames, features.health, features.timer, intro_gap).rounds
+        
+        # Meter changes read from the HUD; moves near a drop used meter
+        observations["meter_events"] = meter_changes(features.frames, features.meter)
+        observations["steam_events"] = meter_changes(features.frames, features.steam)
+        spent_frames = {"player1": [], "player2": []}
+        for frame_num, player, change, _ in observations["meter_events"]:
+            if change == "spent":
+                spent_frames[player].append(frame_num)
+        
+        for row, frame_num in enumerate(features.frames.tolist()):
+            player = None
+            move = None
+            meter_used = False
+            
+            if hit_players[row]:
+                # Estimate which player and which move
+                player, side = ("player1", "left") if hit_players[row] == 1 else ("player2", "right")
+                
+                # Simulate move detection (in production would use actual detection)
+                move = self._estimate_move(frame_num, side)
+                if move:
+                    # Check if meter was used (super moves or enhanced specials)
+                    meter_used = self._is_super_move(move) or self._check_meter_usage(spent_frames[player], frame_num)
+            
+            # Every tracked frame is recorded so round detection can be replayed
+            observations["tracking"].append((frame_num, player if move else None, move, meter_used, health_lost[row]))
+        
+        return observations
+    
+    def _apply_observations(self, observations: Dict[str, List]):
+        """Apply standard observations, then starting positions and move/damage tracking"""
+        super()._apply_observations(observations)
+        
+        self._apply_starting_positions(observations.get("start_positions", []))
+        
+        rounds = observations.get("rounds", [])
+        if rounds:
+            self.round_timeline = RoundTimeline(rounds)
+            self.round_starts = [self.video.frame_to_timestamp(r.start_frame) for r in rounds]
         
-        # First do standard analysis (this will populate mistakes)
-        report = super().analyze()
+        self._last_damage_timestamp = 0
+        for frame_num, player, move, meter_used, health_lost in observations.get("tracking", []):
+            self._apply_tracking(frame_num, player, move, meter_used, health_lost)
+        
+        for frame_num, player, change, amount in observations.get("meter_events", []):
+            self.meter_events.append((self.video.frame_to_timestamp(frame_num), player, change, amount))
+        for frame_num, player, change, amount in observations.get("steam_events", []):
+            self.steam_events.append((self.video.frame_to_timestamp(frame_num), player, change, amount))
+    
+    def build_report(self) -> Dict:
+        """Build the standard report and add enhanced data"""
+        report = super().build_report()
         
         # Enhance mistakes with additional info
         self._enhance_mistakes()
@@ -80,14 +162,18 @@ class EnhancedAnalyzer(GameplayAnalyzer):
                 "player1_meter_usage": dict(self.player1_meter_usage),
                 "player2_meter_usage": dict(self.player2_meter_usage)
             },
+            "meter_events": self.meter_events,
+            "steam_events": self.steam_events,
             "damage_history": {
                 "player1": self.player1_damage_history,
                 "player2": self.player2_damage_history
             },
+            "damage_source": self.damage_source,
             "round_info": {
                 "current_round": self.current_round,
                 "round_starts": self.round_starts,
-                "round_history": self.round_history
+                "round_history": self.round_history,
+                "rounds": self.round_timeline.to_list() if self.round_timeline is not None else []
             },
             "move_timestamps": {
                 "player1": self.player1_move_timestamps,
@@ -97,171 +183,105 @@ class EnhancedAnalyzer(GameplayAnalyzer):
         
         return report
     
-    def _detect_starting_positions(self):
+    def _apply_starting_positions(self, positions: List[Tuple[int, str, str]]):
         """Detect which side each player starts on"""
-        # Get first frame
-        self.video.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-        ret, frame = self.video.cap.read()
-        
-        if not ret:
-            return
-        
-        # Analyze character positions in first frame
-        height, width = frame.shape[:2]
-        left_half = frame[:, :width//2]
-        right_half = frame[:, width//2:]
-        
-        # Detect character presence (look for non-background pixels)
-        # Simple heuristic: more activity = character presence
-        left_activity = np.sum(cv2.cvtColor(left_half, cv2.COLOR_BGR2GRAY) > 50)
-        right_activity = np.sum(cv2.cvtColor(right_half, cv2.COLOR_BGR2GRAY) > 50)
-        
         # Check multiple early frames for consistency
-        positions_p1 = []
-        positions_p2 = []
-        
-        for frame_num in range(0, min(30, int(self.video.frame_count)), 5):
-            self.video.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_num)
-            ret, frame = self.video.cap.read()
-            if not ret:
-                continue
-            
-            # Detect which side has more character-like pixels
-            left_half = frame[:, :width//2]
-            right_half = frame[:, width//2:]
-            
-            left_chars = self._detect_character_pixels(left_half)
-            right_chars = self._detect_character_pixels(right_half)
-            
-            if left_chars > right_chars * 1.2:
-                positions_p1.append("left")
-                positions_p2.append("right")
-            elif right_chars > left_chars * 1.2:
-                positions_p1.append("right")
-                positions_p2.append("left")
-        
-        if positions_p1:
-            self.player1_start_position = Counter(positions_p1).most_common(1)[0][0]
-            self.player2_start_position = Counter(positions_p2).most_common(1)[0][0]
+        if positions:
+            self.player1_start_position = Counter(p1 for _, p1, _ in positions).most_common(1)[0][0]
+            self.player2_start_position = Counter(p2 for _, _, p2 in positions).most_common(1)[0][0]
         else:
             # Default fallback
             self.player1_start_position = "left"
             self.player2_start_position = "right"
     
-    def _detect_character_pixels(self, region: np.ndarray) -> int:
-        """Detect number of character-like pixels in region"""
-        gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
-        # Character pixels are typically not too dark and not too bright
-        mask = (gray > 30) & (gray < 220)
-        return np.sum(mask)
+    def _apply_tracking(self, frame_num: int, player: Optional[str], move: Optional[str], meter_used: bool,
+                        health_lost: Optional[Tuple[float, float]] = None):
+        """
+        Track moves used and damage with round tracking
+        
+        Args:
+            frame_num: Frame number of a tracked frame
+            player: Player who used a move in this frame (None if no move)
+            move: Move detected in this frame
+            meter_used: Whether the move used meter
+            health_lost: Health percentage player1/player2 lost at this frame,
+                read from the health bars (None = estimate damage from moves)
+        """
+        timestamp = self.video.frame_to_timestamp(frame_num)
+        
+        if self.round_timeline is not None:
+            # Rounds segmented from the HUD
+            self.current_round = self.round_timeline.round_number(frame_num)
+        elif timestamp - self._last_damage_timestamp > 10 and self.player1_damage_dealt + self.player2_damage_dealt > 500:
+            # No HUD: guess round changes from long pauses after heavy damage
+            # Possible round end/start
+            self.current_round += 1
+            self.round_starts.append(timestamp)
+            # Reset damage for new round (or track separately)
+            self._last_damage_timestamp = timestamp
+        
+        # Track round
+        self.round_history.append((timestamp, self.current_round))
+        
+        if move:
+            if player == "player1":
+                self.player1_moves[move] += 1
+                self.player1_move_timestamps.append((timestamp, move, meter_used))
+                if meter_used:
+                    self.player1_meter_usage[move] += 1
+            else:
+                self.player2_moves[move] += 1
+                self.player2_move_timestamps.append((timestamp, move, meter_used))
+                if meter_used:
+                    self.player2_meter_usage[move] += 1
+        
+        if health_lost is not None:
+            # What each player lost on screen was dealt by the other
+            self.damage_source = "health_bars"
+            max_health = self.character_info["health"]
+            player1_taken, player2_taken = (round(lost * max_health / 100) for lost in health_lost)
+            self._record_damage(timestamp, player1_dealt=player2_taken, player2_dealt=player1_taken)
+        elif move:
+            # Estimate damage
+            damage = self._estimate_damage(move)
+            if player == "player1":
+                self._record_damage(timestamp, player1_dealt=damage, player2_dealt=0)
+            else:
+                self._record_damage(timestamp, player1_dealt=0, player2_dealt=damage)
     
-    def _track_moves_and_damage(self):
-        """Track moves used and estimate damage with round tracking"""
-        # Extract frames
-        frames = self.video.extract_frames(sample_rate=2)
-        
-        previous_frame = None
-        last_damage_timestamp = 0
+    def _record_damage(self, timestamp: float, player1_dealt: int, player2_dealt: int):
+        """
+        Add damage dealt at a timestamp to the totals and damage history
+        
+        Args:
+            timestamp: When the damage was dealt
+            player1_dealt: Damage player1 dealt to player2
+            player2_dealt: Damage player2 dealt to player1
+        """
+        if player1_dealt <= 0 and player2_dealt <= 0:
+            return
         
-        for i, (frame_num, frame) in enumerate(frames):
-            timestamp = self.video.frame_to_timestamp(frame_num)
-            
-            # Detect round changes (simplified - look for reset patterns)
-            # In production, would detect round start screens
-            if timestamp - last_damage_timestamp > 10 and self.player1_damage_dealt + self.player2_damage_dealt > 500:
-                # Possible round end/start
-                self.current_round += 1
-                self.round_starts.append(timestamp)
-                # Reset damage for new round (or track separately)
-                last_damage_timestamp = timestamp
-            
-            # Track round
-            self.round_history.append((timestamp, self.current_round))
-            
-            if previous_frame is not None:
-                # Detect move usage (simplified - in production would use actual move detection)
-                diff = cv2.absdiff(frame, previous_frame)
-                left_half = diff[:, :diff.shape[1]//2]
-                right_half = diff[:, diff.shape[1]//2:]
-                
-                left_activity = np.sum(left_half)
-                right_activity = np.sum(right_half)
-                
-                # Detect hit/block
-                hit_block = self.move_detector.detect_hit_or_block(frame, previous_frame)
-                
-                if hit_block:
-                    # Estimate which player and which move
-                    if left_activity > right_activity * 1.2:
-                        player = "player1"
-                        # Simulate move detection (in production would use actual detection)
-                        move = self._estimate_move(frame, previous_frame, "left")
-                        if move:
-                            # Check if meter was used (super moves or enhanced specials)
-                            meter_used = self._is_super_move(move) or self._check_meter_usage(frame, "player1")
-                            self.player1_moves[move] += 1
-                            self.player1_move_timestamps.append((timestamp, move, meter_used))
-                            if meter_used:
-                                self.player1_meter_usage[move] += 1
-                            
-                            # Estimate damage
-                            damage = self._estimate_damage(move)
-                            if damage > 0:
-                                # P1 dealt damage to P2
-                                self.player1_damage_dealt += damage
-                                self.player2_damage_taken += damage
-                                
-                                # Record in history
-                                self.player1_damage_history.append((
-                                    timestamp, 
-                                    self.player1_damage_dealt, 
-                                    self.player1_damage_taken,
-                                    self.current_round
-                                ))
-                                self.player2_damage_history.append((
-                                    timestamp,
-                                    self.player2_damage_dealt,
-                                    self.player2_damage_taken,
-                                    self.current_round
-                                ))
-                                last_damage_timestamp = timestamp
-                    
-                    elif right_activity > left_activity * 1.2:
-                        player = "player2"
-                        move = self._estimate_move(frame, previous_frame, "right")
-                        if move:
-                            # Check if meter was used (super moves or enhanced specials)
-                            meter_used = self._is_super_move(move) or self._check_meter_usage(frame, "player2")
-                            self.player2_moves[move] += 1
-                            self.player2_move_timestamps.append((timestamp, move, meter_used))
-                            if meter_used:
-                                self.player2_meter_usage[move] += 1
-                            
-                            # Estimate damage
-                            damage = self._estimate_damage(move)
-                            if damage > 0:
-                                # P2 dealt damage to P1
-                                self.player2_damage_dealt += damage
-                                self.player1_damage_taken += damage
-                                
-                                # Record in history
-                                self.player1_damage_history.append((
-                                    timestamp,
-                                    self.player1_damage_dealt,
-                                    self.player1_damage_taken,
-                                    self.current_round
-                                ))
-                                self.player2_damage_history.append((
-                                    timestamp,
-                                    self.player2_damage_dealt,
-                                    self.player2_damage_taken,
-                                    self.current_round
-                                ))
-                                last_damage_timestamp = timestamp
-            
-            previous_frame = frame
+        self.player1_damage_dealt += player1_dealt
+        self.player2_damage_taken += player1_dealt
+        self.player2_damage_dealt += player2_dealt
+        self.player1_damage_taken += player2_dealt
+        
+        # Record in history
+        self.player1_damage_history.append((
+            timestamp,
+            self.player1_damage_dealt,
+            self.player1_damage_taken,
+            self.current_round
+        ))
+        self.player2_damage_history.append((
+            timestamp,
+            self.player2_damage_dealt,
+            self.player2_damage_taken,
+            self.current_round
+        ))
+        self._last_damage_timestamp = timestamp
     
-    def _estimate_move(self, frame: np.ndarray, previous_frame: np.ndarray, side: str) -> Optional[str]:
+    def _estimate_move(self, frame_num: int, side: str) -> Optional[str]:
         """Estimate which move was used (simplified)"""
         # In production, this would use actual move detection
         # For now, return a random move for demonstration
@@ -282,6 +302,12 @@ class EnhancedAnalyzer(GameplayAnalyzer):
         }
         return damage_map.get(move_name, 50)
     
+    def _round_at_timestamp(self, timestamp: float, damage_info: Dict) -> int:
+        """Round a timestamp falls in, from the HUD rounds or else the damage history"""
+        if self.round_timeline is not None:
+            return self.round_timeline.round_number(self.video.timestamp_to_frame(timestamp))
+        return damage_info.get("round", 1)
+    
     def _enhance_mistakes(self):
         """Enhance mistakes with comprehensive damage, range info, opponent actions, and clearer player identification"""
         # Track opponent moves during mistake windows
@@ -296,7 +322,7 @@ class EnhancedAnalyzer(GameplayAnalyzer):
             mistake.update(damage_info)
             mistake["player_name"] = "Player 1"
             mistake["character_side"] = self.player1_start_position
-            mistake["round"] = damage_info.get("round", 1)
+            mistake["round"] = self._round_at_timestamp(timestamp, damage_info)
             mistake["leader"] = self._get_leader_at_timestamp(mistake_end_time)
             
             # Get opponent moves during mistake window
@@ -319,7 +345,7 @@ class EnhancedAnalyzer(GameplayAnalyzer):
             mistake.update(damage_info)
             mistake["player_name"] = "Player 2"
             mistake["character_side"] = self.player2_start_position
-            mistake["round"] = damage_info.get("round", 1)
+            mistake["round"] = self._round_at_timestamp(timestamp, damage_info)
             mistake["leader"] = self._get_leader_at_timestamp(mistake_end_time)
             
             # Get opponent moves during mistake window
@@ -333,86 +359,82 @@ class EnhancedAnalyzer(GameplayAnalyzer):
             
             self._add_range_info(mistake)
     
-    def _analyze_blitzcrank_specific_patterns(self, frames: List):
-        """Analyze Blitzcrank-specific gameplay patterns"""
+    def _analyze_blitzcrank_specific_patterns(self, frame_numbers: List[int]):
+        """
+        Analyze Blitzcrank-specific gameplay patterns
+        
+        Args:
+            frame_numbers: Frames sampled at different points in the match
+        """
         import random
         
-        # Sample frames at different points in the match
-        sample_points = [
-            len(frames) // 4,
-            len(frames) // 2,
-            3 * len(frames) // 4
-        ]
-        
-        for point in sample_points:
-            if point < len(frames):
-                frame_num, frame = frames[point]
-                timestamp = self.video.frame_to_timestamp(frame_num)
+        for frame_num in frame_numbers:
+            timestamp = self.video.frame_to_timestamp(frame_num)
+            
+            # Simulate detection of common Blitzcrank mistakes
+            # In production, this would use actual move detection
+            
+            # Example: Unsafe Rocket Grab
+            if random.random() < 0.3:  # 30% chance to detect issue
+                player = "player1" if random.random() < 0.5 else "player2"
                 
-                # Simulate detection of common Blitzcrank mistakes
-                # In production, this would use actual move detection
+                mistake = {
+                    "timestamp": timestamp,
+                    "type": "unsafe_special",
+                    "move": "5S1",
+                    "severity": "medium",
+                    "description": f"{player} used Rocket Grab (5S1) which can be easily punished on whiff",
+                    "description_plain": f"{player} used Rocket Grab which can be easily punished if it misses",
+                    "suggestion": "Rocket Grab is risky in neutral. Consider using it after conditioning opponent or with assist cover."
+                }
                 
-                # Example: Unsafe Rocket Grab
-                if random.random() < 0.3:  # 30% chance to detect issue
-                    player = "player1" if random.random() < 0.5 else "player2"
-                    
-                    mistake = {
-                        "timestamp": timestamp,
-                        "type": "unsafe_special",
-                        "move": "5S1",
-                        "severity": "medium",
-                        "description": f"{player} used Rocket Grab (5S1) which can be easily punished on whiff",
-                        "description_plain": f"{player} used Rocket Grab which can be easily punished if it misses",
-                        "suggestion": "Rocket Grab is risky in neutral. Consider using it after conditioning opponent or with assist cover."
-                    }
-                    
-                    if player == "player1":
-                        self.player1_mistakes.append(mistake)
-                        self.player1_stats["unsafe_moves_used"] += 1
-                    else:
-                        self.player2_mistakes.append(mistake)
-                        self.player2_stats["unsafe_moves_used"] += 1
-                    
-                    self.events.append({
-                        "timestamp": timestamp,
-                        "frame": frame_num,
-                        "type": "unsafe_special",
-                        "player": player,
-                        "move": "5S1",
-                        "description": f"{player} used unsafe Rocket Grab"
-                    })
+                if player == "player1":
+                    self.player1_mistakes.append(mistake)
+                    self.player1_stats["unsafe_moves_used"] += 1
+                else:
+                    self.player2_mistakes.append(mistake)
+                    self.player2_stats["unsafe_moves_used"] += 1
+                
+                self.events.append({
+                    "timestamp": timestamp,
+                    "frame": frame_num,
+                    "type": "unsafe_special",
+                    "player": player,
+                    "move": "5S1",
+                    "description": f"{player} used unsafe Rocket Grab"
+                })
+            
+            # Example: Missed punish opportunity
+            if random.random() < 0.2:  # 20% chance
+                player = "player1" if random.random() < 0.5 else "player2"
+                opponent = "player2" if player == "player1" else "player1"
                 
-                # Example: Missed punish opportunity
-                if random.random() < 0.2:  # 20% chance
-                    player = "player1" if random.random() < 0.5 else "player2"
-                    opponent = "player2" if player == "player1" else "player1"
-                    
-                    opportunity = {
-                        "timestamp": timestamp,
-                        "type": "missed_punish",
-                        "description": f"{player} had punish opportunity after {opponent}'s unsafe move but didn't take it",
-                        "suggestion": "When opponent uses unsafe move on block, use fastest normal (5L, 8f startup) to punish"
-                    }
-                    
-                    if player == "player1":
-                        self.player1_opportunities.append(opportunity)
-                        self.player1_stats["punish_opportunities_missed"] += 1
-                    else:
-                        self.player2_opportunities.append(opportunity)
-                        self.player2_stats["punish_opportunities_missed"] += 1
+                opportunity = {
+                    "timestamp": timestamp,
+                    "type": "missed_punish",
+                    "description": f"{player} had punish opportunity after {opponent}'s unsafe move but didn't take it",
+                    "suggestion": "When opponent uses unsafe move on block, use fastest normal (5L, 8f startup) to punish"
+                }
+                
+                if player == "player1":
+                    self.player1_opportunities.append(opportunity)
+                    self.player1_stats["punish_opportunities_missed"] += 1
+                else:
+                    self.player2_opportunities.append(opportunity)
+                    self.player2_stats["punish_opportunities_missed"] += 1
+            
+            # Example: Good use of Air Purifier
+            if random.random() < 0.15:  # 15% chance
+                player = "player1" if random.random() < 0.5 else "player2"
                 
-                # Example: Good use of Air Purifier
-                if random.random() < 0.15:  # 15% chance
-                    player = "player1" if random.random() < 0.5 else "player2"
-                    
-                    self.events.append({
-                        "timestamp": timestamp,
-                        "frame": frame_num,
-                        "type": "good_move",
-                        "player": player,
-                        "move": "2S1",
-                        "description": f"{player} used Air Purifier (2S1) - safe on block (+44) and good for anti-air"
-                    })
+                self.events.append({
+                    "timestamp": timestamp,
+                    "frame": frame_num,
+                    "type": "good_move",
+                    "player": player,
+                    "move": "2S1",
+                    "description": f"{player} used Air Purifier (2S1) - safe on block (+44) and good for anti-air"
+                })
     
     def _get_damage_info_at_timestamp(self, timestamp: float, player: str) -> Dict:
         """Get comprehensive damage info at a specific timestamp"""
@@ -472,20 +494,20 @@ class EnhancedAnalyzer(GameplayAnalyzer):
             opponent_moves = self._get_opponent_moves_during_window(timestamp, mistake_end, opponent)
             self.opponent_moves_during_mistakes[timestamp] = opponent_moves
     
-    def _check_meter_usage(self, frame: np.ndarray, player: str) -> bool:
-        """Check if super meter was used in this frame"""
-        # Detect meter usage by checking for:
-        # 1. Meter bar decrease
-        # 2. Super move visual effects
-        # 3. Enhanced special move indicators
-        
-        meter_info = self.game_state_detector.detect_meter(frame)
-        player_meter = meter_info.get(f"{player}_meter", 0)
-        
-        # In production, would compare with previous meter level
-        # For now, check if move is a super or enhanced special
-        # This is a simplified check - in production would track meter changes
-        return False  # Placeholder - would need meter tracking
+    def _check_meter_usage(self, spent_frames: List[int], frame_num: int) -> bool:
+        """
+        Check if a move used meter
+        
+        Args:
+            spent_frames: Frames where the player's meter dropped, ascending
+            frame_num: Frame the move was seen at
+        
+        Returns:
+            True if the meter dropped within meter_usage_window frames of the move
+        """
+        window = self.settings["meter_usage_window"]
+        first = bisect.bisect_left(spent_frames, frame_num - window)
+        return first < len(spent_frames) and spent_frames[first] <= frame_num + window
     
     def _is_super_move(self, move_name: str) -> bool:
         """Check if a move is a super move (uses meter)"""
@@ -3,6 +3,7 @@ Enhanced character identifier with starting position detection.
 """
 
 from character_identifier import CharacterIdentifier
+from frame_bus import FrameBus, FrameSubscriber
 import cv2
 import numpy as np
 from typing import Dict, Tuple, Optional
@@ -12,6 +13,45 @@ from collections import Counter
 class EnhancedCharacterIdentifier(CharacterIdentifier):
     """Enhanced character identifier with starting position detection"""
     
+    # Frame used for the start-of-round character image
+    START_IMAGE_FRAME = 5
+    
+    def subscribe(self, bus: FrameBus, image_samples: int = 10, username_samples: int = 5):
+        """
+        Register start-of-round, character image and username sampling
+        
+        After the bus has run, self.start_character_info holds the same data
+        identify_characters_at_start() returns.
+        
+        Args:
+            bus: Frame bus that will decode the video
+            image_samples: Number of frames to sample for character images
+            username_samples: Number of frames to sample for usernames
+        """
+        super().subscribe(bus, image_samples, username_samples)
+        
+        self.start_character_info = {}
+        self._start_positions = {"player1": [], "player2": []}
+        self._start_frame = None
+        bus.subscribe(FrameSubscriber("start_positions", self._on_start_frame,
+                                      frame_numbers=self._start_sample_indices(),
+                                      on_finish=self._finish_start_positions))
+    
+    def _on_start_frame(self, frame_num: int, frame: np.ndarray, previous_frame: Optional[np.ndarray]):
+        """Frame bus callback for start-of-round sampling"""
+        self._add_start_positions(frame, self._start_positions)
+        if frame_num == self.START_IMAGE_FRAME:
+            self._start_frame = frame.copy()
+    
+    def _finish_start_positions(self):
+        """Build start-of-round character info once all samples have arrived"""
+        self.start_character_info = self._build_start_info(self._start_positions, self._start_frame)
+        self._start_frame = None
+    
+    def _start_sample_indices(self) -> range:
+        """Sample first 10 frames"""
+        return range(0, min(10, self.video.frame_count))
+    
     def identify_characters_at_start(self) -> Dict:
         """
         Identify characters at the very start of the round
@@ -19,25 +59,27 @@ class EnhancedCharacterIdentifier(CharacterIdentifier):
         Returns:
             Dictionary with character info including starting positions
         """
-        # Get first few frames
-        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-        
-        character_info = {}
         positions = {"player1": [], "player2": []}
+        for frame in self._read_frames(self._start_sample_indices()):
+            self._add_start_positions(frame, positions)
         
-        # Sample first 10 frames
-        for frame_num in range(0, min(10, int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)))):
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_num)
-            ret, frame = self.cap.read()
-            if not ret:
-                continue
-            
-            # Detect character positions
-            p1_pos, p2_pos = self._detect_starting_positions(frame)
-            if p1_pos:
-                positions["player1"].append(p1_pos)
-            if p2_pos:
-                positions["player2"].append(p2_pos)
+        # Extract character images at start (already decoded above, so this
+        # comes from the frame cache)
+        start_frame = self.video.get_frame(self.START_IMAGE_FRAME)
+        
+        return self._build_start_info(positions, start_frame)
+    
+    def _add_start_positions(self, frame: np.ndarray, positions: Dict[str, list]):
+        """Detect character positions in an early frame"""
+        p1_pos, p2_pos = self._detect_starting_positions(frame)
+        if p1_pos:
+            positions["player1"].append(p1_pos)
+        if p2_pos:
+            positions["player2"].append(p2_pos)
+    
+    def _build_start_info(self, positions: Dict[str, list], start_frame: Optional[np.ndarray]) -> Dict:
+        """Combine sampled start positions and the start frame into character info"""
+        character_info = {}
         
         # Get most common positions
         if positions["player1"]:
@@ -50,11 +92,7 @@ class EnhancedCharacterIdentifier(CharacterIdentifier):
         else:
             p2_start = "right"  # Default
         
-        # Extract character images at start
-        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 5)  # Use frame 5 for character image
-        ret, start_frame = self.cap.read()
-        
-        if ret:
+        if start_frame is not None:
             # Extract character images
             p1_img = self._extract_character_region(start_frame, "player1")
             p2_img = self._extract_character_region(start_frame, "player2")
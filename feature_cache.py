@@ -0,0 +1,144 @@
+"""
+Persistent on-disk cache of extracted frame features.
+
+Entries are keyed by a hash of the video content plus everything that
+changes what extraction produces (extractor version, sample rate, proxy
+settings), so renamed or copied videos still hit the cache while
+re-encoded videos or extractor changes miss it. Each entry is a directory
+of .npy files that are memory-mapped on load.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from typing import Dict, Optional
+from frame_features import FrameFeatures
+
+
+def user_cache_dir(name: str) -> str:
+    """
+    Per-user cache directory for one kind of analyzer data
+    
+    Args:
+        name: Subdirectory name
+    
+    Returns:
+        <XDG_CACHE_HOME or ~/.cache>/2xko-analyzer/<name> (under
+        %LOCALAPPDATA% on Windows)
+    """
+    base = os.environ.get("LOCALAPPDATA") if os.name == "nt" else None
+    base = base or os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "2xko-analyzer", name)
+
+
+def video_content_hash(video_path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Hash a video by its size and its first, middle and last chunks
+    
+    Reading three chunks instead of the whole file keeps hashing multi-GB
+    VODs instant while still telling different recordings apart.
+    
+    Args:
+        video_path: Path to video file
+        chunk_size: Bytes read at each position
+    
+    Returns:
+        Hex digest
+    """
+    size = os.path.getsize(video_path)
+    digest = hashlib.sha1(str(size).encode())
+    
+    with open(video_path, "rb") as f:
+        for offset in sorted({0, max(0, size // 2 - chunk_size // 2), max(0, size - chunk_size)}):
+            f.seek(offset)
+            digest.update(f.read(chunk_size))
+    
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """Stores FrameFeatures tables on disk"""
+    
+    def __init__(self, cache_dir: str):
+        """
+        Initialize feature cache
+        
+        Args:
+            cache_dir: Directory holding cache entries (created on first store)
+        """
+        self.cache_dir = cache_dir
+    
+    def key(self, video_path: str, params: Dict) -> str:
+        """
+        Build the cache key for a video and extraction parameters
+        
+        Args:
+            video_path: Path to video file
+            params: JSON-serializable parameters that affect extraction
+        
+        Returns:
+            Cache entry name
+        """
+        params_hash = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+        return f"{video_content_hash(video_path)[:20]}-{params_hash[:12]}"
+    
+    def load(self, video_path: str, params: Dict) -> Optional[FrameFeatures]:
+        """
+        Load cached features
+        
+        Returns:
+            Memory-mapped FrameFeatures, or None on a cache miss
+        """
+        entry = os.path.join(self.cache_dir, self.key(video_path, params))
+        if not os.path.exists(os.path.join(entry, "meta.json")):
+            return None
+        return FrameFeatures.load(entry)
+    
+    def load_info(self, video_path: str, params: Dict) -> Dict:
+        """
+        Load the extra information stored with cached features
+        
+        Returns:
+            The info given to store(), or {} if there is none
+        """
+        path = os.path.join(self.cache_dir, self.key(video_path, params), "meta.json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f).get("info") or {}
+        except (OSError, ValueError):
+            return {}
+    
+    def store(self, video_path: str, params: Dict, features: FrameFeatures,
+              info: Optional[Dict] = None) -> str:
+        """
+        Write features to the cache
+        
+        Args:
+            video_path: Path to video file
+            params: JSON-serializable parameters that affect extraction
+            features: Features to store
+            info: JSON-serializable results of the extraction run to keep
+                with the features (e.g. the analyzed frame ranges)
+        
+        Returns:
+            Path of the cache entry
+        """
+        entry = os.path.join(self.cache_dir, self.key(video_path, params))
+        
+        # Write into a temporary directory and rename it, so concurrent or
+        # interrupted runs never leave a half-written entry behind
+        tmp_entry = f"{entry}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+        features.save(tmp_entry)
+        with open(os.path.join(tmp_entry, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"video": os.path.abspath(video_path), "frames": len(features), "params": params,
+                       "info": info or {}}, f, indent=2)
+        
+        try:
+            os.replace(tmp_entry, entry)
+        except OSError:
+            # Another run stored the same entry first
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+        
+        return entry
@@ -0,0 +1,211 @@
+"""
+ffmpeg rawvideo pipe decode backend.
+
+Spawns a local ffmpeg process that decodes the video and writes raw frames
+to a pipe, which are read straight into preallocated NumPy buffers with
+readinto(). Compared to cv2.VideoCapture this gives control over decoder
+threads, output pixel format (BGR, grayscale or planar YUV) and scaling
+inside ffmpeg, so a downscaled grayscale stream never exists at full
+resolution in Python.
+
+FFmpegCapture implements the subset of the cv2.VideoCapture interface that
+VideoProcessor, FrameStream and PrefetchReader use, so it can be swapped in
+as VideoProcessor's capture.
+"""
+
+import shutil
+import subprocess
+import cv2
+import numpy as np
+from typing import Optional, Sequence, Tuple
+
+
+# Output pixel formats: ffmpeg name -> (frame shape, bytes per frame)
+PIXEL_FORMATS = {
+    "bgr24": lambda w, h: ((h, w, 3), w * h * 3),
+    "gray": lambda w, h: ((h, w), w * h),
+    # Planar Y, U, V stacked like OpenCV's I420 layout
+    "yuv420p": lambda w, h: ((h * 3 // 2, w), w * h * 3 // 2),
+}
+
+
+def ffmpeg_available() -> bool:
+    """Check whether an ffmpeg executable is on the PATH"""
+    return shutil.which("ffmpeg") is not None
+
+
+class FFmpegCapture:
+    """Reads decoded frames from an ffmpeg rawvideo pipe"""
+    
+    def __init__(self, video_path: str, width: int = 0, pixel_format: str = "bgr24",
+                 threads: int = 0, frame_times: Optional[Sequence[float]] = None):
+        """
+        Initialize ffmpeg capture
+        
+        Args:
+            video_path: Path to video file
+            width: Scale frames to this width inside ffmpeg, height follows the
+                aspect ratio (0 = keep resolution)
+            pixel_format: Output format, one of PIXEL_FORMATS
+            threads: Decoder threads (0 = let ffmpeg decide)
+            frame_times: Timestamp (seconds from the first frame) of every
+                frame, e.g. VideoIndex.times, for exact seeking in variable
+                frame rate videos (None = assume constant frame rate)
+        """
+        if pixel_format not in PIXEL_FORMATS:
+            raise ValueError(f"Unsupported pixel format {pixel_format}. Available: {list(PIXEL_FORMATS)}")
+        
+        self.video_path = video_path
+        self.pixel_format = pixel_format
+        self.threads = threads
+        self.frame_times = None if frame_times is None else np.asarray(frame_times, dtype=np.float64)
+        
+        # Container properties (OpenCV is always installed and opens instantly)
+        probe = cv2.VideoCapture(video_path)
+        self._opened = probe.isOpened() and ffmpeg_available()
+        self.fps = probe.get(cv2.CAP_PROP_FPS)
+        self.frame_count = int(probe.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.source_width = int(probe.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.source_height = int(probe.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        probe.release()
+        
+        self.width, self.height = self._output_size(width)
+        self.frame_shape, self.frame_bytes = PIXEL_FORMATS[pixel_format](self.width, self.height)
+        
+        self._process: Optional[subprocess.Popen] = None
+        self._start_frame = 0  # Frame the pipe starts at once (re)started
+        self._position = 0  # Frame the next grab()/read() returns
+        self._buffer = np.empty(self.frame_shape, dtype=np.uint8)  # Target of grab()
+        self._grabbed = False
+    
+    def _output_size(self, width: int) -> Tuple[int, int]:
+        """Frame size after scaling (even, as required by yuv420p and most scalers)"""
+        if not width or width >= self.source_width or self.source_width <= 0:
+            return self.source_width, self.source_height
+        out_width = max(2, int(width) // 2 * 2)
+        out_height = max(2, round(self.source_height * out_width / self.source_width / 2) * 2)
+        return out_width, out_height
+    
+    def _command(self, start_time: float) -> list:
+        """ffmpeg command line decoding from start_time (seconds from the first frame)"""
+        command = ["ffmpeg", "-v", "error", "-nostdin", "-threads", str(self.threads)]
+        if start_time > 0:
+            # Input seeking decodes from the preceding keyframe and drops
+            # frames before start_time, so the first frame out is exact
+            command += ["-ss", f"{start_time:.6f}"]
+        command += ["-i", self.video_path, "-map", "0:v:0", "-an", "-sn", "-vsync", "0"]
+        if (self.width, self.height) != (self.source_width, self.source_height):
+            command += ["-vf", f"scale={self.width}:{self.height}:flags=area"]
+        command += ["-f", "rawvideo", "-pix_fmt", self.pixel_format, "pipe:1"]
+        return command
+    
+    def _frame_time(self, frame_number: int) -> float:
+        """Timestamp (seconds from the first frame) of a frame"""
+        if self.frame_times is not None and 0 <= frame_number < len(self.frame_times):
+            return float(self.frame_times[frame_number])
+        return frame_number / self.fps if self.fps > 0 else 0.0
+    
+    def _start(self):
+        """Spawn ffmpeg at the current position"""
+        start_time = 0.0
+        if self._start_frame > 0:
+            # Half a frame early so rounding never drops the target frame
+            half_frame = 0.5 / self.fps if self.fps > 0 else 0.0
+            start_time = max(0.0, self._frame_time(self._start_frame) - half_frame)
+        self._process = subprocess.Popen(self._command(start_time), stdout=subprocess.PIPE,
+                                         stdin=subprocess.DEVNULL, bufsize=self.frame_bytes * 2)
+    
+    def _stop(self):
+        """Terminate the running ffmpeg process"""
+        if self._process is None:
+            return
+        self._process.kill()
+        self._process.stdout.close()
+        self._process.wait()
+        self._process = None
+    
+    def _read_into(self, image: np.ndarray) -> bool:
+        """Read the next frame from the pipe into image"""
+        if not self._opened:
+            return False
+        if self._process is None:
+            self._start()
+        
+        view = memoryview(image.reshape(-1))
+        filled = 0
+        while filled < self.frame_bytes:
+            count = self._process.stdout.readinto(view[filled:])
+            if not count:
+                return False
+            filled += count
+        
+        self._position += 1
+        return True
+    
+    def isOpened(self) -> bool:
+        return self._opened
+    
+    def grab(self) -> bool:
+        """Decode the next frame into the internal buffer"""
+        self._grabbed = self._read_into(self._buffer)
+        return self._grabbed
+    
+    def retrieve(self, image: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        """Return the grabbed frame, copied into image if it has the frame's shape"""
+        if not self._grabbed:
+            return False, None
+        if image is not None and image.shape == self.frame_shape and image.dtype == np.uint8:
+            np.copyto(image, self._buffer)
+            return True, image
+        return True, self._buffer.copy()
+    
+    def read(self, image: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        """Decode the next frame directly into image (or a new array)"""
+        if image is None or image.shape != self.frame_shape or image.dtype != np.uint8:
+            image = np.empty(self.frame_shape, dtype=np.uint8)
+        self._grabbed = False
+        if not self._read_into(image):
+            return False, None
+        return True, image
+    
+    def get(self, prop_id: int) -> float:
+        """Subset of cv2.VideoCapture.get(); 0 for unsupported properties"""
+        if prop_id == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop_id == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.frame_count)
+        if prop_id == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop_id == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop_id == cv2.CAP_PROP_POS_FRAMES:
+            return float(self._position)
+        if prop_id == cv2.CAP_PROP_POS_MSEC:
+            # Like OpenCV: the timestamp of the frame read last
+            return self._frame_time(max(0, self._position - 1)) * 1000.0
+        return 0.0
+    
+    def set(self, prop_id: int, value: float) -> bool:
+        """Seek with CAP_PROP_POS_FRAMES or CAP_PROP_POS_MSEC (restarts ffmpeg lazily)"""
+        if prop_id == cv2.CAP_PROP_POS_FRAMES:
+            frame_number = max(0, int(value))
+        elif prop_id == cv2.CAP_PROP_POS_MSEC:
+            timestamp = max(0.0, value / 1000.0)
+            if self.frame_times is not None and len(self.frame_times):
+                frame_number = int(np.searchsorted(self.frame_times, timestamp - 1e-6))
+            else:
+                frame_number = int(round(timestamp * self.fps))
+        else:
+            return False
+        
+        if self._process is not None and frame_number == self._position:
+            return True
+        self._stop()
+        self._start_frame = self._position = frame_number
+        self._grabbed = False
+        return True
+    
+    def release(self):
+        """Terminate ffmpeg"""
+        self._stop()
+        self._opened = False
@@ -0,0 +1,196 @@
+"""
+Frame bus for decoding a video once and fanning frames out to subscribers.
+
+Analysis passes (hit detection, move/damage tracking, start position
+detection, username and character image sampling) each register a
+subscriber describing which frames they need. The bus then makes a single
+sequential decode pass and hands every frame to all subscribers that
+asked for it, so no frame is decoded more than once per run. Motion
+detectors can subscribe to the low-resolution analysis proxy instead,
+which is likewise built at most once per frame.
+"""
+
+import numpy as np
+from typing import Callable, Dict, Iterable, List, Optional
+from frame_proxy import FrameProxy
+from video_processor import VideoProcessor
+
+
+class FrameSubscriber:
+    """A consumer of frames from the frame bus"""
+    
+    def __init__(self, name: str,
+                 on_frame: Callable[[int, np.ndarray, Optional[np.ndarray]], None],
+                 sample_rate: Optional[int] = None,
+                 frame_numbers: Optional[Iterable[int]] = None,
+                 on_finish: Optional[Callable[[], None]] = None,
+                 proxy: bool = False, sampler=None):
+        """
+        Initialize subscriber
+        
+        Args:
+            name: Name used in bus statistics
+            on_frame: Called as on_frame(frame_num, frame, previous_frame), where
+                previous_frame is the last frame delivered to a sample_rate or
+                sampler subscriber. Frame buffers may be reused by the bus, so
+                copy any frame that must outlive the callback.
+            sample_rate: Receive every Nth frame
+            frame_numbers: Receive exactly these frames (used for sparse sampling)
+            on_finish: Called once after the decode pass completes
+            proxy: Receive the bus's analysis proxy frames instead of
+                full-resolution frames
+            sampler: Decides the frames to receive as the pass goes (an
+                AdaptiveSampler, see adaptive_sampling.py; replaces sample_rate).
+                Subscribers sharing a sampler receive the same frames.
+        """
+        if sample_rate is None and frame_numbers is None and sampler is None:
+            raise ValueError(f"Subscriber '{name}' needs a sample_rate, frame_numbers or sampler")
+        if sample_rate is not None and sample_rate < 1:
+            raise ValueError(f"sample_rate must be >= 1, got {sample_rate}")
+        
+        self.name = name
+        self.on_frame = on_frame
+        self.sample_rate = sample_rate
+        self.frame_numbers = set(int(n) for n in frame_numbers) if frame_numbers is not None else None
+        self.on_finish = on_finish
+        self.proxy = proxy
+        self.sampler = sampler
+        
+        self.previous_frame: Optional[np.ndarray] = None
+        self.frames_received = 0
+    
+    def wants_frame(self, frame_num: int) -> bool:
+        """Check whether this subscriber should receive a frame"""
+        if self.frame_numbers is not None and frame_num in self.frame_numbers:
+            return True
+        if self.sampler is not None:
+            return self.sampler.wants_frame(frame_num)
+        if self.sample_rate is not None:
+            return frame_num % self.sample_rate == 0
+        return False
+    
+    def last_frame_needed(self, frame_count: int) -> int:
+        """Last frame number this subscriber will ask for"""
+        if self.sample_rate is not None or self.sampler is not None:
+            return frame_count - 1
+        return max(self.frame_numbers) if self.frame_numbers else -1
+    
+    def deliver(self, frame_num: int, frame: np.ndarray):
+        """Hand a frame to the subscriber callback"""
+        self.on_frame(frame_num, frame, self.previous_frame)
+        if self.sample_rate is not None or self.sampler is not None:
+            self.previous_frame = frame
+        self.frames_received += 1
+    
+    def finish(self):
+        """Release the held frame and run the finish callback"""
+        self.previous_frame = None
+        if self.on_finish:
+            self.on_finish()
+
+
+class FrameBus:
+    """Decodes a video once and distributes frames to registered subscribers"""
+    
+    def __init__(self, video: VideoProcessor, prefetch: int = 0,
+                 proxy: Optional[FrameProxy] = None):
+        """
+        Initialize frame bus
+        
+        Args:
+            video: VideoProcessor to decode from
+            prefetch: Decode on a background thread into a ring of this many
+                frame buffers (0 = decode on the calling thread); passes with
+                a sampler subscriber always decode on the calling thread
+            proxy: Builds the frames delivered to proxy subscribers (None =
+                they receive full-resolution frames)
+        """
+        self.video = video
+        self.prefetch = prefetch
+        self.proxy = proxy
+        self.subscribers: List[FrameSubscriber] = []
+        self.frames_decoded = 0
+        self.proxy_frames = 0
+        self.prefetch_stats: Optional[Dict] = None
+    
+    def subscribe(self, subscriber: FrameSubscriber) -> FrameSubscriber:
+        """Register a subscriber for the next decode pass"""
+        self.subscribers.append(subscriber)
+        return subscriber
+    
+    def wants_frame(self, frame_num: int) -> bool:
+        """Check whether any subscriber wants a frame"""
+        return any(s.wants_frame(frame_num) for s in self.subscribers)
+    
+    def run(self, desc: str = "Decoding frames", start_frame: int = 0,
+            end_frame: Optional[int] = None) -> Dict:
+        """
+        Make a single decode pass and deliver frames to all subscribers
+        
+        Args:
+            desc: Progress bar label
+            start_frame: First frame to decode
+            end_frame: Frame number to stop before (None = end of video)
+        
+        Returns:
+            Statistics for the pass
+        """
+        self.frames_decoded = 0
+        self.proxy_frames = 0
+        if not self.subscribers:
+            return self.get_stats()
+        
+        # Stop decoding as soon as nobody needs any more frames
+        last_needed = max(s.last_frame_needed(self.video.frame_count) for s in self.subscribers) + 1
+        end_frame = last_needed if end_frame is None else min(end_frame, last_needed)
+        
+        # A sampler decides each frame from the analysis of the frames before
+        # it; deciding on a decode thread running ahead would make the
+        # schedule depend on thread timing, so such passes decode in line
+        prefetch = self.prefetch
+        if any(s.sampler is not None for s in self.subscribers):
+            prefetch = 0
+        
+        # With prefetching, frame buffers are recycled once they leave the
+        # stream's look-behind window, so it must cover every subscriber's
+        # previous frame
+        history_size = 0
+        if prefetch:
+            history_size = max((s.sampler.max_interval if s.sampler else s.sample_rate or 0
+                                for s in self.subscribers), default=0)
+        
+        # Frames no subscriber wants are only grabbed, never retrieved
+        with self.video.stream(start_frame=start_frame, end_frame=end_frame,
+                               history_size=history_size, desc=desc,
+                               frame_filter=self.wants_frame, prefetch=prefetch) as frames:
+            for frame_num, frame in frames:
+                self.frames_decoded += 1
+                proxy_frame = None
+                for subscriber in self.subscribers:
+                    if not subscriber.wants_frame(frame_num):
+                        continue
+                    if subscriber.proxy and self.proxy is not None:
+                        # Built once, shared by every proxy subscriber
+                        if proxy_frame is None:
+                            proxy_frame = self.proxy.make(frame)
+                            self.proxy_frames += 1
+                        subscriber.deliver(frame_num, proxy_frame)
+                    else:
+                        subscriber.deliver(frame_num, frame)
+        self.prefetch_stats = frames.prefetch_stats
+        
+        for subscriber in self.subscribers:
+            subscriber.finish()
+        
+        return self.get_stats()
+    
+    def get_stats(self) -> Dict:
+        """Get decode statistics for the last pass"""
+        stats = {
+            "frames_decoded": self.frames_decoded,
+            "proxy_frames": self.proxy_frames,
+            "subscribers": {s.name: s.frames_received for s in self.subscribers}
+        }
+        if self.prefetch_stats:
+            stats["prefetch"] = self.prefetch_stats
+        return stats
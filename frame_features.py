@@ -0,0 +1,510 @@
+"""
+Per-frame feature extraction for gameplay analysis.
+
+The only stage that needs decoded frames is feature extraction: it reduces
+every sampled frame to a compact row (difference histogram, activity
+profile, frame hash, HUD bar readings). Frames that are unchanged from the
+previous sampled frame (pauses, menus, hitstop) are recognized by comparing
+tiny thumbnails and skip the detectors; they are flagged as static so runs
+of them can be reported instead of discarded. Detection thresholds from
+config.ANALYSIS_SETTINGS are applied afterwards to these features, so a
+table extracted once (and cached on disk, see feature_cache.py) can be
+re-analyzed with different settings without decoding the video again.
+"""
+
+import os
+import cv2
+import numpy as np
+from dataclasses import dataclass, fields
+from typing import List, Optional, Tuple
+from frame_bus import FrameBus, FrameSubscriber
+from move_detector import MoveDetector, GameStateDetector
+
+
+# Bump whenever extraction changes, so stale cached features are not reused
+FEATURE_EXTRACTOR_VERSION = 8
+
+# Number of horizontal bins in the stored column activity profile
+PROFILE_BINS = 64
+
+# Grayscale difference above which a pixel counts as a bright flash
+FLASH_INTENSITY = 50
+
+# Thumbnail (width, height) compared to recognize unchanged frames
+STATIC_THUMBNAIL_SIZE = (32, 18)
+
+# Largest thumbnail pixel change still counted as unchanged (encoder noise)
+STATIC_TOLERANCE = 2
+
+
+@dataclass
+class FrameFeatures:
+    """
+    Feature table for the sampled frames of a video
+    
+    Per-frame arrays have one row per sampled frame. The start_* arrays hold
+    the few early frames used for starting position detection.
+    """
+    frames: np.ndarray  # (N,) int32 frame numbers
+    has_motion: np.ndarray  # (N,) bool, False where there was no previous sampled frame
+    diff_histogram: np.ndarray  # (N, 256) uint32 grayscale difference histogram
+    left_activity: np.ndarray  # (N,) int64 summed difference over the left half
+    right_activity: np.ndarray  # (N,) int64 summed difference over the right half
+    activity_profile: np.ndarray  # (N, PROFILE_BINS) int64 column activity
+    frame_hash: np.ndarray  # (N,) uint64 difference hash of the proxy frame
+    static: np.ndarray  # (N,) bool, unchanged from the previous sampled frame (detectors skipped)
+    health: np.ndarray  # (N, 2) float32 player1/player2 health percentages, NaN where unreadable
+    meter: np.ndarray  # (N, 2) int16 player1/player2 meter percentages, -1 where unreadable
+    steam: np.ndarray  # (N, 2) int16 player1/player2 Steam Steam gauge percentages, -1 where unreadable
+    timer: np.ndarray  # (N,) int16 round timer seconds, -1 where unreadable
+    start_frames: np.ndarray  # (M,) int32 frame numbers
+    start_character_pixels: np.ndarray  # (M, 2) int64 character-like pixels per half
+    
+    @classmethod
+    def empty(cls) -> "FrameFeatures":
+        """Create a table with no rows"""
+        return cls(
+            frames=np.zeros(0, dtype=np.int32),
+            has_motion=np.zeros(0, dtype=bool),
+            diff_histogram=np.zeros((0, 256), dtype=np.uint32),
+            left_activity=np.zeros(0, dtype=np.int64),
+            right_activity=np.zeros(0, dtype=np.int64),
+            activity_profile=np.zeros((0, PROFILE_BINS), dtype=np.int64),
+            frame_hash=np.zeros(0, dtype=np.uint64),
+            static=np.zeros(0, dtype=bool),
+            health=np.zeros((0, 2), dtype=np.float32),
+            meter=np.zeros((0, 2), dtype=np.int16),
+            steam=np.zeros((0, 2), dtype=np.int16),
+            timer=np.zeros(0, dtype=np.int16),
+            start_frames=np.zeros(0, dtype=np.int32),
+            start_character_pixels=np.zeros((0, 2), dtype=np.int64)
+        )
+    
+    def __len__(self) -> int:
+        return len(self.frames)
+    
+    def bright_pixels(self, intensity: int = FLASH_INTENSITY) -> np.ndarray:
+        """Pixels per frame whose difference exceeds intensity"""
+        return self.diff_histogram[:, intensity + 1:].sum(axis=1, dtype=np.int64)
+    
+    def active_side(self, ratio: float = 1.2) -> np.ndarray:
+        """
+        Vectorized MotionFeatures.active_side()
+        
+        Returns:
+            Per frame: 1 if the left half dominates, 2 if the right half
+            does, 0 otherwise
+        """
+        left = self.left_activity.astype(np.float64)
+        right = self.right_activity.astype(np.float64)
+        side = np.zeros(len(self), dtype=np.int8)
+        side[left > right * ratio] = 1
+        side[right > left * ratio] = 2
+        return side
+    
+    def static_runs(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find runs of consecutive static rows
+        
+        Returns:
+            (first row, last row) of each run, as arrays
+        """
+        padded = np.concatenate([[0], np.asarray(self.static, dtype=np.int8), [0]])
+        edges = np.diff(padded)
+        return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1
+    
+    def since(self, start_frame: int) -> "FrameFeatures":
+        """Rows for frames at or after start_frame (views, so memory-mapped tables stay mapped)"""
+        first = int(np.searchsorted(self.frames, start_frame))
+        start_first = int(np.searchsorted(self.start_frames, start_frame))
+        return FrameFeatures(**{
+            f.name: getattr(self, f.name)[start_first if f.name.startswith("start_") else first:]
+            for f in fields(self)
+        })
+    
+    @classmethod
+    def concatenate(cls, parts: List["FrameFeatures"]) -> "FrameFeatures":
+        """
+        Join tables (e.g. from video segments) into one frame-ordered table
+        
+        Frames present in several parts are kept once.
+        """
+        if not parts:
+            return cls.empty()
+        
+        joined = {f.name: np.concatenate([getattr(p, f.name) for p in parts]) for f in fields(cls)}
+        _, rows = np.unique(joined["frames"], return_index=True)
+        _, start_rows = np.unique(joined["start_frames"], return_index=True)
+        
+        return cls(**{
+            name: array[start_rows if name.startswith("start_") else rows]
+            for name, array in joined.items()
+        })
+    
+    def save(self, directory: str):
+        """Write each array as a .npy file in directory"""
+        os.makedirs(directory, exist_ok=True)
+        for f in fields(self):
+            np.save(os.path.join(directory, f"{f.name}.npy"), np.ascontiguousarray(getattr(self, f.name)))
+    
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "FrameFeatures":
+        """
+        Load a table written by save()
+        
+        Args:
+            directory: Directory containing the .npy files
+            mmap: Memory-map the arrays instead of reading them into memory
+        """
+        arrays = {}
+        for f in fields(cls):
+            path = os.path.join(directory, f"{f.name}.npy")
+            try:
+                arrays[f.name] = np.load(path, mmap_mode="r" if mmap else None)
+            except ValueError:
+                # Empty arrays cannot be memory-mapped
+                arrays[f.name] = np.load(path)
+        return cls(**arrays)
+
+
+class FeatureSpill:
+    """
+    Append-only feature table in raw files on disk
+    
+    Used under a memory budget (see memory_budget.py): rows are appended in
+    chunks as they are extracted, and the finished table is memory-mapped
+    from the files, so the whole table is never held in memory at once.
+    """
+    
+    def __init__(self, directory: str):
+        """
+        Initialize feature spill
+        
+        Args:
+            directory: Directory for the spill files (created if missing)
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.rows = 0
+        self.bytes_written = 0
+        # Start position rows are few, so they stay in memory
+        self._start_frames: List[np.ndarray] = []
+        self._start_character_pixels: List[np.ndarray] = []
+        self._template = FrameFeatures.empty()
+    
+    def append(self, features: FrameFeatures):
+        """
+        Append a frame-ordered table
+        
+        Rows for frames already in the spill (segment overlap) are skipped.
+        """
+        self._start_frames.append(np.array(features.start_frames))
+        self._start_character_pixels.append(np.array(features.start_character_pixels))
+        first = 0
+        if self.rows:
+            first = int(np.searchsorted(features.frames, self._last_frame, side="right"))
+        if first >= len(features):
+            return
+        
+        for f in fields(FrameFeatures):
+            if f.name.startswith("start_"):
+                continue
+            template = getattr(self._template, f.name)
+            array = np.ascontiguousarray(getattr(features, f.name)[first:], dtype=template.dtype)
+            with open(os.path.join(self.directory, f"{f.name}.bin"), "ab") as file:
+                array.tofile(file)
+            self.bytes_written += array.nbytes
+        
+        self.rows += len(features) - first
+        self._last_frame = int(features.frames[-1])
+    
+    def load(self) -> FrameFeatures:
+        """Memory-map the spilled rows as a FrameFeatures table"""
+        features = FrameFeatures.empty()
+        if self.rows:
+            for f in fields(FrameFeatures):
+                if f.name.startswith("start_"):
+                    continue
+                template = getattr(self._template, f.name)
+                setattr(features, f.name, np.memmap(os.path.join(self.directory, f"{f.name}.bin"),
+                                                    dtype=template.dtype, mode="r",
+                                                    shape=(self.rows,) + template.shape[1:]))
+        
+        if self._start_frames:
+            start_frames, start_rows = np.unique(np.concatenate(self._start_frames), return_index=True)
+            features.start_frames = start_frames.astype(np.int32)
+            features.start_character_pixels = np.concatenate(self._start_character_pixels)[start_rows]
+        return features
+
+
+class FrameFeatureExtractor:
+    """Collects FrameFeatures from a frame bus pass"""
+    
+    def __init__(self, move_detector: MoveDetector, game_state_detector: GameStateDetector,
+                 skip_static: bool = True, block_size: int = 0, memory_budget=None):
+        """
+        Initialize feature extractor
+        
+        Args:
+            move_detector: Computes frame-pair motion features
+            game_state_detector: Reads HUD bars from full-resolution frames
+            skip_static: Skip motion and HUD detection for frames whose static
+                hash matches the previous sampled frame, reusing its readings
+            block_size: Collect this many proxy frames and compute their motion
+                features as one block (0 = one frame at a time). Results are
+                identical either way.
+            memory_budget: MemoryBudget; once its share of feature rows is
+                collected, they are spilled to a FeatureSpill and the finished
+                table is memory-mapped (None = keep everything in memory)
+        """
+        self.move_detector = move_detector
+        self.game_state_detector = game_state_detector
+        self.skip_static = skip_static
+        self.block_size = block_size
+        self.memory_budget = memory_budget
+        self.sampler = None
+        self.features: Optional[FrameFeatures] = None
+        self._reset()
+    
+    def _reset(self):
+        """Clear rows collected in a previous pass"""
+        self._motion_rows = []
+        self._hud_rows = []
+        self._start_rows = []
+        self._last_hud_row: Optional[Tuple] = None
+        self._spill: Optional[FeatureSpill] = None
+        self._previous_thumbnail: Optional[np.ndarray] = None
+        self._static_frame: Optional[int] = None
+        # Block mode: row 0 is the frame before row 1, rows up to _block_fill are filled
+        self._block: Optional[np.ndarray] = None
+        self._block_fill = 0
+        self._block_rows: List[Tuple[int, int]] = []  # (block position, motion row) awaiting features
+    
+    def subscribe(self, bus: FrameBus, sample_rate: int, start_frames: List[int], sampler=None):
+        """
+        Register the extraction consumers on a frame bus
+        
+        Args:
+            bus: Frame bus that will decode the video
+            sample_rate: Extract features for every Nth frame
+            start_frames: Early frames used for starting position detection
+            sampler: AdaptiveSampler choosing the frames instead of sample_rate;
+                it is fed each frame's activity and flash pixels (block mode is not
+                used then, since every frame's features decide the next sample)
+        """
+        self._reset()
+        self.features = None
+        self.sampler = sampler
+        if sampler is not None:
+            sampler.reset()
+            sample_rate = None
+        
+        bus.subscribe(FrameSubscriber("motion_features", self._on_motion_frame,
+                                      sample_rate=sample_rate, proxy=True,
+                                      on_finish=self._finish, sampler=sampler))
+        bus.subscribe(FrameSubscriber("hud_features", self._on_hud_frame,
+                                      sample_rate=sample_rate, sampler=sampler))
+        bus.subscribe(FrameSubscriber("start_features", self._on_start_frame,
+                                      frame_numbers=start_frames, proxy=True))
+    
+    def _on_motion_frame(self, frame_num: int, frame: np.ndarray, previous_frame: Optional[np.ndarray]):
+        """Reduce a proxy frame pair to motion features"""
+        if self.memory_budget is not None and len(self._motion_rows) >= self.memory_budget.feature_rows:
+            self._spill_rows()
+        frame_hash = self._difference_hash(frame)
+        
+        # Runs first for each frame, so the HUD consumer can skip it too
+        thumbnail = self._thumbnail(frame)
+        static = (self.skip_static and previous_frame is not None and self._previous_thumbnail is not None
+                  and int(cv2.absdiff(thumbnail, self._previous_thumbnail).max()) <= STATIC_TOLERANCE)
+        self._previous_thumbnail = thumbnail
+        self._static_frame = frame_num if static else None
+        
+        block_mode = self.block_size and self.sampler is None
+        if block_mode:
+            self._add_to_block(frame, previous_frame)
+        
+        if previous_frame is None:
+            self._motion_rows.append((frame_num, False, None, 0, 0, None, frame_hash, False))
+            if self.sampler is not None:
+                self.sampler.update(frame_num, 0, 0)
+            return
+        
+        if static:
+            # Collapsed: an unchanged frame has no difference anywhere
+            histogram = np.zeros(256, dtype=np.uint32)
+            histogram[0] = frame.shape[0] * frame.shape[1]
+            self._motion_rows.append((frame_num, True, histogram, 0, 0, None, frame_hash, True))
+            if self.sampler is not None:
+                self.sampler.update(frame_num, 0, 0, static=True)
+            return
+        
+        if block_mode:
+            # Filled in when the block is full
+            self._block_rows.append((self._block_fill - 1, len(self._motion_rows)))
+            self._motion_rows.append((frame_num, True, None, 0, 0, None, frame_hash, False))
+            return
+        
+        motion = self.move_detector.motion_features(frame_num, frame, previous_frame)
+        self._motion_rows.append((
+            frame_num, True, motion.diff_histogram, motion.left_activity, motion.right_activity,
+            self._bin_profile(motion.column_activity), frame_hash, False
+        ))
+        if self.sampler is not None:
+            self.sampler.update(frame_num, motion.left_activity + motion.right_activity, motion.bright_pixels)
+    
+    def _add_to_block(self, frame: np.ndarray, previous_frame: Optional[np.ndarray]):
+        """Append a proxy frame to the block (starting a new one where there is no previous frame)"""
+        if self._block is None or self._block.shape[1:] != frame.shape:
+            self._flush_block()
+            self._block = np.empty((self.block_size + 1,) + frame.shape, dtype=frame.dtype)
+            self._block_fill = 0
+        if previous_frame is None:
+            self._flush_block()
+            self._block_fill = 0
+        elif self._block_fill == 0:
+            self._block[0] = previous_frame
+            self._block_fill = 1
+        elif self._block_fill == len(self._block):
+            self._flush_block()
+        
+        self._block[self._block_fill] = frame
+        self._block_fill += 1
+    
+    def _flush_block(self):
+        """Compute motion features of the pending frames in one block"""
+        if self._block_rows:
+            motion = self.move_detector.extract_motion_features_block(self._block[1:self._block_fill], self._block[0])
+            profiles = self._bin_profile(motion.column_activity)
+            for position, row in self._block_rows:
+                # Position 0 holds the previous frame, so features are one row behind
+                pair = position - 1
+                frame_num, has_motion, _, _, _, _, frame_hash, static = self._motion_rows[row]
+                self._motion_rows[row] = (
+                    frame_num, has_motion, motion.diff_histogram[pair], motion.left_activity[pair],
+                    motion.right_activity[pair], profiles[pair], frame_hash, static
+                )
+            self._block_rows = []
+        
+        if self._block is not None and self._block_fill:
+            # The last frame is the previous frame of the next block's first
+            self._block[0] = self._block[self._block_fill - 1]
+            self._block_fill = 1
+    
+    def _on_hud_frame(self, frame_num: int, frame: np.ndarray, previous_frame: Optional[np.ndarray]):
+        """Read HUD bars from a full-resolution frame"""
+        if frame_num == self._static_frame and self._last_hud_row is not None:
+            # Unchanged frame: the bars read the same as before. A timer
+            # digit is too small to change the thumbnail, so the timer is
+            # read anyway (it also must not miss a second while learning)
+            player1, player2 = self._last_hud_row[:2]
+            timer = self._last_hud_row[-1]
+            if not (np.isnan(player1) and np.isnan(player2)):
+                timer = self.game_state_detector.detect_timer(
+                    frame, frame_num, {"player1_health": player1, "player2_health": player2})
+            self._last_hud_row = self._last_hud_row[:-1] + (timer,)
+            self._hud_rows.append(self._last_hud_row)
+            return
+        
+        self._last_hud_row = self.game_state_detector.read_hud(frame, frame_num)
+        self._hud_rows.append(self._last_hud_row)
+    
+    def _on_start_frame(self, frame_num: int, frame: np.ndarray, previous_frame: Optional[np.ndarray]):
+        """Count character-like pixels on each side of an early frame"""
+        width = frame.shape[1]
+        self._start_rows.append((
+            frame_num,
+            self._character_pixels(frame[:, :width//2]),
+            self._character_pixels(frame[:, width//2:])
+        ))
+    
+    def _spill_rows(self):
+        """Move the completed rows collected so far into the spill"""
+        # Rows waiting for their block's features are completed first
+        self._flush_block()
+        count = min(len(self._motion_rows), len(self._hud_rows))
+        if count == 0:
+            return
+        if self._spill is None:
+            self._spill = self.memory_budget.new_spill()
+        self._spill.append(self._table(self._motion_rows[:count], self._hud_rows[:count], []))
+        del self._motion_rows[:count]
+        del self._hud_rows[:count]
+    
+    def _finish(self):
+        """Stack the collected rows into a FrameFeatures table"""
+        self._flush_block()
+        features = self._table(self._motion_rows, self._hud_rows, self._start_rows)
+        if self._spill is not None:
+            self._spill.append(features)
+            features = self._spill.load()
+        
+        self.features = features
+        self._reset()
+    
+    @staticmethod
+    def _table(motion_rows: List[Tuple], hud_rows: List[Tuple], start_rows: List[Tuple]) -> FrameFeatures:
+        """Stack collected rows into a FrameFeatures table"""
+        features = FrameFeatures.empty()
+        
+        if motion_rows:
+            count = len(motion_rows)
+            features.frames = np.array([row[0] for row in motion_rows], dtype=np.int32)
+            features.has_motion = np.array([row[1] for row in motion_rows], dtype=bool)
+            features.diff_histogram = np.zeros((count, 256), dtype=np.uint32)
+            features.activity_profile = np.zeros((count, PROFILE_BINS), dtype=np.int64)
+            for i, row in enumerate(motion_rows):
+                if row[2] is not None:
+                    features.diff_histogram[i] = row[2]
+                if row[5] is not None:
+                    features.activity_profile[i] = row[5]
+            features.left_activity = np.array([row[3] for row in motion_rows], dtype=np.int64)
+            features.right_activity = np.array([row[4] for row in motion_rows], dtype=np.int64)
+            features.frame_hash = np.array([row[6] for row in motion_rows], dtype=np.uint64)
+            features.static = np.array([row[7] for row in motion_rows], dtype=bool)
+            
+            # Both consumers sample the same frames, so HUD rows line up
+            hud = np.array(hud_rows, dtype=np.float64).reshape(-1, 7)[:count]
+            features.health = hud[:, :2].astype(np.float32)
+            features.meter = hud[:, 2:4].astype(np.int16)
+            features.steam = hud[:, 4:6].astype(np.int16)
+            features.timer = hud[:, 6].astype(np.int16)
+        
+        if start_rows:
+            features.start_frames = np.array([row[0] for row in start_rows], dtype=np.int32)
+            features.start_character_pixels = np.array([row[1:] for row in start_rows], dtype=np.int64)
+        
+        return features
+    
+    @staticmethod
+    def _bin_profile(column_activity: np.ndarray) -> np.ndarray:
+        """Sum per-column activity (last axis, so blocks work too) into PROFILE_BINS horizontal bins"""
+        width = column_activity.shape[-1]
+        edges = np.linspace(0, width, PROFILE_BINS + 1).astype(np.int64)[:-1]
+        edges = np.minimum(edges, width - 1)
+        profile = np.add.reduceat(column_activity, edges, axis=-1)
+        # reduceat returns the single element for empty bins (narrow frames)
+        profile[..., np.diff(np.append(edges, width)) == 0] = 0
+        return profile
+    
+    @staticmethod
+    def _difference_hash(frame: np.ndarray) -> int:
+        """64-bit difference hash, stable across re-encodes of the same frame"""
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = (small[:, 1:] > small[:, :-1]).ravel()
+        return int(np.packbits(bits).view(">u8")[0])
+    
+    @staticmethod
+    def _thumbnail(frame: np.ndarray) -> np.ndarray:
+        """Tiny grayscale thumbnail used to recognize unchanged frames"""
+        gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, STATIC_THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+    
+    @staticmethod
+    def _character_pixels(region: np.ndarray) -> int:
+        """Detect number of character-like pixels in region"""
+        gray = region if region.ndim == 2 else cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
+        # Character pixels are typically not too dark and not too bright
+        mask = (gray > 30) & (gray < 220)
+        return int(np.count_nonzero(mask))
@@ -0,0 +1,83 @@
+"""
+Low-resolution analysis proxy for motion and hit detection.
+
+Motion detectors only need coarse frame differences, so instead of running
+absdiff/cvtColor/sum on full 1920x1080x3 frames they work on a small
+copy (480x270 by default) made once per decoded frame. The proxy stays in
+color by default: detectors convert the difference to gray, and a
+difference of gray frames would miss changes of hue at equal brightness
+(for instance a hit spark on a same-luma background). Pixel
+count thresholds tuned at full resolution are rescaled to the proxy so
+detections stay comparable.
+"""
+
+import cv2
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+
+class FrameProxy:
+    """Produces downscaled (optionally grayscale, cropped) analysis frames"""
+    
+    def __init__(self, frame_width: int, frame_height: int, width: int = 480,
+                 grayscale: bool = False, roi: Optional[Tuple[int, int, int, int]] = None):
+        """
+        Initialize frame proxy
+        
+        Args:
+            frame_width: Width of decoded frames
+            frame_height: Height of decoded frames
+            width: Proxy width, height follows the aspect ratio (0 = keep resolution)
+            grayscale: Convert proxy frames to single-channel grayscale (cheaper,
+                but color-only changes no longer show in their difference)
+            roi: (x, y, width, height) crop in full-resolution pixels applied
+                before downscaling (None = whole frame)
+        """
+        x, y, w, h = roi or (0, 0, frame_width, frame_height)
+        x = min(max(0, int(x)), frame_width - 1)
+        y = min(max(0, int(y)), frame_height - 1)
+        w = max(1, min(int(w), frame_width - x))
+        h = max(1, min(int(h), frame_height - y))
+        self.roi = (x, y, w, h)
+        self.grayscale = grayscale
+        
+        self.width = min(int(width), w) if width else w
+        self.height = max(1, round(h * self.width / w))
+        
+        # Proxy pixels per full-resolution pixel of the cropped area
+        self.scale = (self.width * self.height) / (w * h)
+    
+    @classmethod
+    def from_settings(cls, frame_width: int, frame_height: int, settings: Dict) -> "FrameProxy":
+        """Create a proxy from ANALYSIS_SETTINGS-style options"""
+        return cls(frame_width, frame_height,
+                   width=settings.get("proxy_width", 480),
+                   grayscale=settings.get("proxy_grayscale", False),
+                   roi=settings.get("proxy_roi"))
+    
+    def make(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Build the proxy of a decoded frame
+        
+        Args:
+            frame: Full-resolution BGR frame
+        
+        Returns:
+            New uint8 proxy frame (never a view of the decode buffer)
+        """
+        x, y, w, h = self.roi
+        region = frame[y:y+h, x:x+w]
+        
+        # Downscale first so the color conversion runs on the small image
+        if (self.width, self.height) != (w, h):
+            region = cv2.resize(region, (self.width, self.height), interpolation=cv2.INTER_AREA)
+        
+        if self.grayscale:
+            return cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
+        if (self.width, self.height) == (w, h):
+            return region.copy()
+        return region
+    
+    def scale_pixel_count(self, count: float) -> int:
+        """Rescale a full-resolution pixel count threshold to the proxy"""
+        return max(1, int(round(count * self.scale)))
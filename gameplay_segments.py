@@ -0,0 +1,117 @@
+"""
+Coarse gameplay / non-gameplay classification of a video.
+
+Raw stream VODs spend much of their runtime outside matches: character
+select, loading screens, menus, pauses and replays. A cheap first pass
+samples the video at a low rate (2 fps by default) on a tiny color proxy
+and checks each sample for the in-match HUD. Samples are grouped into
+gameplay segments, and the full-resolution analysis then only decodes
+frames inside them.
+
+Grouping is deliberately forgiving: short HUD dropouts inside a match
+(super cinematics, screen flashes) are bridged, very short HUD sightings
+are dropped, and every segment is padded by one sample interval so the
+transitions into and out of gameplay are never cut off.
+"""
+
+import numpy as np
+from typing import List, Sequence, Tuple
+from frame_proxy import FrameProxy
+from move_detector import GameStateDetector
+from video_processor import VideoProcessor
+
+
+def group_gameplay_samples(sample_frames: Sequence[int], hud_present: Sequence[bool],
+                           frame_count: int, merge_gap: int, min_length: int) -> List[Tuple[int, int]]:
+    """
+    Turn per-sample HUD detections into gameplay frame ranges
+    
+    Each sample stands for the frames up to the next sample.
+    
+    Args:
+        sample_frames: Sampled frame numbers, ascending
+        hud_present: Whether the HUD was found in each sample
+        frame_count: Total number of frames
+        merge_gap: Bridge HUD dropouts up to this many frames long
+        min_length: Drop gameplay segments shorter than this many frames
+    
+    Returns:
+        List of (start_frame, end_frame) ranges
+    """
+    if len(sample_frames) == 0:
+        return []
+    
+    # Runs of consecutive HUD samples, as frame ranges
+    runs = []
+    for i, present in enumerate(hud_present):
+        if not present:
+            continue
+        start = sample_frames[i]
+        end = sample_frames[i + 1] if i + 1 < len(sample_frames) else frame_count
+        if runs and runs[-1][1] == start:
+            runs[-1][1] = end
+        else:
+            runs.append([start, end])
+    
+    merged = []
+    for start, end in runs:
+        if merged and start - merged[-1][1] <= merge_gap:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    
+    # Pad by one sample interval: the HUD appears and disappears between samples
+    interval = sample_frames[1] - sample_frames[0] if len(sample_frames) > 1 else 0
+    segments = []
+    for start, end in merged:
+        if end - start < min_length:
+            continue
+        start, end = max(0, start - interval), min(frame_count, end + interval)
+        if segments and start <= segments[-1][1]:
+            segments[-1] = (segments[-1][0], end)
+        else:
+            segments.append((start, end))
+    
+    return segments
+
+
+def find_gameplay_segments(video: VideoProcessor, game_state_detector: GameStateDetector,
+                           sample_fps: float = 2.0, proxy_width: int = 160,
+                           merge_gap: float = 3.0, min_length: float = 2.0,
+                           block_size: int = 32) -> List[Tuple[int, int]]:
+    """
+    Find the parts of a video that show gameplay
+    
+    Proxies are checked for the HUD a block at a time
+    (GameStateDetector.detect_hud_block()).
+    
+    Args:
+        video: Video to scan
+        game_state_detector: Recognizes the in-match HUD
+        sample_fps: Samples per second of video
+        proxy_width: Width of the color proxy the HUD is looked for in
+        merge_gap: Seconds without HUD still counted as gameplay
+        min_length: Shortest gameplay segment in seconds
+        block_size: Proxies per HUD check
+    
+    Returns:
+        List of (start_frame, end_frame) ranges
+    """
+    proxy = FrameProxy(video.width, video.height, width=proxy_width, grayscale=False)
+    block = np.empty((block_size, proxy.height, proxy.width, 3), dtype=np.uint8)
+    
+    sample_frames = []
+    hud_present = []
+    with video.stream(target_fps=sample_fps, history_size=0, desc="Finding gameplay") as frames:
+        for frame_num, frame in frames:
+            block[len(sample_frames) % block_size] = proxy.make(frame)
+            sample_frames.append(frame_num)
+            if len(sample_frames) % block_size == 0:
+                hud_present.extend(game_state_detector.detect_hud_block(block).tolist())
+    pending = len(sample_frames) - len(hud_present)
+    if pending:
+        hud_present.extend(game_state_detector.detect_hud_block(block[:pending]).tolist())
+    
+    fps = video.fps if video.fps > 0 else 30.0
+    return group_gameplay_samples(sample_frames, hud_present, video.frame_count,
+                                  int(merge_gap * fps), int(min_length * fps))
@@ -33,21 +33,25 @@ def main():
     print(f"\nVideo: {video_path}")
     
     # Step 1: Analyze gameplay with enhanced analyzer
+    # Analysis and character sampling share a single decode of the video
     print("\n[1/6] Analyzing gameplay with enhanced features...")
     analyzer = EnhancedAnalyzer(video_path, "mirror", "Blitzcrank")
-    report = analyzer.analyze()
+    identifier = EnhancedCharacterIdentifier(video_path, layout=analyzer.hud_layout)
+    # Sample more frames for usernames
+    report = analyzer.analyze(
+        extra_subscribers=lambda bus: identifier.subscribe(bus, image_samples=10, username_samples=10)
+    )
     enhanced_data = report.get("enhanced_data", {})
     analyzer.close()
     
     # Step 2: Identify characters with starting positions
     print("\n[2/6] Identifying characters and starting positions...")
-    identifier = EnhancedCharacterIdentifier(video_path)
     
     # Get character info at start of round
-    start_character_info = identifier.identify_characters_at_start()
+    start_character_info = identifier.start_character_info
     
-    # Extract character images
-    character_images = identifier.extract_character_images(num_samples=10)
+    # Character images sampled during the shared decode
+    character_images = identifier.character_images
     
     # Build character info with starting positions
     character_info = {}
@@ -70,8 +74,8 @@ def main():
             "starting_position": start_info.get("starting_position") or enhanced_data.get("starting_positions", {}).get(player, "left" if player == "player1" else "right")
         }
     
-    # Extract usernames with improved method
-    usernames = identifier.extract_usernames(num_samples=10)  # Sample more frames
+    # Usernames sampled during the shared decode
+    usernames = identifier.usernames
     # Fallback to default names if extraction fails
     if not usernames.get('player1'):
         usernames['player1'] = "Player 1"
@@ -0,0 +1,263 @@
+"""
+Health bar reading from the in-match HUD.
+
+The HUD layout profile (hud_layout.py) only says roughly where the bars are.
+The exact bar geometry is calibrated once per video from the first frame
+that shows both bars full: at the start of a round the two bars are mirror
+images of each other, which is checked so that a frame from the middle of
+a round (or one with an effect over the HUD) is not taken as the layout.
+
+Reading a calibrated bar converts only a few pixel rows of its strip (a few
+kilobytes) and counts the columns that still have the bar's color, so it is
+cheap enough for every sampled frame. Health drains from one end of a bar,
+so a reading is only trusted when the colored columns form one run from
+either end; anything else (menus, replays, effects over the HUD) reads as
+NaN.
+"""
+
+import cv2
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# A pixel belongs to a bar when it is at least this saturated and bright
+BAR_SATURATION = 80
+BAR_VALUE = 80
+
+# Share of a pixel row that must be bar-colored for the row to be in a bar
+BAR_ROW_FILL = 0.3
+
+# Shortest calibrated bar as a share of its region's width (full bars)
+MIN_BAR_SPAN = 0.5
+
+# Allowed mismatch between the two bars at calibration, as a share of the
+# frame width (position and length) and height (rows)
+MIRROR_TOLERANCE = 0.01
+
+# Hue distance (OpenCV hue, 0-179) allowed on top of the calibrated spread
+HUE_MARGIN = 4
+MIN_HUE_TOLERANCE = 8
+
+# Widest hue spread of a calibrated bar; wider means the strip holds more
+# than the bar color (e.g. the drained part of two equally damaged bars)
+MAX_HUE_SPREAD = 20
+
+# Pixel rows of a bar checked per reading
+READ_ROWS = 3
+
+# Share of the colored columns that must be one run from an end of the bar
+RUN_SHARE = 0.9
+
+# Health percentage changes smaller than this are reading noise
+HEALTH_NOISE = 0.5
+
+
+@dataclass
+class HealthBarLayout:
+    """Calibrated geometry and color of both health bars"""
+    frame_size: Tuple[int, int]  # (width, height) of the frames it was calibrated on
+    bars: Tuple[Tuple[int, int, int, int], ...]  # player1/player2 (x, y, width, height) in pixels
+    hues: Tuple[float, ...]  # player1/player2 bar hue (OpenCV, 0-179)
+    hue_tolerances: Tuple[float, ...]  # player1/player2 largest hue distance still counted as bar
+    # Per bar: pixel rows read and a lookup table of bar hues (derived)
+    read_rows: Tuple[np.ndarray, ...] = field(init=False, repr=False, compare=False)
+    hue_tables: Tuple[np.ndarray, ...] = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        """Derive what reading needs from the calibrated values"""
+        # A few rows from the middle of each bar, away from its border
+        self.read_rows = tuple(
+            np.unique(np.linspace(y + height // 4, y + height - 1 - height // 4, READ_ROWS).astype(np.int64))
+            for _, y, _, height in self.bars
+        )
+        self.hue_tables = tuple(
+            hue_distance(np.arange(256), hue) <= tolerance
+            for hue, tolerance in zip(self.hues, self.hue_tolerances)
+        )
+    
+    def to_dict(self) -> Dict:
+        """JSON-serializable form"""
+        return {
+            "frame_size": list(self.frame_size),
+            "bars": [list(bar) for bar in self.bars],
+            "hues": list(self.hues),
+            "hue_tolerances": list(self.hue_tolerances)
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "HealthBarLayout":
+        """Inverse of to_dict()"""
+        return cls(
+            frame_size=tuple(data["frame_size"]),
+            bars=tuple(tuple(bar) for bar in data["bars"]),
+            hues=tuple(data["hues"]),
+            hue_tolerances=tuple(data["hue_tolerances"])
+        )
+
+
+def calibrate_health_bars(frame: np.ndarray,
+                          regions: Sequence[Tuple[float, float, float, float]]) -> Optional[HealthBarLayout]:
+    """
+    Locate both health bars in a frame that shows them full
+    
+    Args:
+        frame: BGR video frame
+        regions: player1/player2 (x, y, width, height) areas to search, as
+            fractions of the frame (HudLayout.health_bar_regions)
+    
+    Returns:
+        Layout of the bars, or None if the frame does not show two full,
+        mirrored bars
+    """
+    height, width = frame.shape[:2]
+    bars, hues, tolerances = [], [], []
+    for rx, ry, rw, rh in regions:
+        x, y = int(rx * width), int(ry * height)
+        region = frame[y:y + max(1, int(rh * height)), x:x + max(1, int(rw * width))]
+        hsv = cv2.cvtColor(region, cv2.COLOR_BGR2HSV)
+        mask = (hsv[:, :, 1] > BAR_SATURATION) & (hsv[:, :, 2] > BAR_VALUE)
+        
+        rows = longest_run(mask.mean(axis=1) >= BAR_ROW_FILL)
+        if rows is None:
+            return None
+        columns = longest_run(mask[rows[0]:rows[1]].mean(axis=0) >= 0.5)
+        if columns is None or columns[1] - columns[0] < MIN_BAR_SPAN * region.shape[1]:
+            return None
+        
+        bar_mask = mask[rows[0]:rows[1], columns[0]:columns[1]]
+        bar_hues = hsv[rows[0]:rows[1], columns[0]:columns[1], 0][bar_mask].astype(np.float64)
+        hue = mean_hue(bar_hues)
+        spread = np.percentile(hue_distance(bar_hues, hue), 95)
+        if spread > MAX_HUE_SPREAD:
+            return None
+        
+        bars.append((x + columns[0], y + rows[0], columns[1] - columns[0], rows[1] - rows[0]))
+        hues.append(round(hue, 1))
+        tolerances.append(round(float(max(MIN_HUE_TOLERANCE, spread + HUE_MARGIN)), 1))
+    
+    # Full bars are mirror images of each other about the middle of the two
+    # regions (the middle of the game picture, which may be off-center)
+    (x1, y1, w1, h1), (x2, y2, w2, h2) = bars
+    center = (regions[0][0] + regions[1][0] + regions[1][2]) / 2 * width
+    column_tolerance = max(2, MIRROR_TOLERANCE * width)
+    row_tolerance = max(2, MIRROR_TOLERANCE * height)
+    if (abs((x1 - center) + (x2 + w2 - center)) > column_tolerance or abs(w1 - w2) > column_tolerance
+            or abs(y1 - y2) > row_tolerance or abs(h1 - h2) > row_tolerance):
+        return None
+    
+    return HealthBarLayout(frame_size=(width, height), bars=tuple(bars),
+                           hues=tuple(hues), hue_tolerances=tuple(tolerances))
+
+
+def read_health_bars(frame: np.ndarray, layout: HealthBarLayout) -> Tuple[float, float]:
+    """
+    Read both health bars with a calibrated layout
+    
+    Args:
+        frame: BGR video frame at the layout's frame size
+        layout: Calibrated bar layout
+    
+    Returns:
+        (player1, player2) health percentages, NaN where a bar could not be read
+    """
+    readings = []
+    for (x, _, width, _), rows, hue_table in zip(layout.bars, layout.read_rows, layout.hue_tables):
+        hsv = cv2.cvtColor(np.ascontiguousarray(frame[rows, x:x + width]), cv2.COLOR_BGR2HSV)
+        colored = hue_table[hsv[:, :, 0]] & (hsv[:, :, 1] > BAR_SATURATION) & (hsv[:, :, 2] > BAR_VALUE)
+        # Most of the rows read must agree
+        filled = 2 * colored.sum(axis=0) > len(rows)
+        
+        count = int(np.count_nonzero(filled))
+        if count and max(np.count_nonzero(filled[:count]), np.count_nonzero(filled[width - count:])) < RUN_SHARE * count:
+            readings.append(np.nan)
+        else:
+            readings.append(round(100.0 * count / width, 1))
+    
+    # An empty bar is a knockout only while the other bar shows health;
+    # two empty bars mean the HUD is not on screen
+    player1, player2 = readings
+    if player1 == 0 and not player2 > 0:
+        player1 = np.nan
+    if player2 == 0 and not player1 > 0:
+        player2 = np.nan
+    return player1, player2
+
+
+def health_losses(health: np.ndarray, noise: float = HEALTH_NOISE) -> np.ndarray:
+    """
+    Health lost at each sample
+    
+    Every lasting drop (see settled_changes()) is a loss; rises (refills
+    between rounds) are not counted.
+    
+    Args:
+        health: (N, 2) player1/player2 health percentages, NaN where unreadable
+        noise: Smallest change counted
+    
+    Returns:
+        (N, 2) float64 percentage points lost at each sample
+    """
+    health = np.asarray(health, dtype=np.float64)
+    lost = np.zeros(health.shape, dtype=np.float64)
+    for player in range(health.shape[1]):
+        for row, change in settled_changes(health[:, player], noise):
+            if change < 0:
+                lost[row, player] = -change
+    return lost
+
+
+def settled_changes(readings: np.ndarray, noise: float) -> List[Tuple[int, float]]:
+    """
+    Lasting changes in a series of bar readings
+    
+    Readings are median-filtered over three readable samples (so a single
+    misread is not a change), then every reading more than noise away from
+    the last settled level is a change and becomes the new level.
+    
+    Args:
+        readings: (N,) readings, NaN where unreadable
+        noise: Smallest change counted
+    
+    Returns:
+        (index, change) pairs in index order, change negative for drops
+    """
+    readings = np.asarray(readings, dtype=np.float64)
+    rows = np.flatnonzero(~np.isnan(readings))
+    values = readings[rows]
+    if len(values) >= 3:
+        window = np.stack([np.r_[values[:1], values[:-1]], values, np.r_[values[1:], values[-1:]]])
+        values = np.median(window, axis=0)
+    
+    changes = []
+    level = None
+    for row, value in zip(rows.tolist(), values.tolist()):
+        if level is None:
+            level = value
+        elif abs(value - level) > noise:
+            changes.append((row, value - level))
+            level = value
+    return changes
+
+
+def longest_run(flags: np.ndarray) -> Optional[Tuple[int, int]]:
+    """(start, end) of the longest run of True values, or None if there is none"""
+    padded = np.concatenate(([False], flags, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    if len(edges) == 0:
+        return None
+    starts, ends = edges[::2], edges[1::2]
+    longest = int(np.argmax(ends - starts))
+    return int(starts[longest]), int(ends[longest])
+
+
+def mean_hue(hues: np.ndarray) -> float:
+    """Circular mean of OpenCV hues (0-179, red wraps around)"""
+    angles = hues * (np.pi / 90.0)
+    return float(np.arctan2(np.sin(angles).mean(), np.cos(angles).mean()) * (90.0 / np.pi)) % 180.0
+
+
+def hue_distance(hues: np.ndarray, hue: float) -> np.ndarray:
+    """Circular distance between OpenCV hues"""
+    distance = np.abs(hues.astype(np.float64) - hue) % 180.0
+    return np.minimum(distance, 180.0 - distance)
@@ -0,0 +1,347 @@
+"""
+HUD layout profiles.
+
+Where the HUD sits depends on the shape of the game picture, not on its
+resolution: 720p, 1080p, 1440p and 4K recordings scale the same 16:9 HUD,
+while ultrawide output keeps the HUD in a centered 16:9 area. Each shape
+has a JSON profile in hud_profiles/ giving the health bar, meter, Steam
+gauge, timer and username regions as (x, y, width, height) fractions of the
+game picture.
+
+Streams and captures do not always fill the frame with the game picture:
+it may be letterboxed or pillarboxed in black, or framed by a stream
+overlay. detect_game_area() finds the picture from a few frames spread over
+the video (overlays and bars stay the same while the picture changes), and
+the profile matching its aspect ratio is mapped into it. The result is
+stored (in a cache directory, or next to the video as <video>.hud.json)
+and reused until the video file changes.
+"""
+
+import glob
+import json
+import os
+import cv2
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+from health_bars import longest_run
+
+
+Region = Tuple[float, float, float, float]
+
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hud_profiles")
+
+# Profile used when no profile matches the picture's aspect ratio
+DEFAULT_PROFILE = "16x9"
+
+# Bump when the stored format changes
+LAYOUT_VERSION = 2
+
+# Frames sampled (over the middle of the video) to find the game picture
+DETECTION_FRAMES = 8
+
+# Width frames are reduced to for finding the game picture
+DETECTION_WIDTH = 320
+
+# Pixels darker than this in every sampled frame are letterbox bars
+BORDER_BRIGHTNESS = 24
+
+# Pixels changing less than this across the sampled frames are overlay
+STATIC_LEVEL = 8
+
+# Share of a pixel row or column that must change for it to be game picture
+ACTIVE_SHARE = 0.1
+
+# Relative aspect ratio difference still matching a profile
+ASPECT_TOLERANCE = 0.03
+
+# A game picture this close (share of the frame) to every edge fills the frame
+EDGE_TOLERANCE = 0.02
+
+
+@dataclass
+class HudLayout:
+    """HUD regions of a profile, placed in the frame"""
+    name: str  # Profile name
+    aspect: float  # Width / height of the game picture the regions are given in
+    health_bars: Tuple[Region, Region]  # player1/player2, fractions of the game picture
+    meters: Tuple[Region, Region]  # player1/player2, fractions of the game picture
+    steam_gauges: Tuple[Region, Region]  # player1/player2 Steam Steam gauges, fractions of the game picture
+    timer: Region  # Fractions of the game picture
+    usernames: Tuple[Region, Region]  # player1/player2, fractions of the game picture
+    game_area: Region = (0.0, 0.0, 1.0, 1.0)  # Game picture as fractions of the frame
+    
+    def frame_region(self, region: Region) -> Region:
+        """Region of the game picture as (x, y, width, height) fractions of the frame"""
+        gx, gy, gw, gh = self.game_area
+        x, y, w, h = region
+        return (gx + x * gw, gy + y * gh, w * gw, h * gh)
+    
+    @property
+    def health_bar_regions(self) -> Tuple[Region, Region]:
+        """player1/player2 health bar areas, fractions of the frame"""
+        return tuple(self.frame_region(region) for region in self.health_bars)
+    
+    @property
+    def meter_regions(self) -> Tuple[Region, Region]:
+        """player1/player2 super meter areas, fractions of the frame"""
+        return tuple(self.frame_region(region) for region in self.meters)
+    
+    @property
+    def steam_gauge_regions(self) -> Tuple[Region, Region]:
+        """player1/player2 Steam Steam gauge areas, fractions of the frame"""
+        return tuple(self.frame_region(region) for region in self.steam_gauges)
+    
+    @property
+    def timer_region(self) -> Region:
+        """Round timer area, fractions of the frame"""
+        return self.frame_region(self.timer)
+    
+    @property
+    def username_regions(self) -> Tuple[Region, Region]:
+        """player1/player2 username areas, fractions of the frame"""
+        return tuple(self.frame_region(region) for region in self.usernames)
+    
+    def placed(self, game_area: Region) -> "HudLayout":
+        """The same profile with the game picture at game_area"""
+        return HudLayout(name=self.name, aspect=self.aspect, health_bars=self.health_bars, meters=self.meters,
+                         steam_gauges=self.steam_gauges, timer=self.timer, usernames=self.usernames, game_area=tuple(game_area))
+    
+    def to_dict(self) -> Dict:
+        """JSON-serializable form"""
+        return {
+            "name": self.name,
+            "aspect": self.aspect,
+            "regions": {
+                "health_bars": [list(region) for region in self.health_bars],
+                "meters": [list(region) for region in self.meters],
+                "steam_gauges": [list(region) for region in self.steam_gauges],
+                "timer": list(self.timer),
+                "usernames": [list(region) for region in self.usernames]
+            },
+            "game_area": list(self.game_area)
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "HudLayout":
+        """Inverse of to_dict() (also reads profile files)"""
+        regions = data["regions"]
+        return cls(
+            name=data["name"],
+            aspect=float(data["aspect"]),
+            health_bars=tuple(tuple(region) for region in regions["health_bars"]),
+            meters=tuple(tuple(region) for region in regions["meters"]),
+            steam_gauges=tuple(tuple(region) for region in regions["steam_gauges"]),
+            timer=tuple(regions["timer"]),
+            usernames=tuple(tuple(region) for region in regions["usernames"]),
+            game_area=tuple(data.get("game_area", (0.0, 0.0, 1.0, 1.0)))
+        )
+    
+    @staticmethod
+    def layout_path(base_path: str) -> str:
+        """Layout file for a video data base path (the video path itself when kept next to it)"""
+        return f"{base_path}.hud.json"
+    
+    @classmethod
+    def load(cls, video_path: str, path: str) -> Optional["HudLayout"]:
+        """
+        Load the stored layout of a video
+        
+        Args:
+            video_path: Path to video file
+            path: Layout file
+        
+        Returns:
+            HudLayout, or None if there is none or the video has changed
+        """
+        if not os.path.exists(path):
+            return None
+        
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            if data["version"] != LAYOUT_VERSION or tuple(data["signature"]) != _signature(video_path):
+                return None
+            return cls.from_dict(data["layout"])
+        except (OSError, KeyError, TypeError, ValueError):
+            return None
+    
+    def save(self, video_path: str, path: str) -> bool:
+        """
+        Store the layout of a video
+        
+        Args:
+            video_path: Path to video file
+            path: Layout file (its directory is created if needed)
+        
+        Returns:
+            False if the file could not be written
+        """
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "w") as f:
+                json.dump({"version": LAYOUT_VERSION, "signature": list(_signature(video_path)),
+                           "layout": self.to_dict()}, f, indent=2)
+            return True
+        except OSError:
+            return False
+
+
+def load_profiles(profile_dir: str = PROFILE_DIR) -> Dict[str, HudLayout]:
+    """
+    Load the HUD profiles
+    
+    Args:
+        profile_dir: Directory of profile JSON files
+    
+    Returns:
+        Dictionary of profile name to layout (filling the frame)
+    """
+    profiles = {}
+    for path in sorted(glob.glob(os.path.join(profile_dir, "*.json"))):
+        with open(path) as f:
+            layout = HudLayout.from_dict(json.load(f))
+        profiles[layout.name] = layout
+    return profiles
+
+
+def default_layout() -> HudLayout:
+    """The standard 16:9 profile, filling the frame"""
+    return load_profiles()[DEFAULT_PROFILE]
+
+
+def detect_game_area(frames: Sequence[np.ndarray]) -> Region:
+    """
+    Find the game picture in frames that may carry bars or an overlay
+    
+    Args:
+        frames: BGR frames spread over the video
+    
+    Returns:
+        (x, y, width, height) of the game picture, fractions of the frame
+        (the whole frame if it could not be told apart)
+    """
+    if len(frames) < 2:
+        return (0.0, 0.0, 1.0, 1.0)
+    
+    height, width = frames[0].shape[:2]
+    size = (min(width, DETECTION_WIDTH), max(1, round(height * min(width, DETECTION_WIDTH) / width)))
+    gray = np.stack([
+        cv2.resize(frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), size,
+                   interpolation=cv2.INTER_AREA)
+        for frame in frames
+    ])
+    
+    # The picture changes between samples; bars stay dark and overlays stay put
+    brightest, darkest = gray.max(axis=0), gray.min(axis=0)
+    active = (brightest > BORDER_BRIGHTNESS) & (brightest - darkest > STATIC_LEVEL)
+    rows = longest_run(active.mean(axis=1) >= ACTIVE_SHARE)
+    columns = longest_run(active.mean(axis=0) >= ACTIVE_SHARE)
+    if rows is None or columns is None:
+        return (0.0, 0.0, 1.0, 1.0)
+    
+    rows_h, cols_w = gray.shape[1:3]
+    return (columns[0] / cols_w, rows[0] / rows_h, (columns[1] - columns[0]) / cols_w, (rows[1] - rows[0]) / rows_h)
+
+
+def choose_layout(frame_size: Tuple[int, int], game_area: Region,
+                  profiles: Optional[Dict[str, HudLayout]] = None) -> HudLayout:
+    """
+    Pick the profile for a game picture and place it in the frame
+    
+    The detected picture is used when its aspect ratio matches a profile;
+    otherwise the whole frame is (dark stage edges can make the detected
+    picture too small), and the default profile is the last resort.
+    
+    Args:
+        frame_size: (width, height) of the frames
+        game_area: Detected game picture (detect_game_area())
+        profiles: Profiles to choose from (None = load_profiles())
+    
+    Returns:
+        Layout placed in the frame
+    """
+    profiles = profiles if profiles is not None else load_profiles()
+    width, height = frame_size
+    x, y, w, h = game_area
+    if x <= EDGE_TOLERANCE and y <= EDGE_TOLERANCE and x + w >= 1 - EDGE_TOLERANCE and y + h >= 1 - EDGE_TOLERANCE:
+        game_area = (0.0, 0.0, 1.0, 1.0)
+    
+    for area in (game_area, (0.0, 0.0, 1.0, 1.0)):
+        aspect = area[2] * width / max(1e-9, area[3] * height)
+        profile = _matching_profile(profiles, aspect)
+        if profile is not None:
+            return profile.placed(_fit_aspect(area, profile.aspect, frame_size))
+    
+    print(f"Warning: no HUD profile for {width}x{height} frames, using {DEFAULT_PROFILE}")
+    return profiles[DEFAULT_PROFILE]
+
+
+def load_or_detect_layout(video, profile: Optional[str] = None, path: Optional[str] = None) -> HudLayout:
+    """
+    HUD layout of a video, detected on first use and stored at path
+    
+    Args:
+        video: VideoProcessor of the video
+        profile: Profile name to use instead of detecting one (the game
+            picture must then fill the frame)
+        path: Layout file (None = detect without storing)
+    
+    Returns:
+        Layout placed in the video's frames
+    """
+    profiles = load_profiles()
+    if profile is not None:
+        if profile not in profiles:
+            raise ValueError(f"HUD profile {profile} not found. Available: {list(profiles.keys())}")
+        return profiles[profile]
+    
+    layout = HudLayout.load(video.video_path, path) if path is not None else None
+    if layout is None:
+        frame_numbers = np.linspace(0.1 * video.frame_count, 0.9 * video.frame_count, DETECTION_FRAMES, dtype=int)
+        frames = list(video.get_frames(frame_numbers).values())
+        layout = choose_layout((video.width, video.height), detect_game_area(frames), profiles)
+        if path is not None and not layout.save(video.video_path, path):
+            print(f"Warning: could not save HUD layout to {path}")
+    return layout
+
+
+def crop(frame: np.ndarray, region: Region) -> np.ndarray:
+    """Pixels of a region given as (x, y, width, height) fractions of the frame (a view)"""
+    height, width = frame.shape[:2]
+    rx, ry, rw, rh = region
+    x, y = int(rx * width), int(ry * height)
+    return frame[y:y + max(1, int(rh * height)), x:x + max(1, int(rw * width))]
+
+
+def _matching_profile(profiles: Dict[str, HudLayout], aspect: float) -> Optional[HudLayout]:
+    """Profile whose aspect ratio is closest to aspect, if within tolerance"""
+    best = min(profiles.values(), key=lambda profile: abs(profile.aspect / aspect - 1), default=None)
+    if best is None or abs(best.aspect / aspect - 1) > ASPECT_TOLERANCE:
+        return None
+    return best
+
+
+def _fit_aspect(area: Region, aspect: float, frame_size: Tuple[int, int]) -> Region:
+    """Correct a detected picture to the profile's exact aspect ratio around its center"""
+    width, height = frame_size
+    x, y, w, h = area
+    if area == (0.0, 0.0, 1.0, 1.0):
+        return area
+    if w >= 1 - EDGE_TOLERANCE or h < 1 - EDGE_TOLERANCE:
+        # Letterboxed (or framed): the width is the reliable side
+        new_h = min(1.0, w * width / aspect / height)
+        y = min(max(0.0, y + (h - new_h) / 2), 1.0 - new_h)
+        h = new_h
+    else:
+        # Pillarboxed: the height is the reliable side
+        new_w = min(1.0, h * height * aspect / width)
+        x = min(max(0.0, x + (w - new_w) / 2), 1.0 - new_w)
+        w = new_w
+    return tuple(round(value, 4) for value in (x, y, w, h))
+
+
+def _signature(video_path: str) -> Tuple[int, int]:
+    """File size and modification time, to detect a changed video"""
+    stat = os.stat(video_path)
+    return stat.st_size, stat.st_mtime_ns
@@ -0,0 +1,472 @@
+"""
+Live, low-latency analysis of a capture device, a growing recording or a
+raw frame stream.
+
+A capture thread reads the source as fast as it delivers frames and hands
+sampled frames to the analysis thread through a small bounded queue.
+Real-time sources (capture devices, stdin) cannot be paused, so when the
+detectors fall behind, frames are dropped instead of building up delay:
+the oldest queued frame when the queue is full, and any frame that has
+waited longer than the latency budget. Growing files can be paused, so
+their capture thread simply waits for room in the queue.
+
+Each analyzed frame goes through the same motion/hit and unchanged-frame
+detectors as offline analysis (see frame_features.py), and events are
+passed to a callback as soon as they are detected.
+
+Usage:
+    python analyzer.py --live 0                      # capture device 0
+    python analyzer.py --live recording.mkv          # file still being recorded
+    ffmpeg -i rtmp://... -f rawvideo -pix_fmt bgr24 - | \\
+        python analyzer.py --live - --live-size 1280x720 --live-fps 60
+"""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+import cv2
+import numpy as np
+from collections import deque
+from typing import BinaryIO, Callable, Dict, List, Optional
+from character_data import CHARACTER_DATA
+from config import ANALYSIS_SETTINGS
+from ffmpeg_capture import ffmpeg_available
+from frame_features import STATIC_THUMBNAIL_SIZE, STATIC_TOLERANCE
+from frame_proxy import FrameProxy
+from move_detector import MoveDetector
+
+
+class DeviceSource:
+    """Frames from a capture device (webcam, capture card)"""
+    
+    # Frames cannot be held back, so they are dropped when analysis falls behind
+    realtime = True
+    
+    def __init__(self, index: int):
+        """
+        Initialize device source
+        
+        Args:
+            index: OpenCV capture device index
+        """
+        self.cap = cv2.VideoCapture(index)
+        if not self.cap.isOpened():
+            raise ValueError(f"Could not open capture device {index}")
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+    
+    def read(self) -> Optional[np.ndarray]:
+        """Next frame, or None when the device stops delivering"""
+        ret, frame = self.cap.read()
+        return frame if ret else None
+    
+    def release(self):
+        """Close the device"""
+        self.cap.release()
+
+
+class GrowingFileSource:
+    """
+    Frames from a video file that is still being written
+    
+    Reads up to the current end of the file, then waits for it to grow. Use
+    a container that is readable while being recorded (MKV, MPEG-TS,
+    fragmented MP4); a regular MP4 only becomes readable once recording has
+    finished.
+    
+    With ffmpeg on the PATH the file is followed by a single ffmpeg process
+    (-follow 1), which keeps reading as data is appended. Otherwise the file
+    is reopened with OpenCV whenever it grows and the frames already read
+    are skipped with grab(); files being written have no index yet, so
+    seeking to the next frame is not reliable.
+    """
+    
+    # Reading can pause while analysis catches up, so no frames are dropped
+    realtime = False
+    
+    def __init__(self, path: str, poll_interval: float = 0.5, idle_timeout: float = 10.0):
+        """
+        Initialize growing file source
+        
+        Args:
+            path: Path to the video file
+            poll_interval: Seconds between checks for new data at the end of the file
+            idle_timeout: Stop when the file has not grown for this many seconds
+        """
+        self.path = path
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.position = 0  # Frame number of the next frame
+        self.cap = None
+        self._size = -1
+        self._closed = False
+        self._open()
+        if not self.cap.isOpened():
+            raise ValueError(f"Could not open video file: {path}")
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        
+        self._process: Optional[subprocess.Popen] = None
+        self._pipe: Optional[RawStreamSource] = None
+        if ffmpeg_available():
+            self.cap.release()
+            self._process = subprocess.Popen(
+                ["ffmpeg", "-v", "error", "-nostdin", "-follow", "1",
+                 "-rw_timeout", str(int(idle_timeout * 1e6)), "-i", f"file:{path}",
+                 "-map", "0:v:0", "-an", "-sn", "-vsync", "0",
+                 "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"],
+                stdout=subprocess.PIPE, stdin=subprocess.DEVNULL
+            )
+            self._pipe = RawStreamSource(self._process.stdout, self.width, self.height, self.fps)
+    
+    def _open(self):
+        """(Re)open the file and skip to the next unread frame"""
+        if self.cap is not None:
+            self.cap.release()
+        self._size = os.path.getsize(self.path)
+        self.cap = cv2.VideoCapture(self.path)
+        for _ in range(self.position):
+            if not self.cap.grab():
+                break
+    
+    def read(self) -> Optional[np.ndarray]:
+        """Next frame, waiting for the file to grow; None once it stopped growing"""
+        if self._pipe is not None:
+            frame = None if self._closed else self._pipe.read()
+            if frame is not None:
+                self.position += 1
+            return frame
+        
+        last_growth = time.monotonic()
+        while not self._closed:
+            ret, frame = self.cap.read()
+            if ret:
+                self.position += 1
+                return frame
+            
+            # At the current end of the file
+            if time.monotonic() - last_growth > self.idle_timeout:
+                return None
+            time.sleep(self.poll_interval)
+            if os.path.getsize(self.path) != self._size:
+                last_growth = time.monotonic()
+                self._open()
+        return None
+    
+    def release(self):
+        """Close the file"""
+        self._closed = True
+        if self._process is not None:
+            self._process.kill()
+            self._process.stdout.close()
+            self._process.wait()
+        else:
+            self.cap.release()
+
+
+class RawStreamSource:
+    """Raw BGR frames from a pipe, e.g. ffmpeg -f rawvideo -pix_fmt bgr24 - on stdin"""
+    
+    # The writer blocks (or drops frames itself) if the pipe is not drained
+    realtime = True
+    
+    def __init__(self, stream: BinaryIO, width: int, height: int, fps: float = 60.0):
+        """
+        Initialize raw stream source
+        
+        Args:
+            stream: Binary stream of concatenated frames
+            width: Frame width
+            height: Frame height
+            fps: Frame rate of the stream (for timestamps)
+        """
+        if width <= 0 or height <= 0:
+            raise ValueError("Raw frame streams need the frame size (e.g. --live-size 1280x720)")
+        self.stream = stream
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.frame_bytes = width * height * 3
+    
+    def read(self) -> Optional[np.ndarray]:
+        """Next frame, or None at the end of the stream"""
+        # A new array per frame: frames wait in the analysis queue
+        frame = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        view = memoryview(frame.reshape(-1))
+        filled = 0
+        while filled < self.frame_bytes:
+            count = self.stream.readinto(view[filled:])
+            if not count:
+                return None
+            filled += count
+        return frame
+    
+    def release(self):
+        """Stop reading (the stream itself belongs to the caller)"""
+        pass
+
+
+def open_live_source(spec: str, width: int = 0, height: int = 0, fps: float = 60.0,
+                     poll_interval: float = 0.5, idle_timeout: float = 10.0):
+    """
+    Open a live source from a command-line style description
+    
+    Args:
+        spec: Capture device index ("0"), "-" for raw frames on stdin, or the
+            path of a file that is being recorded
+        width: Frame width (raw frame streams only)
+        height: Frame height (raw frame streams only)
+        fps: Frame rate (raw frame streams only)
+        poll_interval: Growing files: seconds between checks for new data
+        idle_timeout: Growing files: stop after this many seconds without growth
+    
+    Returns:
+        DeviceSource, RawStreamSource or GrowingFileSource
+    """
+    if spec == "-":
+        return RawStreamSource(sys.stdin.buffer, width, height, fps)
+    if spec.isdigit():
+        return DeviceSource(int(spec))
+    return GrowingFileSource(spec, poll_interval, idle_timeout)
+
+
+class LiveAnalyzer:
+    """Analyzes frames from a live source as they arrive, within a latency budget"""
+    
+    def __init__(self, source, character: str = "Blitzcrank", settings: Optional[Dict] = None,
+                 on_event: Optional[Callable[[Dict], None]] = None, sample_rate: int = 2):
+        """
+        Initialize live analyzer
+        
+        Args:
+            source: DeviceSource, GrowingFileSource or RawStreamSource
+            character: Character name
+            settings: Overrides for config.ANALYSIS_SETTINGS
+            on_event: Called with each event dict as soon as it is detected
+            sample_rate: Analyze every Nth frame of the source
+        """
+        if character not in CHARACTER_DATA:
+            raise ValueError(f"Character {character} not supported. Available: {list(CHARACTER_DATA.keys())}")
+        
+        self.source = source
+        self.settings = {**ANALYSIS_SETTINGS, **(settings or {})}
+        self.on_event = on_event
+        self.sample_rate = sample_rate
+        
+        self.proxy = FrameProxy.from_settings(source.width, source.height, self.settings)
+        self.move_detector = MoveDetector(
+            CHARACTER_DATA[character],
+            bright_pixel_threshold=self.proxy.scale_pixel_count(self.settings["bright_pixel_threshold"])
+        )
+        
+        self.events: List[Dict] = []
+        self._queue = deque()
+        self._changed = threading.Condition()
+        self._stop = threading.Event()
+        self._capture_done = False
+        self._capture_error: Optional[BaseException] = None
+        self._started_at = 0.0
+        
+        # Detector state carried from frame to frame
+        self._previous_proxy: Optional[np.ndarray] = None
+        self._previous_thumbnail: Optional[np.ndarray] = None
+        self._previous_frame_num: Optional[int] = None
+        self._last_moving_frame: Optional[int] = None  # Last frame before the current freeze
+        self._static_since: Optional[int] = None
+        self._last_static_frame: Optional[int] = None
+        self._last_event_frame = {"player1": -100, "player2": -100}
+        
+        # Counters for the stats
+        self.frames_captured = 0
+        self.frames_sampled = 0
+        self.frames_processed = 0
+        self.dropped_queue_full = 0
+        self.dropped_over_budget = 0
+        self._latency_total = 0.0
+        self.max_latency = 0.0
+    
+    def run(self, max_seconds: Optional[float] = None) -> Dict:
+        """
+        Analyze the source until it ends, stop() is called or max_seconds pass
+        
+        Args:
+            max_seconds: Wall-clock time limit (None = no limit)
+        
+        Returns:
+            Statistics of the run (see get_stats())
+        """
+        self._started_at = time.monotonic()
+        capture = threading.Thread(target=self._capture_loop, name="live-capture", daemon=True)
+        capture.start()
+        try:
+            while True:
+                if max_seconds is not None and time.monotonic() - self._started_at > max_seconds:
+                    break
+                item = self._next_frame()
+                if item is None:
+                    break
+                
+                frame_num, captured_at, frame = item
+                if self.source.realtime and time.monotonic() - captured_at > self.settings["live_latency_budget"]:
+                    # Already too old to report in time
+                    self.dropped_over_budget += 1
+                    continue
+                
+                self._process(frame_num, captured_at, frame)
+                latency = time.monotonic() - captured_at
+                self._latency_total += latency
+                self.max_latency = max(self.max_latency, latency)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            capture.join(timeout=5)
+            self._finish_freeze()
+        
+        if self._capture_error is not None:
+            raise RuntimeError(f"Live capture failed: {self._capture_error}") from self._capture_error
+        return self.get_stats()
+    
+    def stop(self):
+        """Stop capturing and analyzing"""
+        self._stop.set()
+        with self._changed:
+            self._changed.notify_all()
+    
+    def _capture_loop(self):
+        """Capture thread: read every frame, queue the sampled ones"""
+        max_queue = max(1, self.settings["live_queue_frames"])
+        try:
+            while not self._stop.is_set():
+                frame = self.source.read()
+                if frame is None:
+                    break
+                frame_num = self.frames_captured
+                self.frames_captured += 1
+                if frame_num % self.sample_rate:
+                    continue
+                
+                self.frames_sampled += 1
+                with self._changed:
+                    if self.source.realtime:
+                        if len(self._queue) >= max_queue:
+                            # Keep the newest frames: the oldest would be late anyway
+                            self._queue.popleft()
+                            self.dropped_queue_full += 1
+                    else:
+                        self._changed.wait_for(lambda: len(self._queue) < max_queue or self._stop.is_set())
+                    self._queue.append((frame_num, time.monotonic(), frame))
+                    self._changed.notify_all()
+        except BaseException as e:
+            self._capture_error = e
+        finally:
+            self.source.release()
+            with self._changed:
+                self._capture_done = True
+                self._changed.notify_all()
+    
+    def _next_frame(self) -> Optional[tuple]:
+        """Wait for the next queued frame (None once capture has ended)"""
+        with self._changed:
+            self._changed.wait_for(lambda: self._queue or self._capture_done or self._stop.is_set())
+            if not self._queue or self._stop.is_set():
+                return None
+            item = self._queue.popleft()
+            self._changed.notify_all()
+            return item
+    
+    def _process(self, frame_num: int, captured_at: float, frame: np.ndarray):
+        """Run the detectors on one frame and emit the events it completes"""
+        self.frames_processed += 1
+        proxy_frame = self.proxy.make(frame)
+        
+        # Unchanged frames skip the detectors, as in offline analysis
+        gray = proxy_frame if proxy_frame.ndim == 2 else cv2.cvtColor(proxy_frame, cv2.COLOR_BGR2GRAY)
+        thumbnail = cv2.resize(gray, STATIC_THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+        static = (self.settings["skip_static_frames"] and self._previous_thumbnail is not None
+                  and int(cv2.absdiff(thumbnail, self._previous_thumbnail).max()) <= STATIC_TOLERANCE)
+        self._previous_thumbnail = thumbnail
+        previous_proxy, self._previous_proxy = self._previous_proxy, proxy_frame
+        # A dropped frame widens the gap to the previous sample, which would
+        # inflate the difference image into false flashes
+        adjacent = self._previous_frame_num == frame_num - self.sample_rate
+        self._previous_frame_num = frame_num
+        
+        if static:
+            if self._static_since is None:
+                self._static_since = frame_num
+            self._last_static_frame = frame_num
+            return
+        
+        self._finish_freeze(captured_at)
+        self._last_moving_frame = frame_num
+        if previous_proxy is None or not adjacent:
+            return
+        
+        motion = self.move_detector.motion_features(frame_num, proxy_frame, previous_proxy)
+        if motion.bright_pixels <= self.move_detector.bright_pixel_threshold:
+            return
+        side = motion.active_side(self.settings["activity_threshold"])
+        if side is None:
+            return
+        
+        player = "player1" if side == "left" else "player2"
+        if frame_num - self._last_event_frame[player] > self.settings["min_frames_between_events"]:
+            self._last_event_frame[player] = frame_num
+            self._emit({
+                "timestamp": self._timestamp(frame_num),
+                "frame": frame_num,
+                "type": "hit_or_block",
+                "player": player,
+                "description": f"{player} interaction detected"
+            }, captured_at)
+    
+    def _finish_freeze(self, captured_at: Optional[float] = None):
+        """Report the freeze that just ended as hitstop if it was short enough"""
+        if self._static_since is None:
+            return
+        if self._last_moving_frame is not None:
+            duration = self._last_static_frame - self._last_moving_frame
+            if duration <= self.settings["hitstop_max_frames"]:
+                self._emit({
+                    "timestamp": self._timestamp(self._last_moving_frame),
+                    "frame": self._last_moving_frame,
+                    "type": "hitstop",
+                    "duration_frames": duration,
+                    "description": f"hitstop for {duration} frames"
+                }, captured_at)
+        self._static_since = None
+    
+    def _emit(self, event: Dict, captured_at: Optional[float]):
+        """Record an event and pass it to the callback"""
+        if captured_at is not None:
+            event["latency"] = round(time.monotonic() - captured_at, 4)
+        self.events.append(event)
+        if self.on_event:
+            self.on_event(event)
+    
+    def _timestamp(self, frame_num: int) -> float:
+        """Stream time of a frame (seconds since the first captured frame)"""
+        fps = self.source.fps
+        return frame_num / fps if fps and fps > 0 else time.monotonic() - self._started_at
+    
+    def get_stats(self) -> Dict:
+        """Counters of the run: frames seen, analyzed and dropped, and latency"""
+        dropped = self.dropped_queue_full + self.dropped_over_budget
+        return {
+            "elapsed_seconds": round(time.monotonic() - self._started_at, 2),
+            "frames_captured": self.frames_captured,
+            "frames_sampled": self.frames_sampled,
+            "frames_processed": self.frames_processed,
+            "frames_dropped": dropped,
+            "dropped_queue_full": self.dropped_queue_full,
+            "dropped_over_budget": self.dropped_over_budget,
+            "drop_ratio": round(dropped / self.frames_sampled, 4) if self.frames_sampled else 0.0,
+            "mean_latency": round(self._latency_total / self.frames_processed, 4) if self.frames_processed else 0.0,
+            "max_latency": round(self.max_latency, 4),
+            "events": len(self.events)
+        }
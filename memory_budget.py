@@ -0,0 +1,158 @@
+"""
+Memory budget for analysis runs on shared machines.
+
+The parts of a run that grow with the video or with the settings are kept
+within a budget:
+
+- Frame windows (the prefetch ring, detector blocks) get a fixed share;
+  buffer counts that would not fit are reduced.
+- Feature rows get a fixed share. Once that many rows are collected they
+  are spilled to a FeatureSpill in a temporary directory, and finished
+  tables are memory-mapped from there instead of being held in memory.
+
+The rest of the budget is left for the interpreter, OpenCV and the
+per-frame working set. Pages of memory-mapped tables count towards RSS
+while they are read, but they are clean file pages the OS can reclaim.
+
+peak_rss_bytes() reports what the process actually used, so a run can be
+checked against its budget.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from typing import List, Optional
+from frame_features import FeatureSpill
+
+
+# Shares of the budget
+FRAME_SHARE = 0.25
+FEATURE_SHARE = 0.5
+
+# Memory per collected feature row until it is spilled: the row's Python
+# tuple and arrays, plus the arrays it is stacked into when spilled
+FEATURE_ROW_BYTES = 4096
+
+# Spill at least this many rows at a time, however small the budget
+MIN_SPILL_ROWS = 256
+
+
+class MemoryBudget:
+    """Memory limits for frame buffers and feature tables, with spilling to disk"""
+    
+    def __init__(self, limit_mb: float, spill_dir: Optional[str] = None):
+        """
+        Initialize memory budget
+        
+        Args:
+            limit_mb: Memory budget in megabytes
+            spill_dir: Directory for spill files (None = the system temp directory)
+        """
+        if limit_mb <= 0:
+            raise ValueError(f"limit_mb must be > 0, got {limit_mb}")
+        
+        self.limit_bytes = int(limit_mb * 1024 * 1024)
+        self.spill_dir = spill_dir
+        self.spills: List[FeatureSpill] = []
+        self.frame_bytes_reserved = 0
+        self._root: Optional[str] = None
+        self._directories = 0
+    
+    @property
+    def feature_rows(self) -> int:
+        """Feature rows collected in memory before they are spilled"""
+        return max(MIN_SPILL_ROWS, int(self.limit_bytes * FEATURE_SHARE) // FEATURE_ROW_BYTES)
+    
+    def frame_buffers(self, frame_bytes: int, requested: int, minimum: int = 0) -> int:
+        """
+        Reserve as many frame buffers as fit what is left of the frame share
+        
+        Args:
+            frame_bytes: Size of one buffer
+            requested: Buffers wanted
+            minimum: Fewest buffers worth having; if fewer fit, none are reserved
+        
+        Returns:
+            Buffers to allocate: at most requested, 0 if fewer than minimum fit
+        """
+        available = int(self.limit_bytes * FRAME_SHARE) - self.frame_bytes_reserved
+        count = min(requested, available // max(1, frame_bytes))
+        if count < minimum:
+            return 0
+        self.frame_bytes_reserved += count * frame_bytes
+        return count
+    
+    def new_directory(self) -> str:
+        """Create a fresh directory for spill files (removed by cleanup())"""
+        if self._root is None:
+            self._root = tempfile.mkdtemp(prefix="2xko-spill-", dir=self.spill_dir)
+        self._directories += 1
+        path = os.path.join(self._root, f"{self._directories:04d}")
+        os.makedirs(path)
+        return path
+    
+    def new_spill(self) -> FeatureSpill:
+        """Create an empty feature spill"""
+        spill = FeatureSpill(self.new_directory())
+        self.spills.append(spill)
+        return spill
+    
+    def spilled_bytes(self) -> int:
+        """Bytes written to spill files so far"""
+        return sum(spill.bytes_written for spill in self.spills)
+    
+    def cleanup(self):
+        """Delete the spill files (tables mapped from them must not be used afterwards)"""
+        self.spills = []
+        if self._root is not None:
+            # Windows keeps files that are still mapped; they go with the temp directory
+            shutil.rmtree(self._root, ignore_errors=True)
+            self._root = None
+
+
+def peak_rss_bytes(children: bool = False) -> Optional[int]:
+    """
+    Peak resident set size
+    
+    Args:
+        children: Report the largest peak among finished child processes
+            (e.g. segment workers) instead of this process
+    
+    Returns:
+        Peak RSS in bytes, or None where it cannot be measured
+    """
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+    
+    if sys.platform == "win32" and not children:
+        import ctypes
+        from ctypes import wintypes
+        
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+        
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return int(counters.PeakWorkingSetSize)
+    return None
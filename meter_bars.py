@@ -0,0 +1,220 @@
+"""
+Super meter reading from the in-match HUD.
+
+Meters fill from the screen edges towards the center, and unlike health
+bars they can be empty for long stretches, so their geometry cannot be
+taken from a single frame. While a player's meter is not calibrated, its
+region (HudLayout.meter_regions) is searched for a colored run
+starting near the outer edge; the same band, start and color found in
+CALIBRATION_FRAMES consecutive frames become that meter's layout. Reading
+a calibrated meter then converts a single pixel row and measures the run
+of meter-colored pixels from its start.
+
+meter_changes() turns the per-frame levels into a short list of "spent"
+and "gained" events, which is what meter usage tracking needs.
+"""
+
+import cv2
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+from health_bars import (BAR_SATURATION, BAR_VALUE, HUE_MARGIN, MIN_HUE_TOLERANCE, MAX_HUE_SPREAD,
+                         RUN_SHARE, hue_distance, longest_run, mean_hue, settled_changes)
+
+
+# Frames in a row that must show the same meter band before it is calibrated
+CALIBRATION_FRAMES = 3
+
+# Shortest colored run (share of the region's width) a meter is calibrated from
+MIN_METER_RUN = 0.03
+
+# A meter must start within this share of its region's width from the outer edge
+MAX_START_OFFSET = 0.25
+
+# Meter level changes (percentage points) smaller than this are not events
+METER_CHANGE = 5
+
+# Level stored for meters that could not be read
+UNREADABLE = -1
+
+
+@dataclass
+class MeterLayout:
+    """Calibrated geometry and color of one meter"""
+    row: int  # Pixel row read
+    start: int  # Column where the meter starts filling
+    length: int  # Columns of a full meter
+    direction: int  # 1 if the meter fills to the right, -1 if to the left
+    hue: float  # Meter hue (OpenCV, 0-179)
+    hue_tolerance: float  # Largest hue distance still counted as meter
+    hue_table: np.ndarray = field(init=False, repr=False, compare=False)  # Meter hues (derived)
+    
+    def __post_init__(self):
+        """Derive the hue lookup table from the calibrated hue"""
+        self.hue_table = hue_distance(np.arange(256), self.hue) <= self.hue_tolerance
+    
+    def to_dict(self) -> Dict:
+        """JSON-serializable form"""
+        return {
+            "row": self.row,
+            "start": self.start,
+            "length": self.length,
+            "direction": self.direction,
+            "hue": self.hue,
+            "hue_tolerance": self.hue_tolerance
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "MeterLayout":
+        """Inverse of to_dict()"""
+        return cls(**data)
+
+
+def find_meter(frame: np.ndarray, region: Tuple[float, float, float, float],
+               direction: int) -> Optional[MeterLayout]:
+    """
+    Look for a partly or fully filled meter in one frame
+    
+    Args:
+        frame: BGR video frame
+        region: (x, y, width, height) area to search, as fractions of the frame
+        direction: 1 if the meter fills to the right (player1), -1 if to the
+            left (player2)
+    
+    Returns:
+        Candidate layout, or None if the region shows no meter-like run
+    """
+    height, width = frame.shape[:2]
+    rx, ry, rw, rh = region
+    x, y = int(rx * width), int(ry * height)
+    region_width = max(1, int(rw * width))
+    hsv = cv2.cvtColor(frame[y:y + max(1, int(rh * height)), x:x + region_width], cv2.COLOR_BGR2HSV)
+    mask = (hsv[:, :, 1] > BAR_SATURATION) & (hsv[:, :, 2] > BAR_VALUE)
+    if direction < 0:
+        # Search player2's mirrored meter the same way as player1's
+        hsv, mask = hsv[:, ::-1], mask[:, ::-1]
+    
+    row_counts = mask.sum(axis=1)
+    if row_counts.max() < MIN_METER_RUN * region_width:
+        return None
+    rows = longest_run(row_counts >= row_counts.max() / 2)
+    columns = longest_run(mask[rows[0]:rows[1]].mean(axis=0) >= 0.5)
+    if (columns is None or columns[1] - columns[0] < MIN_METER_RUN * region_width
+            or columns[0] > MAX_START_OFFSET * region_width):
+        return None
+    
+    hues = hsv[rows[0]:rows[1], columns[0]:columns[1], 0][mask[rows[0]:rows[1], columns[0]:columns[1]]]
+    hue = mean_hue(hues.astype(np.float64))
+    spread = np.percentile(hue_distance(hues, hue), 95)
+    if spread > MAX_HUE_SPREAD:
+        return None
+    
+    # The meter is assumed to sit centered in its region
+    offset = columns[0]
+    start = x + offset if direction > 0 else x + region_width - 1 - offset
+    return MeterLayout(row=y + (rows[0] + rows[1]) // 2, start=start, length=max(1, region_width - 2 * offset),
+                       direction=direction, hue=round(hue, 1),
+                       hue_tolerance=round(float(max(MIN_HUE_TOLERANCE, spread + HUE_MARGIN)), 1))
+
+
+def read_meter(frame: np.ndarray, layout: MeterLayout) -> int:
+    """
+    Read one meter with a calibrated layout
+    
+    Args:
+        frame: BGR video frame at the size the layout was calibrated on
+        layout: Calibrated meter layout
+    
+    Returns:
+        Meter level as a percentage of a full meter, or UNREADABLE
+    """
+    if layout.direction > 0:
+        pixels = frame[layout.row:layout.row + 1, layout.start:layout.start + layout.length]
+    else:
+        pixels = frame[layout.row:layout.row + 1, max(0, layout.start - layout.length + 1):layout.start + 1, :][:, ::-1]
+    hsv = cv2.cvtColor(np.ascontiguousarray(pixels), cv2.COLOR_BGR2HSV)[0]
+    colored = layout.hue_table[hsv[:, 0]] & (hsv[:, 1] > BAR_SATURATION) & (hsv[:, 2] > BAR_VALUE)
+    
+    count = int(np.count_nonzero(colored))
+    if count and np.count_nonzero(colored[:count]) < RUN_SHARE * count:
+        # Not one run from the start: something else is over the meter
+        return UNREADABLE
+    return min(100, round(100 * count / layout.length))
+
+
+class MeterCalibrator:
+    """Calibrates and reads both meters for frames of one size"""
+    
+    def __init__(self, regions: Sequence[Tuple[float, float, float, float]]):
+        """
+        Initialize meter calibrator
+        
+        Args:
+            regions: player1/player2 (x, y, width, height) meter areas, as
+                fractions of the frame (player1 fills to the right, player2
+                to the left)
+        """
+        self.regions = regions
+        self.layouts: List[Optional[MeterLayout]] = [None] * len(regions)
+        # Per player: latest candidate layout and how many frames in a row agreed with it
+        self._candidates: List[Optional[MeterLayout]] = [None] * len(regions)
+        self._agreeing = [0] * len(regions)
+    
+    def read(self, frame: np.ndarray) -> List[int]:
+        """
+        Read the meters, calibrating the ones that are not calibrated yet
+        
+        Args:
+            frame: BGR video frame
+        
+        Returns:
+            Per player meter level (percent), UNREADABLE until calibrated
+        """
+        levels = []
+        for player, region in enumerate(self.regions):
+            if self.layouts[player] is None:
+                self._calibrate(player, frame, region)
+            layout = self.layouts[player]
+            levels.append(UNREADABLE if layout is None else read_meter(frame, layout))
+        return levels
+    
+    def _calibrate(self, player: int, frame: np.ndarray, region: Tuple[float, float, float, float]):
+        """Check one frame for the player's meter and accept it once frames agree"""
+        candidate = find_meter(frame, region, 1 if player == 0 else -1)
+        previous = self._candidates[player]
+        if candidate is None:
+            self._agreeing[player] = 0
+        elif (previous is not None and abs(candidate.row - previous.row) <= 1
+              and abs(candidate.start - previous.start) <= 2
+              and hue_distance(np.array([candidate.hue]), previous.hue)[0] <= previous.hue_tolerance):
+            self._agreeing[player] += 1
+        else:
+            self._agreeing[player] = 1
+        self._candidates[player] = candidate
+        
+        if self._agreeing[player] >= CALIBRATION_FRAMES:
+            self.layouts[player] = candidate
+
+
+def meter_changes(frames: Sequence[int], meter: np.ndarray,
+                  min_change: float = METER_CHANGE) -> List[Tuple[int, str, str, int]]:
+    """
+    Turn per-frame meter levels into change events
+    
+    Args:
+        frames: (N,) frame numbers
+        meter: (N, 2) player1/player2 meter levels, UNREADABLE where unknown
+        min_change: Smallest level change (percentage points) reported
+    
+    Returns:
+        List of (frame_num, player, "spent" or "gained", amount) in frame order
+    """
+    meter = np.asarray(meter, dtype=np.float64)
+    meter[meter == UNREADABLE] = np.nan
+    events = []
+    for player in range(meter.shape[1]):
+        for row, change in settled_changes(meter[:, player], min_change - 0.5):
+            events.append((int(frames[row]), f"player{player + 1}",
+                           "gained" if change > 0 else "spent", int(round(abs(change)))))
+    events.sort(key=lambda event: event[0])
+    return events
@@ -5,26 +5,102 @@ This module provides the framework for move detection using computer vision.
 
 import cv2
 import numpy as np
+from dataclasses import dataclass
 from typing import Dict, List, Tuple, Optional
 from character_data import MoveData, GuardType
+from health_bars import HealthBarLayout, calibrate_health_bars, read_health_bars
+from hud_layout import HudLayout, default_layout
+from meter_bars import MeterCalibrator, MeterLayout, UNREADABLE as UNREADABLE_METER
+from timer_digits import DigitTemplates, TimerReader, UNREADABLE as UNREADABLE_TIMER
+
+
+@dataclass
+class MotionFeatures:
+    """Features of one frame pair, all derived from a single difference image"""
+    bright_pixels: int  # Pixels whose grayscale difference exceeds the flash threshold
+    left_activity: int  # Summed difference over the left half of the frame
+    right_activity: int  # Summed difference over the right half of the frame
+    column_activity: np.ndarray  # Summed difference per column (int64, frame width)
+    diff_histogram: np.ndarray  # 256-bin histogram of the grayscale difference
+    
+    def active_side(self, ratio: float = 1.2) -> Optional[str]:
+        """
+        Decide which half of the screen moved more
+        
+        Args:
+            ratio: How much more active one side must be than the other
+        
+        Returns:
+            "left", "right", or None if neither side clearly dominates
+        """
+        if self.left_activity > self.right_activity * ratio:
+            return "left"
+        if self.right_activity > self.left_activity * ratio:
+            return "right"
+        return None
+
+
+@dataclass
+class MotionFeatureBlock:
+    """Motion features of a block of frame pairs, one row per pair"""
+    bright_pixels: np.ndarray  # (N,) int64
+    left_activity: np.ndarray  # (N,) int64
+    right_activity: np.ndarray  # (N,) int64
+    column_activity: np.ndarray  # (N, frame width) int64
+    diff_histogram: np.ndarray  # (N, 256) int64
+    
+    def __len__(self) -> int:
+        return len(self.bright_pixels)
+    
+    def row(self, index: int) -> MotionFeatures:
+        """Features of one frame pair"""
+        return MotionFeatures(
+            bright_pixels=int(self.bright_pixels[index]),
+            left_activity=int(self.left_activity[index]),
+            right_activity=int(self.right_activity[index]),
+            column_activity=self.column_activity[index],
+            diff_histogram=self.diff_histogram[index]
+        )
+    
+    def active_side(self, ratio: float = 1.2) -> np.ndarray:
+        """
+        Vectorized MotionFeatures.active_side()
+        
+        Returns:
+            Per pair: 1 if the left half dominates, 2 if the right half
+            does, 0 otherwise
+        """
+        left = self.left_activity.astype(np.float64)
+        right = self.right_activity.astype(np.float64)
+        side = np.zeros(len(self), dtype=np.int8)
+        side[left > right * ratio] = 1
+        side[right > left * ratio] = 2
+        return side
 
 
 class MoveDetector:
     """Detects moves being performed in gameplay frames"""
     
-    def __init__(self, character_data):
+    def __init__(self, character_data, bright_pixel_threshold: int = 1000):
         """
         Initialize move detector
         
         Args:
             character_data: Character data class (e.g., BlitzcrankData)
+            bright_pixel_threshold: Changed pixels needed to report a hit/block,
+                at the resolution of the frames passed to detect_hit_or_block
         """
         self.character_data = character_data
         self.move_data = character_data.get_moves()
+        self.bright_pixel_threshold = bright_pixel_threshold
         
         # Store recent frames for motion analysis
         self.frame_history = []
         self.max_history = 10
+        
+        # Last computed frame pair, shared by all consumers of the same frame
+        self._features_key = None
+        self._features: Optional[MotionFeatures] = None
     
     def detect_move_in_frame(self, frame: np.ndarray, player_side: str, 
                             previous_frames: List[np.ndarray] = None) -> Optional[Dict]:
@@ -116,14 +192,116 @@ class MoveDetector:
             "motion_type": "unknown"  # Would be classified in production
         }
     
-    def detect_hit_or_block(self, frame: np.ndarray, previous_frame: np.ndarray) -> Optional[str]:
+    def extract_motion_features(self, frame: np.ndarray, previous_frame: np.ndarray) -> MotionFeatures:
         """
-        Detect if a hit or block occurred
+        Compute all motion features of a frame pair from one difference image
+        
+        Args:
+            frame: Current frame (BGR or grayscale proxy)
+            previous_frame: Previous frame
+        
+        Returns:
+            MotionFeatures for the pair
+        """
+        # Calculate frame difference
+        diff = cv2.absdiff(frame, previous_frame)
+        gray_diff = diff if diff.ndim == 2 else cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
+        
+        # Per-column sums (over all channels) give the left/right split for free
+        columns = cv2.reduce(diff, 0, cv2.REDUCE_SUM, dtype=cv2.CV_32S).reshape(diff.shape[1], -1)
+        column_activity = columns.sum(axis=1, dtype=np.int64)
+        half = diff.shape[1] // 2
+        
+        # Bright flashes (hits/blocks) are differences above 50
+        histogram = cv2.calcHist([gray_diff], [0], None, [256], [0, 256]).ravel().astype(np.int64)
+        
+        return MotionFeatures(
+            bright_pixels=int(histogram[51:].sum()),
+            left_activity=int(column_activity[:half].sum()),
+            right_activity=int(column_activity[half:].sum()),
+            column_activity=column_activity,
+            diff_histogram=histogram
+        )
+    
+    def extract_motion_features_block(self, frames: np.ndarray, previous_frame: np.ndarray) -> MotionFeatureBlock:
+        """
+        Compute motion features for a block of consecutive frames at once
+        
+        Pairs are (previous_frame, frames[0]), (frames[0], frames[1]), ...
+        Results match extract_motion_features() for each pair.
         
         Args:
+            frames: (N, H, W) grayscale or (N, H, W, 3) BGR frames
+            previous_frame: Frame before frames[0]
+        
+        Returns:
+            MotionFeatureBlock with one row per frame
+        """
+        count = len(frames)
+        frames = np.ascontiguousarray(frames)
+        
+        # One absdiff over the whole block, with each frame as a row of a 2-D image
+        diff = np.empty_like(frames)
+        flat = frames.reshape(count, -1)
+        flat_diff = diff.reshape(count, -1)
+        flat_diff[0] = cv2.absdiff(flat[0], np.ascontiguousarray(previous_frame).reshape(-1)).ravel()
+        if count > 1:
+            cv2.absdiff(flat[1:], flat[:-1], dst=flat_diff[1:])
+        
+        # Frames stacked vertically convert as one tall image
+        height, width = frames.shape[1:3]
+        if diff.ndim == 3:
+            gray_diff = diff
+        else:
+            gray_diff = cv2.cvtColor(diff.reshape(count * height, width, -1), cv2.COLOR_BGR2GRAY).reshape(count, height, width)
+        
+        column_activity = np.empty((count, width), dtype=np.int64)
+        histogram = np.empty((count, 256), dtype=np.int64)
+        for i in range(count):
+            # Per-frame reductions over views; faster than NumPy axis reductions on uint8
+            columns = cv2.reduce(diff[i], 0, cv2.REDUCE_SUM, dtype=cv2.CV_32S).reshape(width, -1)
+            column_activity[i] = columns.sum(axis=1, dtype=np.int64)
+            histogram[i] = cv2.calcHist([gray_diff[i]], [0], None, [256], [0, 256]).ravel()
+        
+        half = width // 2
+        return MotionFeatureBlock(
+            bright_pixels=histogram[:, 51:].sum(axis=1),
+            left_activity=column_activity[:, :half].sum(axis=1),
+            right_activity=column_activity[:, half:].sum(axis=1),
+            column_activity=column_activity,
+            diff_histogram=histogram
+        )
+    
+    def motion_features(self, frame_num: int, frame: np.ndarray, previous_frame: np.ndarray) -> MotionFeatures:
+        """
+        Get motion features for a frame pair, reusing the last result when
+        another consumer already computed them for the same frames
+        
+        Args:
+            frame_num: Frame number of the current frame
             frame: Current frame
             previous_frame: Previous frame
         
+        Returns:
+            MotionFeatures for the pair
+        """
+        # Frames are compared by identity: buffers may be reused for other frames
+        cached = self._features_key
+        if not (cached and cached[0] == frame_num and cached[1] is frame and cached[2] is previous_frame):
+            self._features = self.extract_motion_features(frame, previous_frame)
+            self._features_key = (frame_num, frame, previous_frame)
+        return self._features
+    
+    def detect_hit_or_block(self, frame: np.ndarray, previous_frame: np.ndarray,
+                            features: Optional[MotionFeatures] = None) -> Optional[str]:
+        """
+        Detect if a hit or block occurred
+        
+        Args:
+            frame: Current frame (BGR or grayscale proxy)
+            previous_frame: Previous frame
+            features: Precomputed features of the pair (computed if omitted)
+        
         Returns:
             "hit", "block", or None
         """
@@ -132,16 +310,10 @@ class MoveDetector:
         # - Block spark effects
         # - Screen shake
         # - Health bar changes
+        if features is None:
+            features = self.extract_motion_features(frame, previous_frame)
         
-        # Calculate frame difference
-        diff = cv2.absdiff(frame, previous_frame)
-        gray_diff = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
-        
-        # Look for bright flashes (hits/blocks)
-        _, thresh = cv2.threshold(gray_diff, 50, 255, cv2.THRESH_BINARY)
-        bright_pixels = np.sum(thresh > 0)
-        
-        if bright_pixels > 1000:  # Threshold for significant change
+        if features.bright_pixels > self.bright_pixel_threshold:  # Threshold for significant change
             # Could be hit or block - would need more analysis
             return "hit_or_block"
         
@@ -178,47 +350,303 @@ class MoveDetector:
 class GameStateDetector:
     """Detects game state from video frames"""
     
-    def __init__(self):
-        """Initialize game state detector"""
-        pass
+    # Share of a pixel row that must be bar-colored for a bar to count as shown
+    HUD_BAR_FILL = 0.3
+    
+    # Most of a health bar region's rows a bar may fill (bars are thin strips;
+    # fully colored regions are backgrounds or artwork)
+    HUD_BAR_MAX_ROWS = 0.6
+    
+    def __init__(self, timer_start: int = 99, layout: Optional[HudLayout] = None):
+        """
+        Initialize game state detector
+        
+        Args:
+            timer_start: Round timer value at the start of a round
+            layout: HUD layout of the video (None = 16:9 filling the frame)
+        """
+        self.timer_start = timer_start
+        self.layout = layout if layout is not None else default_layout()
+        # HUD areas as (x, y, width, height) fractions of the frame: health
+        # bars player1 (top left) then player2 (top right), meters player1
+        # (bottom left, fills to the right) then player2, Steam Steam gauges
+        # (above the meters, filling the same way), timer (top center)
+        self.health_bar_regions = self.layout.health_bar_regions
+        self.meter_bar_regions = self.layout.meter_regions
+        self.steam_gauge_regions = self.layout.steam_gauge_regions
+        self.timer_region = self.layout.timer_region
+        # Calibrated health bar layouts by frame (width, height)
+        self.health_bar_layouts: Dict[Tuple[int, int], HealthBarLayout] = {}
+        # Meter calibration by frame (width, height)
+        self.meter_calibrators: Dict[Tuple[int, int], MeterCalibrator] = {}
+        # Steam gauge calibration by frame (width, height)
+        self.steam_calibrators: Dict[Tuple[int, int], MeterCalibrator] = {}
+        # Timer digit templates (learned) by frame (width, height)
+        self.timer_readers: Dict[Tuple[int, int], TimerReader] = {}
+    
+    def detect_hud(self, frame: np.ndarray) -> bool:
+        """
+        Check whether the in-match HUD is on screen
+        
+        Both health bar regions must contain a thin horizontal strip of
+        saturated, bright pixels. Character select, loading screens and menus
+        lack them. Works on downscaled frames since regions are relative.
+        
+        Args:
+            frame: BGR video frame (any resolution)
+        
+        Returns:
+            True if both health bars were found
+        """
+        height, width = frame.shape[:2]
+        for rx, ry, rw, rh in self.health_bar_regions:
+            x, y = int(rx * width), int(ry * height)
+            region = frame[y:y + max(1, int(rh * height)), x:x + max(1, int(rw * width))]
+            hsv = cv2.cvtColor(region, cv2.COLOR_BGR2HSV)
+            bar_rows = ((hsv[:, :, 1] > 80) & (hsv[:, :, 2] > 80)).mean(axis=1) >= self.HUD_BAR_FILL
+            if not bar_rows.any() or bar_rows.mean() > self.HUD_BAR_MAX_ROWS:
+                return False
+        return True
+    
+    def detect_hud_block(self, frames: np.ndarray) -> np.ndarray:
+        """
+        Block version of detect_hud()
+        
+        Args:
+            frames: (N, H, W, 3) BGR frames
+        
+        Returns:
+            (N,) bool, True where both health bars were found
+        """
+        count, height, width = frames.shape[:3]
+        present = np.ones(count, dtype=bool)
+        for rx, ry, rw, rh in self.health_bar_regions:
+            x, y = int(rx * width), int(ry * height)
+            region = np.ascontiguousarray(frames[:, y:y + max(1, int(rh * height)), x:x + max(1, int(rw * width))])
+            rows, cols = region.shape[1:3]
+            # Regions stacked vertically convert as one tall image
+            hsv = cv2.cvtColor(region.reshape(count * rows, cols, 3), cv2.COLOR_BGR2HSV).reshape(count, rows, cols, 3)
+            bar_rows = ((hsv[..., 1] > 80) & (hsv[..., 2] > 80)).mean(axis=2) >= self.HUD_BAR_FILL
+            present &= bar_rows.any(axis=1) & (bar_rows.mean(axis=1) <= self.HUD_BAR_MAX_ROWS)
+        return present
+    
+    def health_bar_layout(self, frame: np.ndarray) -> Optional[HealthBarLayout]:
+        """
+        Health bar layout for frames of this size
+        
+        Calibrated from the first frame of the size that shows both bars
+        full (see health_bars.py), then cached.
+        
+        Args:
+            frame: BGR video frame
+        
+        Returns:
+            Layout, or None while no frame of the size could calibrate it
+        """
+        size = (frame.shape[1], frame.shape[0])
+        layout = self.health_bar_layouts.get(size)
+        if layout is None:
+            layout = calibrate_health_bars(frame, self.health_bar_regions)
+            if layout is not None:
+                self.health_bar_layouts[size] = layout
+        return layout
     
     def detect_health_bars(self, frame: np.ndarray) -> Dict[str, float]:
         """
         Detect health bar values from frame
         
         Args:
-            frame: Video frame
+            frame: Full-resolution BGR video frame
         
         Returns:
-            Dictionary with player health percentages
+            Dictionary with player health percentages (NaN where the bars
+            could not be read, including frames before calibration)
         """
-        # In production, this would use:
-        # - Template matching for health bar UI
-        # - Color detection for health bar fill
-        # - OCR for health numbers
+        layout = self.health_bar_layout(frame)
+        if layout is None:
+            return {"player1_health": float("nan"), "player2_health": float("nan")}
         
+        player1, player2 = read_health_bars(frame, layout)
         return {
-            "player1_health": 100.0,
-            "player2_health": 100.0
+            "player1_health": player1,
+            "player2_health": player2
         }
     
     def detect_meter(self, frame: np.ndarray) -> Dict[str, int]:
         """
         Detect super meter levels
         
+        Each player's meter is calibrated from the first frames of this size
+        that show it partly filled (see meter_bars.py), then read from a
+        single pixel row. Only meaningful while the HUD is on screen.
+        
         Args:
-            frame: Video frame
+            frame: Full-resolution BGR video frame
         
         Returns:
-            Dictionary with meter levels
+            Dictionary with meter levels as percentages of a full meter
+            (meter_bars.UNREADABLE until calibrated or when unreadable)
         """
-        # Would use similar techniques as health detection
+        size = (frame.shape[1], frame.shape[0])
+        calibrator = self.meter_calibrators.get(size)
+        if calibrator is None:
+            calibrator = self.meter_calibrators[size] = MeterCalibrator(self.meter_bar_regions)
         
+        player1, player2 = calibrator.read(frame)
         return {
-            "player1_meter": 0,
-            "player2_meter": 0
+            "player1_meter": player1,
+            "player2_meter": player2
         }
     
+    def detect_steam(self, frame: np.ndarray) -> Dict[str, int]:
+        """
+        Detect Steam Steam gauge levels
+        
+        The gauges are bars like the super meters and are calibrated and read
+        the same way (see detect_meter()), from the first frames of this size
+        that show them partly filled.
+        
+        Args:
+            frame: Full-resolution BGR video frame
+        
+        Returns:
+            Dictionary with gauge levels as percentages of a full gauge
+            (meter_bars.UNREADABLE until calibrated or when unreadable)
+        """
+        size = (frame.shape[1], frame.shape[0])
+        calibrator = self.steam_calibrators.get(size)
+        if calibrator is None:
+            calibrator = self.steam_calibrators[size] = MeterCalibrator(self.steam_gauge_regions)
+        
+        player1, player2 = calibrator.read(frame)
+        return {
+            "player1_steam": player1,
+            "player2_steam": player2
+        }
+    
+    def detect_timer(self, frame: np.ndarray, frame_num: int, health: Optional[Dict[str, float]] = None) -> int:
+        """
+        Read the round timer
+        
+        The digit templates are learned from the first countdown after a
+        round start at this frame size (see timer_digits.py); until then
+        the timer is only known while that countdown is being followed.
+        
+        Args:
+            frame: Full-resolution BGR video frame
+            frame_num: Frame number (frames must come in ascending order)
+            health: This frame's detect_health_bars() result, if already read
+        
+        Returns:
+            Timer value in seconds (timer_digits.UNREADABLE if unknown)
+        """
+        size = (frame.shape[1], frame.shape[0])
+        reader = self.timer_readers.get(size)
+        if reader is None:
+            reader = self.timer_readers[size] = TimerReader(self.timer_region, self.timer_start)
+        
+        if health is None:
+            health = self.detect_health_bars(frame)
+        # Health readings are rounded to 0.1%; NaN compares False
+        health_full = health["player1_health"] >= 99.5 and health["player2_health"] >= 99.5
+        return reader.read(frame, frame_num, health_full)
+    
+    def read_hud(self, frame: np.ndarray, frame_num: int) -> Tuple[float, float, int, int, int, int, int]:
+        """
+        Read health bars, meters, Steam gauges and timer from a frame
+        
+        Meters, gauges and timer are only read while the health bars show
+        (the HUD is on screen).
+        
+        Args:
+            frame: Full-resolution BGR video frame
+            frame_num: Frame number (frames must come in ascending order)
+        
+        Returns:
+            (player1 health, player2 health, player1 meter, player2 meter,
+            player1 Steam, player2 Steam, timer)
+        """
+        health = self.detect_health_bars(frame)
+        player1, player2 = health["player1_health"], health["player2_health"]
+        if np.isnan(player1) and np.isnan(player2):
+            # No HUD on screen (or not calibrated yet): nothing to read meters from
+            return (player1, player2, UNREADABLE_METER, UNREADABLE_METER,
+                    UNREADABLE_METER, UNREADABLE_METER, UNREADABLE_TIMER)
+        
+        meter = self.detect_meter(frame)
+        steam = self.detect_steam(frame)
+        timer = self.detect_timer(frame, frame_num, health)
+        return (player1, player2, meter["player1_meter"], meter["player2_meter"],
+                steam["player1_steam"], steam["player2_steam"], timer)
+    
+    def calibrated(self, frame_size: Tuple[int, int]) -> bool:
+        """Check whether the HUD readers are calibrated for frames of this (width, height)"""
+        timer = self.timer_readers.get(frame_size)
+        return (frame_size in self.health_bar_layouts
+                and all(calibrators.get(frame_size) is not None
+                        and all(layout is not None for layout in calibrators[frame_size].layouts)
+                        for calibrators in (self.meter_calibrators, self.steam_calibrators))
+                and timer is not None and timer.templates is not None)
+    
+    def calibration(self) -> Dict:
+        """
+        What the HUD readers calibrated so far, for load_calibration()
+        
+        Returns:
+            JSON-serializable calibration of every frame size seen
+        """
+        return {
+            "health_bars": [layout.to_dict() for layout in self.health_bar_layouts.values()],
+            "meters": [
+                {"frame_size": list(size),
+                 "layouts": [layout.to_dict() if layout is not None else None for layout in meters.layouts]}
+                for size, meters in self.meter_calibrators.items()
+            ],
+            "steam_gauges": [
+                {"frame_size": list(size),
+                 "layouts": [layout.to_dict() if layout is not None else None for layout in gauges.layouts]}
+                for size, gauges in self.steam_calibrators.items()
+            ],
+            "timer_templates": [
+                {"frame_size": list(size), "templates": reader.templates.to_dict()}
+                for size, reader in self.timer_readers.items() if reader.templates is not None
+            ]
+        }
+    
+    def load_calibration(self, calibration: Dict):
+        """
+        Start over from a calibration() of another detector
+        
+        Anything calibrated here before is forgotten, so detectors loaded
+        with the same calibration (e.g. in segment workers) read every
+        frame the same way, whichever frame they start at.
+        
+        Args:
+            calibration: Result of calibration()
+        """
+        self.health_bar_layouts = {}
+        for data in calibration.get("health_bars", []):
+            layout = HealthBarLayout.from_dict(data)
+            self.health_bar_layouts[layout.frame_size] = layout
+        
+        # Meters and gauges not calibrated by then keep calibrating as frames are read
+        self.meter_calibrators = {}
+        for data in calibration.get("meters", []):
+            meters = self.meter_calibrators[tuple(data["frame_size"])] = MeterCalibrator(self.meter_bar_regions)
+            meters.layouts = [MeterLayout.from_dict(layout) if layout is not None else None
+                              for layout in data["layouts"]]
+        self.steam_calibrators = {}
+        for data in calibration.get("steam_gauges", []):
+            gauges = self.steam_calibrators[tuple(data["frame_size"])] = MeterCalibrator(self.steam_gauge_regions)
+            gauges.layouts = [MeterLayout.from_dict(layout) if layout is not None else None
+                              for layout in data["layouts"]]
+        
+        # Without templates the timer is learned from the next countdown again
+        self.timer_readers = {}
+        for data in calibration.get("timer_templates", []):
+            reader = self.timer_readers[tuple(data["frame_size"])] = TimerReader(self.timer_region, self.timer_start)
+            reader.templates = DigitTemplates.from_dict(data["templates"])
+    
     def detect_round_state(self, frame: np.ndarray) -> str:
         """
         Detect current round state
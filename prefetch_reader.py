@@ -0,0 +1,160 @@
+"""
+Background prefetching frame reader.
+
+Decodes on a dedicated thread into a fixed-size ring of preallocated frame
+buffers so decoding overlaps with per-frame analysis. OpenCV releases the
+GIL while decoding, so the two sides genuinely run in parallel.
+"""
+
+import queue
+import threading
+import cv2
+import numpy as np
+from typing import Callable, Dict, Optional, Tuple
+
+
+class PrefetchReader:
+    """Decodes frames ahead of the consumer into a bounded ring buffer"""
+    
+    # Sentinel put on the ready queue when decoding ends
+    _END = None
+    
+    def __init__(self, cap: cv2.VideoCapture, frame_shape: Tuple[int, int, int],
+                 start_frame: int, end_frame: int,
+                 frame_filter: Callable[[int], bool], ring_size: int = 8):
+        """
+        Initialize prefetch reader
+        
+        Args:
+            cap: Capture positioned at start_frame (owned by the reader until stopped)
+            frame_shape: (height, width, channels) of decoded frames
+            start_frame: Frame number of the capture's current position
+            end_frame: Frame number to stop before
+            frame_filter: Decides per frame number whether to retrieve it
+            ring_size: Number of preallocated frame buffers
+        """
+        if ring_size < 2:
+            raise ValueError(f"ring_size must be >= 2, got {ring_size}")
+        
+        self.cap = cap
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.frame_filter = frame_filter
+        self.ring_size = ring_size
+        
+        self.ring = [np.empty(frame_shape, dtype=np.uint8) for _ in range(ring_size)]
+        self._free = queue.Queue()
+        for slot in range(ring_size):
+            self._free.put(slot)
+        self._ready = queue.Queue()
+        
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.error: Optional[BaseException] = None
+        
+        # Tuning counters
+        self.frames_decoded = 0
+        self.producer_stalls = 0  # Decoder waited for a free buffer (analysis is the bottleneck)
+        self.consumer_stalls = 0  # Analysis waited for a decoded frame (decode is the bottleneck)
+        self.max_queue_depth = 0
+        self._depth_total = 0
+        self._gets = 0
+    
+    def start(self):
+        """Start the decode thread"""
+        self._thread = threading.Thread(target=self._decode_loop, name="frame-prefetch", daemon=True)
+        self._thread.start()
+    
+    def _decode_loop(self):
+        """Producer: grab every frame, retrieve wanted ones into free ring slots"""
+        frame_num = self.start_frame
+        try:
+            while frame_num < self.end_frame and not self._stop.is_set():
+                if not self.cap.grab():
+                    break
+                
+                if self.frame_filter(frame_num):
+                    slot = self._acquire_slot()
+                    if slot is None:
+                        break
+                    
+                    ret, frame = self.cap.retrieve(self.ring[slot])
+                    if not ret:
+                        self._free.put(slot)
+                        break
+                    if frame is not self.ring[slot]:
+                        # Container reported a different size; adopt the decoder's buffer
+                        self.ring[slot] = frame
+                    
+                    self.frames_decoded += 1
+                    self._ready.put((frame_num, slot))
+                
+                frame_num += 1
+        except BaseException as e:
+            self.error = e
+        finally:
+            self._ready.put(self._END)
+    
+    def _acquire_slot(self) -> Optional[int]:
+        """Wait for a free buffer (backpressure); None if stopped meanwhile"""
+        try:
+            return self._free.get_nowait()
+        except queue.Empty:
+            self.producer_stalls += 1
+        
+        while not self._stop.is_set():
+            try:
+                return self._free.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+    
+    def get(self) -> Optional[Tuple[int, int, np.ndarray]]:
+        """
+        Get the next decoded frame
+        
+        Returns:
+            (frame_number, slot, frame) or None at the end of the video. The
+            frame buffer belongs to the reader until release(slot) is called.
+        """
+        depth = self._ready.qsize()
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+        self._depth_total += depth
+        self._gets += 1
+        
+        try:
+            item = self._ready.get_nowait()
+        except queue.Empty:
+            self.consumer_stalls += 1
+            item = self._ready.get()
+        
+        if item is self._END:
+            if self.error is not None:
+                raise self.error
+            return None
+        
+        frame_num, slot = item
+        return frame_num, slot, self.ring[slot]
+    
+    def release(self, slot: int):
+        """Return a buffer to the ring so the decoder can reuse it"""
+        self._free.put(slot)
+    
+    def stop(self):
+        """Stop the decode thread and wait for it to exit"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    def get_stats(self) -> Dict:
+        """Get queue depth and stall counters for tuning ring_size"""
+        return {
+            "ring_size": self.ring_size,
+            "frames_decoded": self.frames_decoded,
+            "queue_depth": self._ready.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "avg_queue_depth": round(self._depth_total / self._gets, 2) if self._gets else 0,
+            "producer_stalls": self.producer_stalls,
+            "consumer_stalls": self.consumer_stalls
+        }
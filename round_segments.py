@@ -0,0 +1,231 @@
+"""
+Round segmentation from HUD readings.
+
+Rounds are found in one pass over the sampled frames (feature table rows,
+or readings as they arrive) from three signals:
+
+- Health bar refills: both bars read full again after the round took a
+  lasting chunk off either of them.
+- Timer resets: the round timer reads clearly higher than it already did
+  in the round (back to its start value).
+- Round intro screens: after a KO or timeout, the HUD is gone for at least
+  intro_gap frames (KO animation, round announcement); the next frame that
+  shows it starts the next round, whatever the bars read.
+
+A start must be confirmed by the following sample as well, so a single
+misread does not split a round. A round ends at its KO (a bar reading
+empty while the other does not) or timeout (timer at 0) if it had one,
+otherwise at the last frame that showed the HUD before the next round.
+
+The result is a RoundTimeline, an interval list that frames of events,
+damage, combos and mistakes are joined against with a binary search.
+"""
+
+import bisect
+import math
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+# Health percentage both bars must read for a refill
+FULL_HEALTH = 99.5
+
+# Lasting loss (percentage points) after which a refill starts a new round
+REFILL_DROP = 5.0
+
+# Timer increase (seconds) over the round's lowest reading that is a reset
+TIMER_RESET = 5
+
+
+@dataclass
+class Round:
+    """One round, as sampled frame numbers"""
+    number: int  # 1-based
+    start_frame: int  # First sampled frame of the round
+    end_frame: int  # KO, timeout, or last sampled frame showing the HUD
+    ended_by: str  # "ko", "timeout", "next_round" (no end seen) or "video_end"
+    
+    def to_dict(self) -> Dict:
+        """JSON-serializable form"""
+        return {
+            "round": self.number,
+            "start_frame": self.start_frame,
+            "end_frame": self.end_frame,
+            "ended_by": self.ended_by
+        }
+
+
+class RoundTimeline:
+    """Rounds of a video in frame order, with O(log n) lookups"""
+    
+    def __init__(self, rounds: List[Round]):
+        """
+        Initialize round timeline
+        
+        Args:
+            rounds: Rounds in frame order
+        """
+        self.rounds = rounds
+        self._starts = [r.start_frame for r in rounds]
+    
+    def __len__(self) -> int:
+        return len(self.rounds)
+    
+    def __iter__(self) -> Iterator[Round]:
+        return iter(self.rounds)
+    
+    def round_at(self, frame_num: int) -> Optional[Round]:
+        """
+        Round a frame belongs to
+        
+        Frames after a round's end (KO animations, intros) belong to it
+        until the next round starts.
+        
+        Returns:
+            The last round started at or before the frame, None before the first
+        """
+        index = bisect.bisect_right(self._starts, frame_num) - 1
+        return self.rounds[index] if index >= 0 else None
+    
+    def round_number(self, frame_num: int) -> int:
+        """Number of the round a frame belongs to (1 before the first round)"""
+        current = self.round_at(frame_num)
+        return current.number if current is not None else 1
+    
+    def to_list(self) -> List[Dict]:
+        """JSON-serializable form"""
+        return [r.to_dict() for r in self.rounds]
+
+
+class RoundSegmenter:
+    """Finds round boundaries in one pass over HUD readings"""
+    
+    def __init__(self, intro_gap: int = 60):
+        """
+        Initialize round segmenter
+        
+        Args:
+            intro_gap: Frames without HUD after a KO or timeout that mark a
+                round intro (the next HUD frame starts a round)
+        """
+        self.intro_gap = intro_gap
+        self.rounds: List[Round] = []
+        self._last_hud_frame: Optional[int] = None
+        # Current round
+        self._start: Optional[int] = None
+        self._round_hud_frame: Optional[int] = None  # Last HUD frame tracked in the round
+        self._end_frame: Optional[int] = None
+        self._ended_by: Optional[str] = None
+        self._damaged = False
+        self._low_timer: Optional[int] = None
+        self._previous_health = (math.nan, math.nan)
+        # Start of the next round, waiting for the following sample to agree
+        self._pending: Optional[Tuple[int, bool]] = None  # (frame, after an intro)
+    
+    def update(self, frame_num: int, player1_health: float, player2_health: float,
+               timer: int = -1) -> Optional[Round]:
+        """
+        Add the readings of the next sampled frame
+        
+        Args:
+            frame_num: Frame number (ascending)
+            player1_health: Health percentage, NaN where unreadable
+            player2_health: Health percentage, NaN where unreadable
+            timer: Round timer in seconds, negative where unreadable
+        
+        Returns:
+            The round that ended, when this sample confirmed the next one
+        """
+        if math.isnan(player1_health) and math.isnan(player2_health):
+            # No HUD on screen
+            return None
+        
+        gap = frame_num - self._last_hud_frame if self._last_hud_frame is not None else 0
+        self._last_hud_frame = frame_num
+        if self._start is None:
+            self._begin(frame_num)
+        
+        # Intro screens only follow rounds that ended on screen
+        intro = self._ended_by is not None and gap >= self.intro_gap
+        refill = self._damaged and player1_health >= FULL_HEALTH and player2_health >= FULL_HEALTH
+        timer_reset = timer >= 0 and self._low_timer is not None and timer >= self._low_timer + TIMER_RESET
+        
+        ended = None
+        if self._pending is not None:
+            pending_frame, after_intro = self._pending
+            self._pending = None
+            if after_intro or refill or timer_reset:
+                ended = self._close_round(self._round_hud_frame, "next_round")
+                self._begin(pending_frame)
+        elif intro or refill or timer_reset:
+            self._pending = (frame_num, intro)
+            return None
+        
+        self._track(frame_num, player1_health, player2_health, timer)
+        return ended
+    
+    def finish(self) -> RoundTimeline:
+        """
+        End the pass
+        
+        Returns:
+            All rounds found
+        """
+        if self._start is not None:
+            self._close_round(self._last_hud_frame, "video_end")
+            self._start = None
+        return RoundTimeline(self.rounds)
+    
+    def _begin(self, frame_num: int):
+        """Start a round at a frame"""
+        self._start = frame_num
+        self._round_hud_frame = frame_num
+        self._end_frame = None
+        self._ended_by = None
+        self._damaged = False
+        self._low_timer = None
+        self._previous_health = (math.nan, math.nan)
+    
+    def _track(self, frame_num: int, player1_health: float, player2_health: float, timer: int):
+        """Follow losses, KOs, timeouts and the timer within the round"""
+        self._round_hud_frame = frame_num
+        if timer >= 0:
+            self._low_timer = timer if self._low_timer is None else min(self._low_timer, timer)
+            if timer == 0 and self._ended_by is None:
+                self._end_frame, self._ended_by = frame_num, "timeout"
+        
+        for health, previous in zip((player1_health, player2_health), self._previous_health):
+            # Two samples in a row, so a single misread counts for nothing
+            if health < FULL_HEALTH - REFILL_DROP and previous < FULL_HEALTH - REFILL_DROP:
+                self._damaged = True
+            if health == 0 and previous == 0 and self._ended_by is None:
+                self._end_frame, self._ended_by = frame_num, "ko"
+        self._previous_health = (player1_health, player2_health)
+    
+    def _close_round(self, last_frame: int, ended_by: str) -> Round:
+        """Record the current round, ending at its KO or timeout if it had one"""
+        if self._ended_by is not None:
+            last_frame, ended_by = self._end_frame, self._ended_by
+        ended = Round(number=len(self.rounds) + 1, start_frame=self._start,
+                      end_frame=last_frame, ended_by=ended_by)
+        self.rounds.append(ended)
+        return ended
+
+
+def segment_rounds(frames, health, timer, intro_gap: int = 60) -> RoundTimeline:
+    """
+    Segment a feature table into rounds
+    
+    Args:
+        frames: (N,) sampled frame numbers, ascending
+        health: (N, 2) player1/player2 health percentages, NaN where unreadable
+        timer: (N,) round timer seconds, negative where unreadable
+        intro_gap: See RoundSegmenter
+    
+    Returns:
+        Rounds found
+    """
+    segmenter = RoundSegmenter(intro_gap)
+    for frame_num, (player1, player2), seconds in zip(frames.tolist(), health.tolist(), timer.tolist()):
+        segmenter.update(frame_num, player1, player2, seconds)
+    return segmenter.finish()
@@ -0,0 +1,138 @@
+"""
+Segment-parallel analysis across a process pool.
+
+The video is split into time segments that are analyzed in separate worker
+processes, each opening its own cv2.VideoCapture. Workers only extract
+per-frame features; stitching them back together in frame order and
+analyzing the joined table reproduces a single-process run:
+
+- Each worker decodes a small overlap before its segment so the first
+  frames have a previous frame, but only reports frames it owns, so
+  overlap frames are never counted twice.
+- Detection thresholds, the event cooldown and EnhancedAnalyzer round
+  counters are applied after stitching, so they carry across segment
+  boundaries.
+- HUD readers are calibrated once in the parent (see
+  GameplayAnalyzer.calibrate_hud()) and every worker starts from that
+  calibration, so segments starting mid-round read the HUD from their
+  first frame, as the single-process run does.
+
+Under a memory budget each worker gets an equal share of it, and workers
+hand their features back as files in the parent's spill directory instead
+of pickling whole tables through the result pipe.
+
+Workers load the timeline index and HUD layout the parent stored in its
+video data directory rather than indexing and detecting again.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple, Union
+from frame_features import FrameFeatures
+
+
+def plan_segments(frame_count: int, segments: int, align: int = 2) -> List[Tuple[int, int]]:
+    """
+    Split a video into contiguous frame ranges
+    
+    Args:
+        frame_count: Total number of frames
+        segments: Number of segments to create
+        align: Segment starts are multiples of this (keeps sampled frames
+            identical to a single-process run)
+    
+    Returns:
+        List of (start_frame, end_frame) ranges
+    """
+    if frame_count <= 0:
+        return []
+    
+    segments = max(1, segments)
+    size = -(-frame_count // segments)  # ceil
+    size = -(-size // align) * align
+    
+    return [(start, min(start + size, frame_count)) for start in range(0, frame_count, size)]
+
+
+def plan_range_segments(ranges: List[Tuple[int, int]], segments: int, align: int = 2) -> List[Tuple[int, int]]:
+    """
+    Split several frame ranges (e.g. gameplay segments) into segments
+    
+    Segments are shared out in proportion to range length, at least one
+    per range.
+    
+    Args:
+        ranges: (start_frame, end_frame) ranges, ascending and disjoint
+        segments: Total number of segments to aim for
+        align: Passed to plan_segments
+    
+    Returns:
+        List of (start_frame, end_frame) ranges
+    """
+    total = sum(end - start for start, end in ranges)
+    planned = []
+    for start, end in ranges:
+        count = max(1, round(segments * (end - start) / total)) if total else 1
+        planned.extend((start + s, start + e) for s, e in plan_segments(end - start, count, align))
+    return planned
+
+
+def _analyze_segment(job: Tuple) -> Union[FrameFeatures, str]:
+    """Worker entry point: analyze one segment with a fresh analyzer"""
+    (analyzer_class, video_path, matchup_type, character, settings,
+     gameplay_segments, hud_calibration, start, end, overlap, label, output_dir) = job
+    
+    # Workers must not spawn pools (or scan for gameplay) of their own
+    settings = {**settings, "workers": 1}
+    analyzer = analyzer_class(video_path, matchup_type, character, settings)
+    analyzer.gameplay_segments = gameplay_segments
+    if hud_calibration is not None:
+        analyzer.use_hud_calibration(hud_calibration)
+    try:
+        features = analyzer.analyze_segment(start, end, overlap, desc=label)
+        if output_dir is None:
+            return features
+        features.save(output_dir)
+        return output_dir
+    finally:
+        analyzer.close()
+
+
+def analyze_in_segments(analyzer, workers: int, overlap_frames: int = 30,
+                        ranges: Optional[List[Tuple[int, int]]] = None) -> FrameFeatures:
+    """
+    Extract features for a whole video using a process pool
+    
+    Args:
+        analyzer: GameplayAnalyzer (or subclass) describing the analysis
+        workers: Number of worker processes (and segments)
+        overlap_frames: Frames decoded before each segment for history
+        ranges: Only analyze these (start_frame, end_frame) ranges (None =
+            the whole video)
+    
+    Returns:
+        Stitched features, ready for analyzer.build_report()
+    """
+    if ranges is None:
+        segments = plan_segments(analyzer.video.frame_count, workers)
+    else:
+        segments = plan_range_segments(ranges, workers)
+    print(f"\nAnalyzing {len(segments)} segments in {workers} worker processes...")
+    
+    settings = analyzer.settings
+    budget = analyzer.memory_budget
+    if budget is not None:
+        settings = {**settings, "memory_budget_mb": settings["memory_budget_mb"] / workers}
+    
+    jobs = [
+        (type(analyzer), analyzer.video_path, analyzer.matchup_type, analyzer.character,
+         settings, analyzer.gameplay_segments, analyzer.hud_calibration, start, end, overlap_frames,
+         f"Segment {i + 1}/{len(segments)}", budget.new_directory() if budget is not None else None)
+        for i, (start, end) in enumerate(segments)
+    ]
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_analyze_segment, jobs))
+    results = [FrameFeatures.load(result) if isinstance(result, str) else result for result in results]
+    
+    # Segments own disjoint frames; joining also drops any duplicates
+    return analyzer.join_features(results)
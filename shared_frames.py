@@ -0,0 +1,322 @@
+"""
+Shared-memory frame transport for per-frame multiprocessing.
+
+Sending decoded frames to worker processes through a multiprocessing queue
+pickles several megabytes per 1080p frame. Instead, the decoder retrieves
+each frame directly into a slot of a SharedFramePool (one
+multiprocessing.shared_memory block holding a fixed number of frames) and
+workers receive only (frame_number, slot, previous_slot) tuples. Each slot
+is reference counted: it returns to the pool once the task that owns it and
+the task that uses it as the previous frame have both released it.
+
+SharedFrameWorkers suits functions of (frame_number, frame, previous_frame)
+alone. The analysis does not use it: its feature extraction keeps state
+across frames (static-frame collapsing, adaptive sampling, HUD bar
+calibration and timer templates), so --workers splits the video into time
+segments instead (segment_parallel.py). benchmark_decode.py --frame-workers
+is the current user.
+"""
+
+import multiprocessing
+import os
+import queue
+import traceback
+import numpy as np
+from collections import deque
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+
+# Task put on the queue to stop a worker
+_STOP = None
+
+
+class SharedFramePool:
+    """Fixed number of frame slots in shared memory, with per-slot reference counts"""
+    
+    def __init__(self, frame_shape: Tuple[int, ...], slots: int = 8, dtype=np.uint8, context=None):
+        """
+        Initialize shared frame pool
+        
+        Args:
+            frame_shape: Shape of every frame stored in the pool
+            slots: Number of frames the pool holds
+            dtype: Frame element type
+            context: multiprocessing context the workers are started from
+        """
+        if slots < 2:
+            raise ValueError(f"slots must be >= 2, got {slots}")
+        
+        context = context or multiprocessing.get_context()
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        self.frame_bytes = int(np.prod(self.frame_shape)) * self.dtype.itemsize
+        
+        self._shm = shared_memory.SharedMemory(create=True, size=self.frame_bytes * slots)
+        # Forked workers inherit this object; only the creator frees the block
+        self._owner_pid = os.getpid()
+        
+        # Reference counts, guarded by the condition's lock (0 = free slot)
+        self._refs = context.Array("i", slots, lock=False)
+        self._changed = context.Condition()
+        self._attach()
+    
+    def _attach(self):
+        """Create the NumPy view of the shared block"""
+        self._frames = np.ndarray((self.slots,) + self.frame_shape, dtype=self.dtype, buffer=self._shm.buf)
+    
+    def __getstate__(self) -> Dict:
+        # Only the block's name travels to worker processes (at process start)
+        state = self.__dict__.copy()
+        state["_shm"] = self._shm.name
+        del state["_frames"]
+        return state
+    
+    def __setstate__(self, state: Dict):
+        self.__dict__.update(state)
+        self._shm = shared_memory.SharedMemory(name=state["_shm"])
+        self._attach()
+    
+    def frame(self, slot: int) -> np.ndarray:
+        """Writable view of a slot (for the decoder)"""
+        return self._frames[slot]
+    
+    def acquire(self, refs: int = 1, timeout: Optional[float] = None) -> Optional[int]:
+        """
+        Take a free slot
+        
+        Args:
+            refs: Initial reference count (number of release() calls that
+                return the slot to the pool)
+            timeout: Seconds to wait for a slot (None = wait indefinitely)
+        
+        Returns:
+            Slot index, or None if no slot became free within timeout
+        """
+        with self._changed:
+            if not self._changed.wait_for(lambda: 0 in self._refs[:], timeout):
+                return None
+            slot = self._refs[:].index(0)
+            self._refs[slot] = refs
+            return slot
+    
+    def release(self, slot: int, refs: int = 1):
+        """Drop references to a slot; the slot is free again once none are left"""
+        with self._changed:
+            self._refs[slot] = max(0, self._refs[slot] - refs)
+            if self._refs[slot] == 0:
+                self._changed.notify_all()
+    
+    def in_use(self) -> int:
+        """Number of slots currently referenced"""
+        with self._changed:
+            return sum(1 for count in self._refs[:] if count)
+    
+    def close(self):
+        """Detach from the shared block (and free it, in the creating process)"""
+        self._frames = None
+        self._shm.close()
+        if self._owner_pid == os.getpid():
+            self._shm.unlink()
+            self._owner_pid = None
+
+
+def _worker_loop(pool: SharedFramePool, fn: Callable, tasks, results):
+    """Worker process: run fn on shared frames until told to stop"""
+    try:
+        while True:
+            task = tasks.get()
+            if task is _STOP:
+                break
+            
+            frame_num, slot, previous_slot = task
+            frame = pool.frame(slot)
+            frame.flags.writeable = False
+            previous_frame = None
+            if previous_slot >= 0:
+                previous_frame = pool.frame(previous_slot)
+                previous_frame.flags.writeable = False
+            
+            try:
+                results.put((frame_num, True, fn(frame_num, frame, previous_frame)))
+            except Exception:
+                results.put((frame_num, False, traceback.format_exc()))
+            finally:
+                del frame, previous_frame
+                pool.release(slot)
+                if previous_slot >= 0:
+                    pool.release(previous_slot)
+    finally:
+        pool.close()
+
+
+class SharedFrameWorkers:
+    """
+    Fans per-frame analysis out to worker processes over a SharedFramePool.
+    
+    fn is called in a worker as fn(frame_number, frame, previous_frame) with
+    read-only views into shared memory, the same signature as FrameSubscriber
+    callbacks; its return value is sent back to the caller. With the spawn
+    start method (Windows, macOS) fn must be a module-level function.
+        
+        with SharedFrameWorkers(analyze_frame, video.frame_shape, workers=4) as pool:
+            for frame_num, result in pool.run(video, sample_rate=2):
+                ...
+    """
+    
+    def __init__(self, fn: Callable[[int, np.ndarray, Optional[np.ndarray]], Any],
+                 frame_shape: Tuple[int, ...], workers: int = 2, slots: int = 0):
+        """
+        Initialize shared frame workers
+        
+        Args:
+            fn: Per-frame function run in the workers
+            frame_shape: Shape of decoded frames (VideoProcessor.frame_shape)
+            workers: Worker processes
+            slots: Shared frame slots (0 = enough for every worker to hold a
+                frame and its previous frame while the decoder fills the next)
+        """
+        if workers < 1:
+            raise ValueError(f"workers must be >= 1, got {workers}")
+        
+        context = multiprocessing.get_context()
+        self.workers = workers
+        self.pool = SharedFramePool(frame_shape, slots or 2 * workers + 2, context=context)
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._processes = [
+            context.Process(target=_worker_loop, args=(self.pool, fn, self._tasks, self._results),
+                            name=f"frame-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for process in self._processes:
+            process.start()
+        
+        # Tuning counters
+        self.frames_dispatched = 0
+        self.decoder_stalls = 0  # Decoder waited for a free slot (workers are the bottleneck)
+    
+    def run(self, video, sample_rate: int = 1, start_frame: int = 0,
+            end_frame: Optional[int] = None) -> Iterator[Tuple[int, Any]]:
+        """
+        Decode frames into shared slots and analyze them in the workers
+        
+        Args:
+            video: VideoProcessor to decode from
+            sample_rate: Analyze every Nth frame
+            start_frame: First frame number to decode
+            end_frame: Frame number to stop before (None = end of video)
+        
+        Returns:
+            Iterator of (frame_number, fn result) in frame order
+        """
+        end_frame = video.frame_count if end_frame is None else min(end_frame, video.frame_count)
+        cap = video.cap
+        video.seek(start_frame)
+        # Reads below move the capture without the video tracking them
+        video._next_frame = None
+        
+        order = deque()
+        ready = {}
+        previous_slot = -1
+        try:
+            for frame_num in range(start_frame, end_frame):
+                if not cap.grab():
+                    break
+                if (frame_num - start_frame) % sample_rate:
+                    continue
+                
+                slot = self._acquire_slot(ready)
+                ret, frame = cap.retrieve(self.pool.frame(slot))
+                if not ret:
+                    self.pool.release(slot, 2)
+                    break
+                if frame is not None and frame.shape != self.pool.frame_shape:
+                    self.pool.release(slot, 2)
+                    raise ValueError(f"Decoded frame shape {frame.shape} does not match pool {self.pool.frame_shape}")
+                # Drop the view so close() can free the block
+                del frame
+                
+                # Two references: this frame's task and the next frame's task,
+                # which receives it as its previous frame
+                self._tasks.put((frame_num, slot, previous_slot))
+                order.append(frame_num)
+                previous_slot = slot
+                self.frames_dispatched += 1
+                
+                self._collect(ready, block=False)
+                while order and order[0] in ready:
+                    frame_num = order.popleft()
+                    yield frame_num, ready.pop(frame_num)
+        finally:
+            if previous_slot >= 0:
+                self.pool.release(previous_slot)
+        
+        while order:
+            if order[0] not in ready:
+                self._collect(ready, block=True)
+                continue
+            frame_num = order.popleft()
+            yield frame_num, ready.pop(frame_num)
+    
+    def _acquire_slot(self, ready: Dict) -> int:
+        """Wait for a free slot, collecting finished results meanwhile"""
+        slot = self.pool.acquire(refs=2, timeout=0)
+        if slot is not None:
+            return slot
+        
+        self.decoder_stalls += 1
+        while slot is None:
+            self._collect(ready, block=True)
+            slot = self.pool.acquire(refs=2, timeout=0.1)
+        return slot
+    
+    def _collect(self, ready: Dict, block: bool):
+        """Move finished results from the result queue into ready"""
+        while True:
+            try:
+                frame_num, ok, result = self._results.get(timeout=1.0) if block else self._results.get_nowait()
+            except queue.Empty:
+                if block:
+                    self._check_workers()
+                    continue
+                return
+            
+            if not ok:
+                raise RuntimeError(f"Frame worker failed on frame {frame_num}:\n{result}")
+            ready[frame_num] = result
+            block = False
+    
+    def _check_workers(self):
+        """Fail instead of waiting forever if a worker died"""
+        for process in self._processes:
+            if not process.is_alive():
+                raise RuntimeError(f"{process.name} exited unexpectedly (exit code {process.exitcode})")
+    
+    def get_stats(self) -> Dict:
+        """Get dispatch counters for tuning workers/slots"""
+        return {
+            "workers": self.workers,
+            "slots": self.pool.slots,
+            "frames_dispatched": self.frames_dispatched,
+            "decoder_stalls": self.decoder_stalls
+        }
+    
+    def close(self):
+        """Stop the workers and free the shared memory"""
+        for _ in self._processes:
+            self._tasks.put(_STOP)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._tasks.close()
+        self._results.close()
+        self.pool.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,274 @@
+"""
+Sweep detection thresholds over cached frame features.
+
+Evaluates every combination of activity_threshold, bright_pixel_threshold
+and min_frames_between_events from config.ANALYSIS_SETTINGS against the
+per-frame feature table of a video, without decoding it again. Features
+come from the feature cache (and are extracted and cached first if
+missing). Each configuration reports its hit/block event count and, when
+a ground-truth file is supplied, precision/recall/F1.
+
+Ground truth is a JSON list of events (or {"events": [...]}, e.g. the
+key_events of a hand-corrected report), each with a "frame" or
+"timestamp" and optionally a "player".
+
+Usage:
+    python threshold_sweep.py --video match.mp4
+    python threshold_sweep.py --video match.mp4 --activity 1.1 1.2 1.5 \\
+        --bright 500 1000 2000 --min-gap 15 30 60 --ground-truth labels.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from analyzer import GameplayAnalyzer
+from config import ANALYSIS_SETTINGS
+
+# Arrays shared with worker processes (set by _init_worker)
+_ARRAYS: Dict[str, np.ndarray] = {}
+
+
+def _init_worker(arrays: Dict[str, np.ndarray]):
+    """Give a worker process the feature arrays once, not per configuration"""
+    _ARRAYS.update(arrays)
+
+
+def select_events(frames: np.ndarray, players: np.ndarray, min_gap: int) -> np.ndarray:
+    """
+    Apply the per-player event cooldown used by GameplayAnalyzer
+    
+    Args:
+        frames: Frame numbers of candidate interactions, in frame order
+        players: Player (1 or 2) of each candidate
+        min_gap: min_frames_between_events
+    
+    Returns:
+        Boolean mask of the candidates that become events
+    """
+    keep = np.zeros(len(frames), dtype=bool)
+    for player in (1, 2):
+        rows = np.flatnonzero(players == player)
+        last_event_frame = -100
+        for row, frame_num in zip(rows, frames[rows].tolist()):
+            if frame_num - last_event_frame > min_gap:
+                keep[row] = True
+                last_event_frame = frame_num
+    return keep
+
+
+def match_events(predicted: np.ndarray, predicted_players: np.ndarray,
+                 truth: np.ndarray, truth_players: np.ndarray, tolerance: int) -> int:
+    """
+    Count one-to-one matches between predicted and ground-truth events
+    
+    Events match when they are at most tolerance frames apart and, if the
+    ground truth names a player (non-zero), are attributed to that player.
+    
+    Returns:
+        Number of matched pairs
+    """
+    matched = 0
+    used = np.zeros(len(truth), dtype=bool)
+    for frame_num, player in zip(predicted.tolist(), predicted_players.tolist()):
+        lo = np.searchsorted(truth, frame_num - tolerance, side="left")
+        hi = np.searchsorted(truth, frame_num + tolerance, side="right")
+        best = None
+        for row in range(lo, hi):
+            if used[row] or (truth_players[row] and truth_players[row] != player):
+                continue
+            if best is None or abs(truth[row] - frame_num) < abs(truth[best] - frame_num):
+                best = row
+        if best is not None:
+            used[best] = True
+            matched += 1
+    return matched
+
+
+def evaluate(config: Tuple[float, int, int, int, int]) -> Dict:
+    """
+    Evaluate one (activity, bright, min_gap, proxy_bright, tolerance) configuration
+    
+    Runs in a worker process against the arrays given to _init_worker.
+    """
+    activity, bright, min_gap, proxy_bright, tolerance = config
+    left = _ARRAYS["left_activity"]
+    right = _ARRAYS["right_activity"]
+    
+    # Same rules as GameplayAnalyzer._hit_players, across all frames at once
+    hits = _ARRAYS["has_motion"] & (_ARRAYS["bright_pixels"] > proxy_bright)
+    sides = np.zeros(len(hits), dtype=np.int8)
+    sides[left > right * activity] = 1
+    sides[right > left * activity] = 2
+    rows = np.flatnonzero(hits & (sides > 0))
+    
+    frames = _ARRAYS["frames"][rows]
+    players = sides[rows]
+    keep = select_events(frames, players, min_gap)
+    
+    result = {
+        "activity_threshold": activity,
+        "bright_pixel_threshold": bright,
+        "min_frames_between_events": min_gap,
+        "events": int(keep.sum()),
+        "player1_events": int(keep[players == 1].sum()),
+        "player2_events": int(keep[players == 2].sum())
+    }
+    
+    if "truth_frames" in _ARRAYS:
+        truth = _ARRAYS["truth_frames"]
+        matched = match_events(frames[keep], players[keep], truth, _ARRAYS["truth_players"], tolerance)
+        precision = matched / result["events"] if result["events"] else 0.0
+        recall = matched / len(truth) if len(truth) else 0.0
+        result.update({
+            "matched": matched,
+            "precision": round(precision, 4),
+            "recall": round(recall, 4),
+            "f1": round(2 * precision * recall / (precision + recall), 4) if precision + recall else 0.0
+        })
+    
+    return result
+
+
+def load_ground_truth(path: str, timestamp_to_frame: Callable[[float], int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Load labeled events
+    
+    Args:
+        path: Ground-truth JSON file
+        timestamp_to_frame: Maps a label's timestamp to a frame number, the
+            way the analyzer does (VideoProcessor.timestamp_to_frame, which
+            follows the timeline index on variable frame rate footage)
+    
+    Returns:
+        (frame numbers, players as 1/2 or 0 when unlabeled), sorted by frame
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    events = data.get("events", data.get("key_events", [])) if isinstance(data, dict) else data
+    
+    labeled = []
+    for event in events:
+        if "frame" in event:
+            frame_num = int(event["frame"])
+        else:
+            frame_num = timestamp_to_frame(float(event["timestamp"]))
+        player = {"player1": 1, "player2": 2}.get(event.get("player"), 0)
+        labeled.append((frame_num, player))
+    
+    labeled.sort()
+    return (np.array([e[0] for e in labeled], dtype=np.int64),
+            np.array([e[1] for e in labeled], dtype=np.int8))
+
+
+def run_sweep(analyzer: GameplayAnalyzer, activities: List[float], brights: List[int],
+              min_gaps: List[int], ground_truth: Optional[str] = None,
+              tolerance: int = 10, workers: int = 1) -> List[Dict]:
+    """
+    Evaluate every threshold combination for a video
+    
+    Args:
+        analyzer: Analyzer for the video (features come from its cache)
+        activities: activity_threshold values
+        brights: bright_pixel_threshold values (full resolution)
+        min_gaps: min_frames_between_events values
+        ground_truth: Optional labeled event file
+        tolerance: Frames a prediction may be off from a labeled event
+        workers: Worker processes
+    
+    Returns:
+        One result dict per configuration
+    """
+    features = analyzer.extract_features()
+    
+    arrays = {
+        "frames": np.asarray(features.frames, dtype=np.int64),
+        "has_motion": np.asarray(features.has_motion),
+        "bright_pixels": features.bright_pixels(),
+        "left_activity": np.asarray(features.left_activity, dtype=np.float64),
+        "right_activity": np.asarray(features.right_activity, dtype=np.float64)
+    }
+    if ground_truth:
+        arrays["truth_frames"], arrays["truth_players"] = load_ground_truth(ground_truth,
+                                                                            analyzer.video.timestamp_to_frame)
+    
+    # Thresholds are given at full resolution, like config.py
+    configs = [
+        (activity, bright, min_gap, analyzer.proxy.scale_pixel_count(bright), tolerance)
+        for activity, bright, min_gap in itertools.product(activities, brights, min_gaps)
+    ]
+    print(f"Evaluating {len(configs)} configurations over {len(features)} frames...")
+    
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(arrays,)) as pool:
+            return list(pool.map(evaluate, configs, chunksize=max(1, len(configs) // (workers * 4))))
+    
+    _init_worker(arrays)
+    return [evaluate(config) for config in configs]
+
+
+def print_results(results: List[Dict]):
+    """Print results, best F1 first when ground truth was given"""
+    scored = "f1" in results[0] if results else False
+    if scored:
+        results = sorted(results, key=lambda r: (r["f1"], r["precision"]), reverse=True)
+    
+    header = f"{'activity':>9} {'bright':>7} {'min gap':>8} {'events':>7} {'P1':>5} {'P2':>5}"
+    if scored:
+        header += f" {'prec':>6} {'recall':>6} {'F1':>6}"
+    print(header)
+    print("-" * len(header))
+    
+    for r in results:
+        line = (f"{r['activity_threshold']:>9} {r['bright_pixel_threshold']:>7} {r['min_frames_between_events']:>8} "
+                f"{r['events']:>7} {r['player1_events']:>5} {r['player2_events']:>5}")
+        if scored:
+            line += f" {r['precision']:>6.3f} {r['recall']:>6.3f} {r['f1']:>6.3f}"
+        print(line)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Sweep detection thresholds over cached frame features")
+    parser.add_argument("--video", "-v", required=True, help="Path to video file")
+    parser.add_argument("--character", "-c", default="Blitzcrank", help="Character name")
+    parser.add_argument("--feature-cache", default=ANALYSIS_SETTINGS["feature_cache_dir"] or ".feature_cache",
+                        help="Feature cache directory (features are extracted into it if missing)")
+    parser.add_argument("--activity", type=float, nargs="+", default=[ANALYSIS_SETTINGS["activity_threshold"]],
+                        help="activity_threshold values")
+    parser.add_argument("--bright", type=int, nargs="+", default=[ANALYSIS_SETTINGS["bright_pixel_threshold"]],
+                        help="bright_pixel_threshold values (full-resolution pixels)")
+    parser.add_argument("--min-gap", type=int, nargs="+", default=[ANALYSIS_SETTINGS["min_frames_between_events"]],
+                        help="min_frames_between_events values")
+    parser.add_argument("--ground-truth", "-g", help="JSON file of labeled events")
+    parser.add_argument("--tolerance", type=int, default=10, help="Frames a detection may be off from a label")
+    parser.add_argument("--workers", "-w", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--output", "-o", help="Write all results to this JSON file")
+    
+    args = parser.parse_args()
+    
+    try:
+        analyzer = GameplayAnalyzer(args.video, "mirror", args.character,
+                                    settings={"feature_cache_dir": args.feature_cache})
+        results = run_sweep(analyzer, args.activity, args.bright, args.min_gap,
+                            args.ground_truth, args.tolerance, args.workers)
+        analyzer.close()
+        
+        print_results(results)
+        
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+            print(f"\nResults saved to: {args.output}")
+    
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
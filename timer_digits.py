@@ -0,0 +1,244 @@
+"""
+Round timer reading with digit templates learned from the video.
+
+OCR (pytesseract) costs tens of milliseconds per call, far too much for
+every sampled frame. The timer is drawn in one font with ten glyphs, so it
+is read by template matching instead: the digits in the timer region are
+separated by column projection, scaled to GLYPH_SIZE and compared with all
+ten templates in one array operation.
+
+The templates are learned from the video itself, so no game font has to be
+shipped. A round starts at a known value (round_timer_start) and counts
+down one second at a time, so the first seconds of a round show every
+digit in a known order in the ones position. Learning starts on a frame
+where both health bars are full and the glyphs look like the start value;
+each lasting change of the ones glyph is labeled with the next lower digit.
+Once all ten digits are labeled, the first change of the tens digit is used
+as a check (the ones glyph must then read 9), and the templates are fixed
+and cached per frame size. Learning starts over if the sampled frames jump
+or the check fails.
+"""
+
+import cv2
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+
+# Grayscale level above which a pixel is part of a digit
+DIGIT_BRIGHTNESS = 170
+
+# (width, height) glyphs are scaled to before matching
+GLYPH_SIZE = (10, 14)
+
+# Shortest glyph as a share of the timer region's height
+MIN_GLYPH_HEIGHT = 0.25
+
+# Largest mean pixel difference (0-1) between a glyph and its template
+MATCH_DISTANCE = 0.2
+
+# Largest mean pixel difference between two glyphs of the same digit
+SAME_GLYPH = 0.1
+
+# Samples in a row a new ones glyph must show before it counts as a change
+CHANGE_SAMPLES = 2
+
+# Samples kept per digit while learning
+MAX_GLYPH_SAMPLES = 8
+
+# Largest gap in frame numbers between samples while learning
+MAX_LEARNING_GAP = 16
+
+# Timer value stored where it could not be read
+UNREADABLE = -1
+
+
+def segment_glyphs(frame: np.ndarray, region: Tuple[float, float, float, float]) -> np.ndarray:
+    """
+    Cut the digits out of a HUD region
+    
+    Args:
+        frame: BGR video frame
+        region: (x, y, width, height) area, as fractions of the frame
+    
+    Returns:
+        (G, GLYPH_SIZE[0] * GLYPH_SIZE[1]) float32 glyphs (0-1), left to right
+    """
+    height, width = frame.shape[:2]
+    rx, ry, rw, rh = region
+    x, y = int(rx * width), int(ry * height)
+    crop = frame[y:y + max(1, int(rh * height)), x:x + max(1, int(rw * width))]
+    gray = crop if crop.ndim == 2 else cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    ink = (gray > DIGIT_BRIGHTNESS).astype(np.uint8)
+    
+    # Digits are separated by columns without ink
+    columns = np.concatenate(([0], ink.any(axis=0).astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(columns))
+    glyphs = []
+    for start, end in zip(edges[::2], edges[1::2]):
+        rows = np.flatnonzero(ink[:, start:end].any(axis=1))
+        if rows[-1] + 1 - rows[0] < MIN_GLYPH_HEIGHT * ink.shape[0]:
+            continue
+        glyph = ink[rows[0]:rows[-1] + 1, start:end] * np.uint8(255)
+        glyphs.append(cv2.resize(glyph, GLYPH_SIZE, interpolation=cv2.INTER_AREA).ravel())
+    if not glyphs:
+        return np.zeros((0, GLYPH_SIZE[0] * GLYPH_SIZE[1]), dtype=np.float32)
+    return np.array(glyphs, dtype=np.float32) / 255.0
+
+
+@dataclass
+class DigitTemplates:
+    """Glyph templates for the digits 0-9"""
+    templates: np.ndarray  # (10, GLYPH_SIZE[0] * GLYPH_SIZE[1]) float32, row = digit
+    
+    def distances(self, glyphs: np.ndarray) -> np.ndarray:
+        """(G, 10) mean pixel difference of each glyph to each template"""
+        return np.abs(glyphs[:, None, :] - self.templates[None, :, :]).mean(axis=2)
+    
+    def classify(self, glyphs: np.ndarray) -> np.ndarray:
+        """
+        Recognize glyphs
+        
+        Args:
+            glyphs: (G, P) glyphs from segment_glyphs()
+        
+        Returns:
+            (G,) int digits, UNREADABLE where no template is close enough
+        """
+        distances = self.distances(glyphs)
+        digits = distances.argmin(axis=1)
+        digits[distances.min(axis=1) > MATCH_DISTANCE] = UNREADABLE
+        return digits
+    
+    def read_number(self, glyphs: np.ndarray) -> int:
+        """Number shown by a row of glyphs, or UNREADABLE"""
+        digits = self.classify(glyphs)
+        if len(digits) == 0 or (digits == UNREADABLE).any():
+            return UNREADABLE
+        return int("".join(str(digit) for digit in digits))
+    
+    def to_dict(self) -> Dict:
+        """JSON-serializable form"""
+        return {"glyph_size": list(GLYPH_SIZE), "templates": np.round(self.templates, 3).tolist()}
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "DigitTemplates":
+        """Inverse of to_dict()"""
+        return cls(templates=np.array(data["templates"], dtype=np.float32))
+
+
+class TimerReader:
+    """Learns the timer digits of frames of one size, then reads the timer"""
+    
+    def __init__(self, region: Tuple[float, float, float, float], start_value: int = 99):
+        """
+        Initialize timer reader
+        
+        Args:
+            region: (x, y, width, height) timer area, as fractions of the frame
+            start_value: Timer value at the start of a round
+        """
+        self.region = region
+        self.start_value = start_value
+        self.templates: Optional[DigitTemplates] = None
+        self._reset_learning()
+    
+    def read(self, frame: np.ndarray, frame_num: int, health_full: bool) -> int:
+        """
+        Read the timer, learning the digits first if needed
+        
+        Args:
+            frame: BGR video frame
+            frame_num: Frame number (samples must come in ascending order)
+            health_full: Both health bars read full (a round may be starting)
+        
+        Returns:
+            Timer value in seconds, UNREADABLE if it could not be read
+        """
+        glyphs = segment_glyphs(frame, self.region)
+        if self.templates is not None:
+            return self.templates.read_number(glyphs)
+        return self._learn(glyphs, frame_num, health_full)
+    
+    def _reset_learning(self):
+        """Forget the digits seen so far"""
+        self._samples: Dict[int, List[np.ndarray]] = {}
+        self._value: Optional[int] = None
+        self._last_frame: Optional[int] = None
+        self._pending = 0
+    
+    def _learn(self, glyphs: np.ndarray, frame_num: int, health_full: bool) -> int:
+        """Follow the countdown from a round start, labeling glyphs as they appear"""
+        if self._last_frame is not None and frame_num - self._last_frame > MAX_LEARNING_GAP:
+            # Frames were skipped: seconds may have been missed
+            self._reset_learning()
+        self._last_frame = frame_num
+        
+        if self._value is None:
+            if health_full and self._looks_like(glyphs, self.start_value):
+                self._value = self.start_value
+                self._add_samples(glyphs, self._value)
+            return self._value if self._value is not None else UNREADABLE
+        
+        digits = len(str(self._value))
+        if len(glyphs) != digits:
+            # Covered or gone for a moment (flash, round end)
+            return UNREADABLE
+        
+        if self._distance(glyphs[-1], self._value % 10) <= SAME_GLYPH:
+            self._pending = 0
+            self._add_samples(glyphs, self._value)
+            return self._value
+        
+        self._pending += 1
+        if self._pending < CHANGE_SAMPLES:
+            # Changing, or covered for a moment
+            return UNREADABLE
+        
+        # The ones digit changed: one second passed
+        value = self._value - 1
+        self._pending = 0
+        if value < 0 or len(str(value)) != digits:
+            self._reset_learning()
+            return UNREADABLE
+        if not all(self._distance(glyph, int(digit)) <= SAME_GLYPH or int(digit) not in self._samples
+                   for glyph, digit in zip(glyphs, str(value))):
+            # A digit seen before looks different: not a countdown
+            self._reset_learning()
+            return UNREADABLE
+        
+        tens_changed = value // 10 != self._value // 10
+        self._value = value
+        self._add_samples(glyphs, value)
+        if tens_changed and len(self._samples) == 10:
+            # Every digit was labeled and the tens digit changed as expected
+            self.templates = DigitTemplates(np.array(
+                [np.mean(self._samples[digit], axis=0) for digit in range(10)], dtype=np.float32))
+            self._reset_learning()
+        return value
+    
+    def _looks_like(self, glyphs: np.ndarray, value: int) -> bool:
+        """Whether the glyphs could show value (equal digits look alike, different ones do not)"""
+        text = str(value)
+        if len(glyphs) != len(text):
+            return False
+        for i in range(len(text)):
+            for j in range(i + 1, len(text)):
+                alike = np.abs(glyphs[i] - glyphs[j]).mean() <= SAME_GLYPH
+                if alike != (text[i] == text[j]):
+                    return False
+        return True
+    
+    def _add_samples(self, glyphs: np.ndarray, value: int):
+        """Remember the glyphs of a value under their digits"""
+        for glyph, digit in zip(glyphs, str(value)):
+            samples = self._samples.setdefault(int(digit), [])
+            if len(samples) < MAX_GLYPH_SAMPLES:
+                samples.append(glyph)
+    
+    def _distance(self, glyph: np.ndarray, digit: int) -> float:
+        """Mean pixel difference from the glyphs seen for a digit (inf if none)"""
+        samples = self._samples.get(digit)
+        if not samples:
+            return float("inf")
+        return float(np.abs(glyph - np.mean(samples, axis=0)).mean())
@@ -0,0 +1,253 @@
+"""
+Frame-accurate timeline index for video files.
+
+A one-time pass over the container records the presentation timestamp of
+every frame and which frames are keyframes, without decoding any pixels:
+ffprobe when it is installed, otherwise OpenCV in raw (demux-only) mode.
+The index can be stored (in a cache directory, or next to the video as
+<video>.index.npz) and is then reused until the video file changes.
+
+With it, timestamps come from the real PTS instead of a rounded frame
+rate, and random access can seek to the nearest keyframe and decode
+forward to exactly the requested frame.
+"""
+
+import os
+import shutil
+import subprocess
+import cv2
+import numpy as np
+from typing import Optional, Tuple
+
+
+# Bump when the stored format changes
+INDEX_VERSION = 1
+
+
+class VideoIndex:
+    """Per-frame presentation timestamps and keyframe positions of a video"""
+    
+    def __init__(self, pts: np.ndarray, keyframes: np.ndarray, source: str = "unknown"):
+        """
+        Initialize video index
+        
+        Args:
+            pts: Presentation timestamp (seconds) of each frame, in display order
+            keyframes: Sorted frame numbers of keyframes (empty if unknown)
+            source: Tool that produced the index ("ffprobe" or "opencv")
+        """
+        self.pts = np.asarray(pts, dtype=np.float64)
+        self.keyframes = np.asarray(keyframes, dtype=np.int64)
+        self.source = source
+        
+        # Timestamps are reported relative to the first frame
+        self.start_time = float(self.pts[0]) if len(self.pts) else 0.0
+        self.times = self.pts - self.start_time
+    
+    @property
+    def frame_count(self) -> int:
+        """Number of frames in the video"""
+        return len(self.pts)
+    
+    @property
+    def duration(self) -> float:
+        """Length of the video in seconds (including the last frame)"""
+        if len(self.times) == 0:
+            return 0.0
+        fps = self.fps
+        return float(self.times[-1]) + (1.0 / fps if fps > 0 else 0.0)
+    
+    @property
+    def fps(self) -> float:
+        """Average frame rate measured from the timestamps"""
+        if len(self.times) < 2 or self.times[-1] <= 0:
+            return 0.0
+        return (len(self.times) - 1) / float(self.times[-1])
+    
+    def frame_to_timestamp(self, frame_number: int) -> float:
+        """Presentation time (seconds from the first frame) of a frame"""
+        if len(self.times) == 0:
+            return 0.0
+        if 0 <= frame_number < len(self.times):
+            return float(self.times[frame_number])
+        
+        # Outside the index: extrapolate with the average frame rate
+        fps = self.fps
+        if fps <= 0:
+            return 0.0
+        anchor = 0 if frame_number < 0 else len(self.times) - 1
+        return float(self.times[anchor]) + (frame_number - anchor) / fps
+    
+    def timestamp_to_frame(self, timestamp: float) -> int:
+        """Frame being displayed at a timestamp (seconds from the first frame)"""
+        if len(self.times) == 0:
+            return 0
+        frame_number = int(np.searchsorted(self.times, timestamp + 1e-6, side="right")) - 1
+        return min(max(frame_number, 0), len(self.times) - 1)
+    
+    def nearest_frame(self, timestamp: float) -> int:
+        """Frame whose timestamp is closest to timestamp (seconds from the first frame)"""
+        if len(self.times) == 0:
+            return 0
+        position = int(np.searchsorted(self.times, timestamp))
+        if position >= len(self.times):
+            return len(self.times) - 1
+        if position > 0 and timestamp - self.times[position - 1] < self.times[position] - timestamp:
+            return position - 1
+        return position
+    
+    def keyframe_before(self, frame_number: int) -> Optional[int]:
+        """Nearest keyframe at or before a frame (None if keyframes are unknown)"""
+        if len(self.keyframes) == 0:
+            return None
+        position = int(np.searchsorted(self.keyframes, frame_number, side="right")) - 1
+        return int(self.keyframes[position]) if position >= 0 else 0
+    
+    @staticmethod
+    def index_path(base_path: str) -> str:
+        """Index file for a video data base path (the video path itself when kept next to it)"""
+        return f"{base_path}.index.npz"
+    
+    @classmethod
+    def load(cls, video_path: str, path: str) -> Optional["VideoIndex"]:
+        """
+        Load the stored index of a video
+        
+        Args:
+            video_path: Path to video file
+            path: Index file
+        
+        Returns:
+            VideoIndex, or None if there is none or the video has changed
+        """
+        if not os.path.exists(path):
+            return None
+        
+        try:
+            with np.load(path) as data:
+                if (int(data["version"]) != INDEX_VERSION
+                        or tuple(data["signature"]) != cls._signature(video_path)):
+                    return None
+                return cls(data["pts"], data["keyframes"], str(data["source"]))
+        except (OSError, KeyError, ValueError):
+            return None
+    
+    def save(self, video_path: str, path: str) -> bool:
+        """
+        Store the index of a video
+        
+        Args:
+            video_path: Path to video file
+            path: Index file (its directory is created if needed)
+        
+        Returns:
+            False if the file could not be written
+        """
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            np.savez(path, version=INDEX_VERSION,
+                     signature=np.array(self._signature(video_path), dtype=np.int64),
+                     pts=self.pts, keyframes=self.keyframes, source=self.source)
+            return True
+        except OSError:
+            return False
+    
+    @classmethod
+    def build(cls, video_path: str) -> "VideoIndex":
+        """
+        Scan a video's packets to build its index (no pixels are decoded)
+        
+        Args:
+            video_path: Path to video file
+        
+        Returns:
+            VideoIndex for the video
+        """
+        packets = None
+        source = "ffprobe"
+        if shutil.which("ffprobe"):
+            packets = cls._probe_packets_ffprobe(video_path)
+        if packets is None:
+            packets = cls._probe_packets_opencv(video_path)
+            source = "opencv"
+        
+        pts, is_key = packets
+        
+        # Packets arrive in decode order; with B-frames display order differs
+        order = np.argsort(pts, kind="stable")
+        pts = pts[order]
+        keyframes = np.flatnonzero(is_key[order])
+        if len(keyframes) and keyframes[0] != 0:
+            keyframes = np.concatenate([[0], keyframes])
+        
+        return cls(pts, keyframes, source)
+    
+    @classmethod
+    def load_or_build(cls, video_path: str, path: Optional[str] = None) -> "VideoIndex":
+        """
+        Load the stored index, building and storing it on first use
+        
+        Args:
+            video_path: Path to video file
+            path: Index file (None = build without storing)
+        """
+        index = cls.load(video_path, path) if path is not None else None
+        if index is None:
+            index = cls.build(video_path)
+            if path is not None and not index.save(video_path, path):
+                print(f"Warning: could not save video index to {path}")
+        return index
+    
+    @staticmethod
+    def _signature(video_path: str) -> Tuple[int, int]:
+        """File size and modification time, to detect a changed video"""
+        stat = os.stat(video_path)
+        return stat.st_size, stat.st_mtime_ns
+    
+    @staticmethod
+    def _probe_packets_ffprobe(video_path: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Read packet timestamps and keyframe flags with ffprobe"""
+        try:
+            result = subprocess.run(
+                ["ffprobe", "-v", "error", "-select_streams", "v:0",
+                 "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", video_path],
+                capture_output=True, text=True, check=True
+            )
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        
+        pts = []
+        is_key = []
+        for line in result.stdout.splitlines():
+            fields = line.strip().split(",")
+            if len(fields) < 2 or fields[0] in ("", "N/A"):
+                continue
+            pts.append(float(fields[0]))
+            is_key.append("K" in fields[1])
+        
+        if not pts:
+            return None
+        return np.array(pts), np.array(is_key, dtype=bool)
+    
+    @staticmethod
+    def _probe_packets_opencv(video_path: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Read packet timestamps and keyframe flags with OpenCV in raw mode"""
+        cap = cv2.VideoCapture(video_path)
+        try:
+            # -1 makes grab() return demuxed packets without decoding them
+            raw = cap.set(cv2.CAP_PROP_FORMAT, -1)
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            
+            pts = []
+            is_key = []
+            while cap.grab():
+                pts.append(cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0)
+                is_key.append(bool(raw and cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME)))
+        finally:
+            cap.release()
+        
+        pts = np.array(pts)
+        if len(pts) and len(np.unique(pts)) != len(pts) and fps > 0:
+            # Backend without per-packet timestamps: assume constant frame rate
+            pts = np.arange(len(pts)) / fps
+        return pts, np.array(is_key, dtype=bool)
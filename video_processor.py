@@ -4,79 +4,274 @@ Video processing module for analyzing 2XKO gameplay videos.
 
 import cv2
 import numpy as np
-from typing import List, Tuple, Optional, Dict
+from typing import List, Tuple, Optional, Dict, Iterator, Callable
+from collections import deque, OrderedDict
 from tqdm import tqdm
 import os
+from prefetch_reader import PrefetchReader
+from video_index import VideoIndex
+from ffmpeg_capture import FFmpegCapture, ffmpeg_available
 
 
 class VideoProcessor:
     """Processes video files for gameplay analysis"""
     
-    def __init__(self, video_path: str):
+    def __init__(self, video_path: str, build_index: bool = False, frame_cache_size: int = 16,
+                 backend: str = "opencv", backend_options: Optional[Dict] = None,
+                 index_path: Optional[str] = None):
         """
         Initialize video processor
         
         Args:
             video_path: Path to the MP4 video file
+            build_index: Build a frame-accurate timestamp/keyframe index
+                (stored at index_path, if given) unless one is stored there
+                already. A stored index is always used when present.
+            frame_cache_size: Number of recently fetched frames get_frame()
+                keeps decoded (0 = no cache)
+            backend: Decoder, "opencv" (cv2.VideoCapture) or "ffmpeg" (rawvideo
+                pipe from a local ffmpeg process; falls back to OpenCV when
+                ffmpeg is not installed)
+            backend_options: Keyword arguments for the backend, e.g. width,
+                pixel_format and threads for FFmpegCapture
+            index_path: Where the index is stored (None = not stored; a
+                built index only lasts for this VideoProcessor)
         """
         if not os.path.exists(video_path):
             raise FileNotFoundError(f"Video file not found: {video_path}")
         
         self.video_path = video_path
-        self.cap = cv2.VideoCapture(video_path)
+        
+        # Per-frame timestamps and keyframes (the container's frame count is
+        # only an estimate for some formats)
+        if build_index:
+            self.index = VideoIndex.load_or_build(video_path, index_path)
+        else:
+            self.index = VideoIndex.load(video_path, index_path) if index_path is not None else None
+        
+        self.backend = backend
+        self.cap = self._open_capture(backend, backend_options or {})
         
         if not self.cap.isOpened():
             raise ValueError(f"Could not open video file: {video_path}")
         
-        # Get video properties
-        self.fps = int(self.cap.get(cv2.CAP_PROP_FPS))
+        # Get video properties (fps stays fractional: 29.97/59.94 must not drift)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
         self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
         self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         self.duration = self.frame_count / self.fps if self.fps > 0 else 0
+        # Shape of decoded frames (the ffmpeg backend can output gray/YUV)
+        self.frame_shape = getattr(self.cap, "frame_shape", (self.height, self.width, 3))
+        
+        if self.index is not None and self.index.frame_count:
+            self.frame_count = self.index.frame_count
+            self.duration = self.index.duration
+        
+        # Frame the next read() returns, when known
+        self._next_frame: Optional[int] = 0
         
-        print(f"Video loaded: {self.width}x{self.height} @ {self.fps}fps, {self.duration:.2f}s")
+        # LRU cache of frames returned by get_frame()
+        self.frame_cache_size = frame_cache_size
+        self._frame_cache: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
+        print(f"Video loaded: {self.width}x{self.height} @ {self.fps:g}fps, {self.duration:.2f}s")
     
-    def get_frame(self, frame_number: int) -> Optional[np.ndarray]:
-        """Get a specific frame by frame number"""
+    def _open_capture(self, backend: str, options: Dict):
+        """Open the decoder for the video"""
+        if backend == "ffmpeg":
+            if ffmpeg_available():
+                frame_times = self.index.times if self.index is not None else None
+                return FFmpegCapture(self.video_path, frame_times=frame_times, **options)
+            print("Warning: ffmpeg not found, decoding with OpenCV")
+            self.backend = "opencv"
+        elif backend != "opencv":
+            raise ValueError(f"Unknown decode backend: {backend}")
+        return cv2.VideoCapture(self.video_path)
+    
+    def seek(self, frame_number: int):
+        """
+        Position the capture so the next read() returns frame_number
+        
+        Reads forward instead of seeking when the capture is already a little
+        before the frame: with an index, whenever no keyframe lies in between
+        (a seek would decode from that keyframe anyway).
+        """
+        if self._next_frame is not None and 0 <= frame_number - self._next_frame <= self._forward_limit(frame_number):
+            while self._next_frame < frame_number and self.cap.grab():
+                self._next_frame += 1
+            return
+        
         self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+        self._next_frame = frame_number
+    
+    def _forward_limit(self, frame_number: int) -> int:
+        """Up to how many frames reading forward is cheaper than seeking"""
+        keyframe = self.index.keyframe_before(frame_number) if self.index is not None else None
+        if keyframe is not None:
+            return frame_number - keyframe
+        # OpenCV restarts decoding about 16 frames before a seek target
+        return 16
+    
+    def get_frame(self, frame_number: int) -> Optional[np.ndarray]:
+        """
+        Get a specific frame by frame number
+        
+        Recently fetched frames are served from an LRU cache. They are shared
+        between callers and therefore read-only; copy before modifying.
+        """
+        frame = self._frame_cache.get(frame_number)
+        if frame is not None:
+            self._frame_cache.move_to_end(frame_number)
+            self.cache_hits += 1
+            return frame
+        
+        self.cache_misses += 1
+        frame = self._decode_frame(frame_number)
+        if frame is not None and self.frame_cache_size > 0:
+            frame.flags.writeable = False
+            self._frame_cache[frame_number] = frame
+            if len(self._frame_cache) > self.frame_cache_size:
+                self._frame_cache.popitem(last=False)
+        return frame
+    
+    def get_frames(self, frame_numbers) -> Dict[int, np.ndarray]:
+        """
+        Get several frames, decoding them in ascending order
+        
+        Sorting lets every lookup after the first read forward from the
+        previous one where possible, so each GOP is decoded at most once
+        instead of re-seeking for every frame.
+        
+        Args:
+            frame_numbers: Frame numbers in any order (duplicates allowed)
+        
+        Returns:
+            Dictionary of frame number to frame, in ascending frame order
+            (frames that could not be read are left out)
+        """
+        frames = {}
+        for frame_number in sorted(set(int(n) for n in frame_numbers)):
+            frame = self.get_frame(frame_number)
+            if frame is not None:
+                frames[frame_number] = frame
+        return frames
+    
+    def _decode_frame(self, frame_number: int) -> Optional[np.ndarray]:
+        """Seek to and decode a frame"""
+        self.seek(frame_number)
         ret, frame = self.cap.read()
+        
+        if ret and self.index is not None:
+            # Container seeks can land a few frames off on long-GOP files; the
+            # decoded frame's timestamp tells exactly which frame it is
+            actual = self._decoded_frame_number()
+            if actual != frame_number:
+                ret, frame = self._read_forward_to(frame_number, actual)
+        
         if ret:
+            self._next_frame = frame_number + 1
             return frame
+        self._next_frame = None
         return None
     
+    def _decoded_frame_number(self) -> int:
+        """Frame number of the frame last read, from its timestamp"""
+        return self.index.nearest_frame(self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0)
+    
+    def _read_forward_to(self, frame_number: int, actual: int) -> Tuple[bool, Optional[np.ndarray]]:
+        """Recover from a seek that landed on frame actual instead of frame_number"""
+        if actual > frame_number:
+            # Overshot: restart from the keyframe before the frame
+            keyframe = self.index.keyframe_before(frame_number)
+            self.cap.set(cv2.CAP_PROP_POS_MSEC, self.index.frame_to_timestamp(keyframe or 0) * 1000.0)
+            if not self.cap.grab():
+                return False, None
+            actual = self._decoded_frame_number()
+        
+        while actual < frame_number:
+            if not self.cap.grab():
+                return False, None
+            actual = self._decoded_frame_number()
+        
+        if actual != frame_number:
+            return False, None
+        return self.cap.retrieve()
+    
     def get_frame_at_time(self, timestamp: float) -> Optional[np.ndarray]:
         """Get frame at specific timestamp (in seconds)"""
-        frame_number = int(timestamp * self.fps)
-        return self.get_frame(frame_number)
+        return self.get_frame(self.timestamp_to_frame(timestamp))
+    
+    def stream(self, sample_rate: int = 1, start_frame: int = 0,
+               end_frame: Optional[int] = None, history_size: int = 1,
+               desc: str = "Decoding frames", target_fps: Optional[float] = None,
+               frame_filter: Optional[Callable[[int], bool]] = None,
+               skip_decode: bool = True, prefetch: int = 0) -> "FrameStream":
+        """
+        Create a lazy frame stream over this video
+        
+        Args:
+            sample_rate: Yield every Nth frame (1 = all frames)
+            start_frame: First frame number to decode
+            end_frame: Frame number to stop before (None = end of video)
+            history_size: Number of previously yielded frames to keep
+            desc: Progress bar label (None hides the progress bar)
+            target_fps: Yield this many frames per second of video regardless
+                of source fps (overrides sample_rate)
+            frame_filter: Callable deciding per frame number whether to yield it
+                (overrides sample_rate and target_fps)
+            skip_decode: Only grab() frames that will not be yielded instead of
+                fully decoding and converting them
+            prefetch: Decode on a background thread into a ring of this many
+                reused frame buffers (0 = decode on the calling thread)
+        
+        Returns:
+            FrameStream yielding (frame_number, frame) tuples
+        """
+        return FrameStream(self, sample_rate=sample_rate, start_frame=start_frame,
+                           end_frame=end_frame, history_size=history_size, desc=desc,
+                           target_fps=target_fps, frame_filter=frame_filter,
+                           skip_decode=skip_decode, prefetch=prefetch)
+    
+    def stream_blocks(self, block_size: int = 16, sample_rate: int = 1, start_frame: int = 0,
+                      end_frame: Optional[int] = None, desc: str = "Decoding frames",
+                      prefetch: int = 0) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Decode sampled frames into contiguous blocks for batched detectors
+        
+        Args:
+            block_size: Frames per block
+            sample_rate: Yield every Nth frame (1 = all frames)
+            start_frame: First frame number to decode
+            end_frame: Frame number to stop before (None = end of video)
+            desc: Progress bar label (None hides the progress bar)
+            prefetch: Background decode ring size (0 = decode on the calling thread)
+        
+        Returns:
+            Iterator of (frame numbers, frames) blocks, see FrameStream.blocks()
+        """
+        with self.stream(sample_rate=sample_rate, start_frame=start_frame, end_frame=end_frame,
+                         history_size=0, desc=desc, prefetch=prefetch) as frames:
+            yield from frames.blocks(block_size)
     
     def extract_frames(self, sample_rate: int = 1) -> List[Tuple[int, np.ndarray]]:
         """
         Extract frames from video
         
+        Note: this holds every sampled frame in memory at once. Prefer
+        stream() for anything longer than a short clip.
+        
         Args:
             sample_rate: Extract every Nth frame (1 = all frames)
         
         Returns:
             List of (frame_number, frame) tuples
         """
-        frames = []
-        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-        
-        frame_num = 0
-        with tqdm(total=self.frame_count, desc="Extracting frames") as pbar:
-            while True:
-                ret, frame = self.cap.read()
-                if not ret:
-                    break
-                
-                if frame_num % sample_rate == 0:
-                    frames.append((frame_num, frame))
-                
-                frame_num += 1
-                pbar.update(1)
-        
-        return frames
+        with self.stream(sample_rate=sample_rate, history_size=0,
+                         desc="Extracting frames") as frames:
+            return list(frames)
     
     def detect_character_positions(self, frame: np.ndarray) -> Dict[str, Tuple[int, int]]:
         """
@@ -145,14 +340,19 @@ class VideoProcessor:
     
     def frame_to_timestamp(self, frame_number: int) -> float:
         """Convert frame number to timestamp in seconds"""
+        if self.index is not None:
+            return self.index.frame_to_timestamp(frame_number)
         return frame_number / self.fps if self.fps > 0 else 0
     
     def timestamp_to_frame(self, timestamp: float) -> int:
         """Convert timestamp to frame number"""
+        if self.index is not None:
+            return self.index.timestamp_to_frame(timestamp)
         return int(timestamp * self.fps)
     
     def close(self):
         """Release video capture"""
+        self._frame_cache.clear()
         if self.cap:
             self.cap.release()
     
@@ -163,6 +363,225 @@ class VideoProcessor:
         self.close()
 
 
+class FrameStream:
+    """
+    Lazily decodes sampled frames from a VideoProcessor.
+    
+    Only the current frame plus a bounded look-behind window of previously
+    yielded frames is kept alive, so memory use does not grow with video
+    length. Use as a context manager so the progress bar is always closed:
+        
+        with video.stream(sample_rate=2) as frames:
+            for frame_num, frame in frames:
+                previous = frames.previous_frame
+    """
+    
+    def __init__(self, video: VideoProcessor, sample_rate: int = 1, start_frame: int = 0,
+                 end_frame: Optional[int] = None, history_size: int = 1,
+                 desc: str = "Decoding frames", target_fps: Optional[float] = None,
+                 frame_filter: Optional[Callable[[int], bool]] = None,
+                 skip_decode: bool = True, prefetch: int = 0):
+        """
+        Initialize frame stream
+        
+        Args:
+            video: VideoProcessor to decode from
+            sample_rate: Yield every Nth frame (1 = all frames)
+            start_frame: First frame number to decode
+            end_frame: Frame number to stop before (None = end of video)
+            history_size: Number of previously yielded frames to keep
+            desc: Progress bar label (None hides the progress bar)
+            target_fps: Yield this many frames per second of video regardless
+                of source fps (overrides sample_rate)
+            frame_filter: Callable deciding per frame number whether to yield it
+                (overrides sample_rate and target_fps)
+            skip_decode: Only grab() frames that will not be yielded instead of
+                fully decoding and converting them
+            prefetch: Decode on a background thread into a ring of this many
+                reused frame buffers (0 = decode on the calling thread). Yielded
+                frames are only valid while they are in the look-behind window.
+        """
+        if sample_rate < 1:
+            raise ValueError(f"sample_rate must be >= 1, got {sample_rate}")
+        if target_fps is not None and target_fps <= 0:
+            raise ValueError(f"target_fps must be > 0, got {target_fps}")
+        
+        self.video = video
+        self.sample_rate = sample_rate
+        self.target_fps = target_fps
+        self.frame_filter = frame_filter
+        self.skip_decode = skip_decode
+        self.prefetch = prefetch
+        self.prefetch_stats: Optional[Dict] = None
+        self.start_frame = max(0, start_frame)
+        self.end_frame = video.frame_count if end_frame is None else min(end_frame, video.frame_count)
+        self.history = deque(maxlen=max(0, history_size))
+        self.desc = desc
+        self._pbar = None
+        # Returns the buffer the next yielded frame is decoded into (None = a new array)
+        self._target: Optional[Callable[[], np.ndarray]] = None
+    
+    @property
+    def previous_frame(self) -> Optional[np.ndarray]:
+        """Frame yielded before the current one (None at the start)"""
+        if self.history:
+            return self.history[-1][1]
+        return None
+    
+    def wants_frame(self, frame_num: int) -> bool:
+        """Check whether a frame will be yielded (as opposed to skipped)"""
+        if self.frame_filter is not None:
+            return self.frame_filter(frame_num)
+        
+        offset = frame_num - self.start_frame
+        if self.target_fps is not None and self.video.fps > 0:
+            # Yield the first frame of each analysis tick
+            if offset == 0:
+                return True
+            if self.video.index is not None:
+                # Ticks follow the real timestamps, so variable frame rate works
+                tick = int(self.video.frame_to_timestamp(frame_num) * self.target_fps)
+                return tick != int(self.video.frame_to_timestamp(frame_num - 1) * self.target_fps)
+            ratio = self.target_fps / self.video.fps
+            return int(offset * ratio) != int((offset - 1) * ratio)
+        
+        return offset % self.sample_rate == 0
+    
+    def __len__(self) -> int:
+        """Expected number of yielded frames (based on the container frame count)"""
+        if self.frame_filter is None and self.target_fps is None:
+            return len(range(self.start_frame, self.end_frame, self.sample_rate))
+        return sum(1 for n in range(self.start_frame, self.end_frame) if self.wants_frame(n))
+    
+    def __iter__(self) -> Iterator[Tuple[int, np.ndarray]]:
+        self.video.seek(self.start_frame)
+        # Reads below move the capture without the video tracking them
+        self.video._next_frame = None
+        self.history.clear()
+        
+        self._pbar = tqdm(total=max(0, self.end_frame - self.start_frame), desc=self.desc,
+                          disable=self.desc is None)
+        try:
+            if self.prefetch:
+                yield from self._iter_prefetched()
+            else:
+                yield from self._iter_direct()
+        finally:
+            self.close()
+    
+    def _iter_direct(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """Decode on the calling thread"""
+        cap = self.video.cap
+        frame_num = self.start_frame
+        while frame_num < self.end_frame:
+            wanted = self.wants_frame(frame_num)
+            
+            if self.skip_decode:
+                # grab() advances without the retrieve/color conversion
+                # step, which is only paid for frames that are yielded
+                ret = cap.grab()
+                if ret and wanted:
+                    ret, frame = cap.retrieve(self._target()) if self._target else cap.retrieve()
+            else:
+                ret, frame = cap.read(self._target()) if self._target and wanted else cap.read()
+            if not ret:
+                break
+            
+            self._pbar.update(1)
+            if wanted:
+                yield frame_num, frame
+                # Only remembered once the consumer has moved on
+                self.history.append((frame_num, frame))
+            
+            frame_num += 1
+    
+    def _iter_prefetched(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """Decode on a background thread into a ring of reused frame buffers"""
+        # Frames in the look-behind window keep their ring slot, so the ring
+        # needs room for the window, the current frame and one being decoded
+        ring_size = max(self.prefetch, self.history.maxlen + 2)
+        reader = PrefetchReader(self.video.cap, self.video.frame_shape,
+                                self.start_frame, self.end_frame, self.wants_frame, ring_size)
+        held_slots = deque()
+        position = self.start_frame
+        
+        reader.start()
+        try:
+            while True:
+                item = reader.get()
+                if item is None:
+                    break
+                
+                frame_num, slot, frame = item
+                self._pbar.update(frame_num + 1 - position)
+                position = frame_num + 1
+                
+                yield frame_num, frame
+                
+                if self.history.maxlen:
+                    if len(self.history) == self.history.maxlen:
+                        reader.release(held_slots.popleft())
+                    self.history.append((frame_num, frame))
+                    held_slots.append(slot)
+                else:
+                    reader.release(slot)
+        finally:
+            reader.stop()
+            self.prefetch_stats = reader.get_stats()
+    
+    def blocks(self, block_size: int = 16) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Yield the stream's frames as contiguous blocks
+        
+        Frames are decoded straight into a preallocated (block_size, H, W[, C])
+        buffer (copied into it when prefetching). Two buffers alternate, so a
+        block stays valid while the next one is used, e.g. as the previous
+        frame of its first frame, but not after that.
+        
+        Args:
+            block_size: Frames per block (the last block may be shorter)
+        
+        Returns:
+            Iterator of (frame numbers as an (N,) int64 array, (N, ...) uint8 frames)
+        """
+        if block_size < 1:
+            raise ValueError(f"block_size must be >= 1, got {block_size}")
+        
+        buffers = [np.empty((block_size,) + tuple(self.video.frame_shape), dtype=np.uint8) for _ in range(2)]
+        numbers = np.empty(block_size, dtype=np.int64)
+        current, count = 0, 0
+        self._target = lambda: buffers[current][count]
+        try:
+            for frame_num, frame in self:
+                slot = buffers[current][count]
+                if not np.may_share_memory(frame, slot):
+                    slot[...] = frame
+                numbers[count] = frame_num
+                count += 1
+                
+                if count == block_size:
+                    yield numbers.copy(), buffers[current]
+                    current, count = 1 - current, 0
+            
+            if count:
+                yield numbers[:count].copy(), buffers[current][:count]
+        finally:
+            self._target = None
+    
+    def close(self):
+        """Close the progress bar and drop the look-behind window"""
+        if self._pbar is not None:
+            self._pbar.close()
+            self._pbar = None
+        self.history.clear()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
 class FrameAnalyzer:
     """Analyzes individual frames for gameplay events"""
     